@@ -1,4 +1,5 @@
 import app
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
@@ -9,17 +10,26 @@ from app.routers.auth import get_current_user
 from app.db.models import User
 from app.routers.ai import router as ai_router
 from app.core.request_id import RequestIdMiddleware
+from app.services.ai_gemini import warm_model_cache
 
 
 # ------------------------
 # AI Microservice App
 # ------------------------
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resolve the Gemini model once up front instead of on the first insight request
+    warm_model_cache()
+    yield
+
+
 def create_ai_app() -> FastAPI:
     app = FastAPI(
         title="Geo Dashboard AI Service",
         description="Dedicated microservice for AI-powered geospatial insights",
         version="0.1.0",
+        lifespan=lifespan,
     )
     
     app.add_middleware(RequestIdMiddleware)
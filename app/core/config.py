@@ -24,8 +24,59 @@ class Settings(BaseSettings):
 	cors_origins: str = Field(default=os.getenv("CORS_ORIGINS", "http://localhost:5173,https://thegeodashboard.vercel.app"))
 	gemini_api_key: str | None = Field(default=os.getenv("GEMINI_API_KEY"))
 	gemini_model: str = Field(default=os.getenv("GEMINI_MODEL", "gemini-1.5-pro"))
+	# Seconds a resolved Gemini model (name + GenerativeModel) is reused before re-running discovery
+	gemini_model_cache_ttl: int = Field(default=int(os.getenv("GEMINI_MODEL_CACHE_TTL", "3600")))
 	ai_max_output_tokens: int = Field(default=int(os.getenv("AI_MAX_OUTPUT_TOKENS", "600")))
+	# Identical prompts reuse a cached insight (and don't count against the weekly limit)
+	insight_cache_max_entries: int = Field(default=int(os.getenv("INSIGHT_CACHE_MAX_ENTRIES", "1024")))
+	insight_cache_ttl: int = Field(default=int(os.getenv("INSIGHT_CACHE_TTL", str(7 * 24 * 3600))))
+	insight_cache_persist: bool = Field(default=os.getenv("INSIGHT_CACHE_PERSIST", "false").lower() == "true")
 	ai_service_url: str | None = Field(default=os.getenv("AI_SERVICE_URL"))
+	# Connection pool and per-phase timeouts (seconds) for the main backend -> AI service proxy
+	ai_proxy_max_connections: int = Field(default=int(os.getenv("AI_PROXY_MAX_CONNECTIONS", "100")))
+	ai_proxy_max_keepalive: int = Field(default=int(os.getenv("AI_PROXY_MAX_KEEPALIVE", "20")))
+	ai_proxy_connect_timeout: float = Field(default=float(os.getenv("AI_PROXY_CONNECT_TIMEOUT", "5")))
+	ai_proxy_read_timeout: float = Field(default=float(os.getenv("AI_PROXY_READ_TIMEOUT", "60")))
+	ai_proxy_write_timeout: float = Field(default=float(os.getenv("AI_PROXY_WRITE_TIMEOUT", "30")))
+	ai_proxy_pool_timeout: float = Field(default=float(os.getenv("AI_PROXY_POOL_TIMEOUT", "10")))
+	analysis_job_workers: int = Field(default=int(os.getenv("ANALYSIS_JOB_WORKERS", "2")))
+	# Workers heartbeat their queued/running jobs this often; jobs silent for the stale limit are failed
+	analysis_job_heartbeat_seconds: float = Field(default=float(os.getenv("ANALYSIS_JOB_HEARTBEAT_SECONDS", "30")))
+	analysis_job_stale_seconds: float = Field(default=float(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "120")))
+	# 0 runs the analysis stages inline; N > 0 runs them on an N-process pool
+	analysis_process_workers: int = Field(default=int(os.getenv("ANALYSIS_PROCESS_WORKERS", "0")))
+	analysis_parallel_min_points: int = Field(default=int(os.getenv("ANALYSIS_PARALLEL_MIN_POINTS", "50000")))
+	analysis_cache_max_bytes: int = Field(default=int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+	# Optional on-disk tier for the analysis result cache (unset = memory only)
+	analysis_cache_dir: str | None = Field(default=os.getenv("ANALYSIS_CACHE_DIR"))
+	# Haversine DBSCAN reuses one radius-neighbors graph per dataset for any eps up to this
+	dbscan_graph_max_eps_km: float = Field(default=float(os.getenv("DBSCAN_GRAPH_MAX_EPS_KM", "1.0")))
+	dbscan_graph_max_edges: int = Field(default=int(os.getenv("DBSCAN_GRAPH_MAX_EDGES", "10000000")))
+	# OPTICS orderings are computed up to this radius (or the requested eps, if larger) so any
+	# smaller eps can be extracted; the cost grows steeply with it, so it matches the DBSCAN graph
+	cluster_hierarchy_max_eps_km: float = Field(
+		default=float(os.getenv("CLUSTER_HIERARCHY_MAX_EPS_KM", os.getenv("DBSCAN_GRAPH_MAX_EPS_KM", "1.0")))
+	)
+	cluster_hierarchy_max_eps_degrees: float = Field(default=float(os.getenv("CLUSTER_HIERARCHY_MAX_EPS_DEGREES", "0.01")))
+	# Fitted OPTICS/HDBSCAN hierarchies kept in memory (one per dataset, algorithm and min_samples)
+	hierarchy_cache_entries: int = Field(default=int(os.getenv("HIERARCHY_CACHE_ENTRIES", "4")))
+	# Datasets whose BallTree / radius graph is kept in memory
+	neighbor_cache_entries: int = Field(default=int(os.getenv("NEIGHBOR_CACHE_ENTRIES", "4")))
+	# Datasets whose density pyramid is kept in memory
+	density_cache_entries: int = Field(default=int(os.getenv("DENSITY_CACHE_ENTRIES", "8")))
+	# Finest density pyramid cell (degrees); grid sizes of this times a power of two skip the point scan. 0 disables.
+	density_pyramid_base_cell: float = Field(default=float(os.getenv("DENSITY_PYRAMID_BASE_CELL", "0.000625")))
+	# Upper bound on KDE raster size (at least 9); coarser cells are used beyond it
+	kde_max_cells: int = Field(default=int(os.getenv("KDE_MAX_CELLS", str(1 << 20))))
+	# Ripley's K: points beyond which a random subsample (with bootstrap bands) is used
+	ripley_max_points: int = Field(default=int(os.getenv("RIPLEY_MAX_POINTS", "2000")))
+	ripley_bootstrap: int = Field(default=int(os.getenv("RIPLEY_BOOTSTRAP", "200")))
+	# Vector tiles: points per tile before thinning, and the encoded-tile LRU budget
+	tile_max_points: int = Field(default=int(os.getenv("TILE_MAX_POINTS", "20000")))
+	tile_cache_max_bytes: int = Field(default=int(os.getenv("TILE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+	# Datasets whose tile index is kept in memory
+	tile_index_cache_entries: int = Field(default=int(os.getenv("TILE_INDEX_CACHE_ENTRIES", "8")))
+	analysis_cache_disk_max_bytes: int = Field(default=int(os.getenv("ANALYSIS_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024))))
 	@property
 	def access_token_expires(self) -> timedelta:
 		return timedelta(minutes=self.access_token_expire_minutes)
@@ -19,6 +19,7 @@ class User(Base):
 	analysis_runs = relationship("AnalysisRun", back_populates="owner", cascade="all, delete-orphan")
 	places = relationship("Place", back_populates="owner", cascade="all, delete-orphan")
 	ai_usage = relationship("AIUsage", back_populates="owner", cascade="all, delete-orphan")
+	analysis_jobs = relationship("AnalysisJob", back_populates="owner", cascade="all, delete-orphan")
 
 
 class Dataset(Base):
@@ -35,6 +36,7 @@ class Dataset(Base):
 
 	owner = relationship("User", back_populates="datasets")
 	analysis_runs = relationship("AnalysisRun", back_populates="dataset", cascade="all, delete-orphan")
+	analysis_jobs = relationship("AnalysisJob", back_populates="dataset", cascade="all, delete-orphan")
 
 
 class AnalysisRun(Base):
@@ -79,3 +81,33 @@ class AIUsage(Base):
 	owner = relationship("User", back_populates="ai_usage")
 
 
+class AnalysisJob(Base):
+	__tablename__ = "analysis_jobs"
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+	dataset_id: Mapped[int] = mapped_column(ForeignKey("datasets.id", ondelete="CASCADE"), nullable=False, index=True)
+	user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+	params_json: Mapped[str] = mapped_column(Text, nullable=False)
+	status: Mapped[str] = mapped_column(String(16), nullable=False, default="queued")  # queued | running | succeeded | failed
+	stage: Mapped[str | None] = mapped_column(String(32), nullable=True)
+	progress: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+	error: Mapped[str | None] = mapped_column(Text, nullable=True)
+	analysis_run_id: Mapped[int | None] = mapped_column(ForeignKey("analysis_runs.id", ondelete="SET NULL"), nullable=True)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+	started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+	finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+	# API worker that accepted the job, and when it last confirmed the job is still in its queue
+	worker_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
+	heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+	dataset = relationship("Dataset", back_populates="analysis_jobs")
+	owner = relationship("User", back_populates="analysis_jobs")
+
+
+class InsightCacheEntry(Base):
+	__tablename__ = "insight_cache"
+
+	prompt_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+	insight_json: Mapped[str] = mapped_column(Text, nullable=False)
+	model: Mapped[str] = mapped_column(String(128), nullable=False)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False, index=True)
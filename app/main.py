@@ -1,4 +1,5 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.request_id import RequestIdMiddleware
@@ -11,6 +12,19 @@ from app.core.config import settings
 # Import models to ensure they're registered with Base.metadata
 from app.db import models  # noqa: F401
 from app.routers import ai_proxy
+from app.services.ai_client import close_ai_client
+from app.services.jobs import shutdown_job_executor, start_job_monitor
+from app.services.parallel import shutdown_process_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	start_job_monitor()
+	yield
+	shutdown_job_executor()
+	shutdown_process_pool()
+	await close_ai_client()
+
 
 def create_app() -> FastAPI:
 	"""
@@ -19,7 +33,8 @@ def create_app() -> FastAPI:
 	app = FastAPI(
 		title="Geo Analytics Backend",
 		version="0.1.0",
-		description="Backend API for a geospatial analytics platform."
+		description="Backend API for a geospatial analytics platform.",
+		lifespan=lifespan,
 	)
 	app.add_middleware(RequestIdMiddleware)
 	# CORS: use configured origins (production-ready)
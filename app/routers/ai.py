@@ -3,18 +3,21 @@ AI insights router with weekly limit enforcement.
 """
 import json
 from datetime import datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Any, AsyncIterator, Dict, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.db.database import get_db
+from app.db.database import SessionLocal, get_db
 from app.db.models import AIUsage, AnalysisRun, User
 from app.routers.auth import get_current_user
 from app.schemas.ai import InsightRequest, InsightResponse
-from app.services.ai_gemini import generate_insight
+from app.services.ai_gemini import build_prompt, generate_insight_from_prompt, parse_insight_text, stream_insight_text
+from app.services.insight_cache import insight_cache, insight_cache_key
 
 router = APIRouter()
 
@@ -60,34 +63,25 @@ def check_weekly_limit(user_id: int, db: Session) -> tuple[bool, datetime | None
 	return True, None
 
 
-@router.post("/insights", response_model=InsightResponse)
-def generate_ai_insight(
-	request: InsightRequest,
-	db: Session = Depends(get_db),
-	current_user: User = Depends(get_current_user),
-):
-	"""
-	Generate AI insight from analysis result.
-	
-	Enforces weekly limit: max 1 insight per user per rolling 7 days.
-	"""
-	# Check weekly limit
-	is_allowed, retry_after = check_weekly_limit(current_user.id, db)
-	
-	if not is_allowed:
-		error_detail = "Weekly limit reached: 1 insight per user per 7 days."
-		headers = None
-		if retry_after:
-			seconds_until = int((retry_after - datetime.utcnow()).total_seconds())
-			error_detail += f" Retry after {retry_after.isoformat()} ({seconds_until} seconds)."
-			headers = {"Retry-After": str(max(1, seconds_until))}
-		
-		raise HTTPException(
-			status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-			detail=error_detail,
-			headers=headers,
-		)
+def _insight_response(insight: dict, generated_at: datetime, cached: bool) -> InsightResponse:
+	meta = {
+		"model": settings.gemini_model,
+		"generated_at": generated_at.isoformat(),
+		"limit_window_days": 7,
+		"cached": cached,
+	}
+	# Include method if available from Gemini
+	if "method" in insight:
+		meta["method"] = insight["method"]
 	
+	return InsightResponse(
+		text=insight.get("text", ""),
+		highlights=insight.get("highlights", []),
+		meta=meta,
+	)
+
+
+def _resolve_analysis_result(request: InsightRequest, db: Session, current_user: User) -> Dict[str, Any]:
 	# Get analysis result
 	analysis_result = None
 	
@@ -114,10 +108,77 @@ def generate_ai_insight(
 	
 	if not analysis_result:
 		raise HTTPException(status_code=400, detail="No analysis result available")
+	return analysis_result
+
+
+def _enforce_weekly_limit(user_id: int, db: Session) -> None:
+	is_allowed, retry_after = check_weekly_limit(user_id, db)
+	
+	if not is_allowed:
+		error_detail = "Weekly limit reached: 1 insight per user per 7 days."
+		headers = None
+		if retry_after:
+			seconds_until = int((retry_after - datetime.utcnow()).total_seconds())
+			error_detail += f" Retry after {retry_after.isoformat()} ({seconds_until} seconds)."
+			headers = {"Retry-After": str(max(1, seconds_until))}
+		
+		raise HTTPException(
+			status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+			detail=error_detail,
+			headers=headers,
+		)
+
+
+def _prepare_insight(
+	request: InsightRequest, db: Session, current_user: User
+) -> Tuple[str, str, InsightResponse | None]:
+	"""
+	Resolve the analysis result and build its prompt. Returns (prompt, cache_key, cached_response);
+	on a cache miss the weekly limit is enforced here, since only calls that reach Gemini count.
+	"""
+	analysis_result = _resolve_analysis_result(request, db, current_user)
+	
+	# Identical prompts (same analysis result + context) reuse a previous answer
+	prompt = build_prompt(analysis_result, request.context)
+	cache_key = insight_cache_key(settings.gemini_model, prompt)
+	cached = insight_cache.get(cache_key, db)
+	if cached is not None:
+		insight, generated_at = cached
+		return prompt, cache_key, _insight_response(insight, generated_at, cached=True)
+	
+	_enforce_weekly_limit(current_user.id, db)
+	return prompt, cache_key, None
+
+
+def _record_insight(cache_key: str, insight: Dict[str, Any], user_id: int, db: Session) -> datetime:
+	generated_at = insight_cache.put(cache_key, insight, settings.gemini_model, db)
+	
+	# Record usage
+	usage = AIUsage(user_id=user_id, action="insight")
+	db.add(usage)
+	db.commit()
+	return generated_at
+
+
+@router.post("/insights", response_model=InsightResponse)
+def generate_ai_insight(
+	request: InsightRequest,
+	db: Session = Depends(get_db),
+	current_user: User = Depends(get_current_user),
+):
+	"""
+	Generate AI insight from analysis result.
+	
+	Enforces weekly limit: max 1 insight per user per rolling 7 days.
+	Insights served from the insight cache don't count against it.
+	"""
+	prompt, cache_key, cached = _prepare_insight(request, db, current_user)
+	if cached is not None:
+		return cached
 	
 	# Generate insight
 	try:
-		insight = generate_insight(analysis_result, request.context)
+		insight = generate_insight_from_prompt(prompt)
 	except ValueError as e:
 		raise HTTPException(status_code=500, detail=f"AI service configuration error: {str(e)}")
 	except RuntimeError as e:
@@ -125,24 +186,54 @@ def generate_ai_insight(
 	except Exception as e:
 		raise HTTPException(status_code=500, detail=f"Failed to generate insight: {str(e)}")
 	
-	# Record usage
-	usage = AIUsage(user_id=current_user.id, action="insight")
-	db.add(usage)
-	db.commit()
+	generated_at = _record_insight(cache_key, insight, current_user.id, db)
+	return _insight_response(insight, generated_at, cached=False)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+	return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/insights/stream")
+async def stream_ai_insight(
+	request: InsightRequest,
+	db: Session = Depends(get_db),
+	current_user: User = Depends(get_current_user),
+):
+	"""
+	Same as POST /insights, but streams the model output as Server-Sent Events:
+	`delta` events carry text chunks as they arrive, then one `done` event with
+	the parsed InsightResponse (or an `error` event). Cache hits emit `done` only.
+	"""
+	prompt, cache_key, cached = await run_in_threadpool(_prepare_insight, request, db, current_user)
+	user_id = current_user.id
 	
-	# Return response
-	meta = {
-		"model": settings.gemini_model,
-		"generated_at": datetime.utcnow().isoformat(),
-		"limit_window_days": 7,
-	}
-	# Include method if available from Gemini
-	if "method" in insight:
-		meta["method"] = insight["method"]
+	async def events() -> AsyncIterator[str]:
+		if cached is not None:
+			yield _sse("done", cached.model_dump())
+			return
+		parts: list[str] = []
+		try:
+			async for chunk in stream_insight_text(prompt):
+				parts.append(chunk)
+				yield _sse("delta", {"text": chunk})
+			if not "".join(parts).strip():
+				raise RuntimeError("Empty response from Gemini model")
+			insight = parse_insight_text("".join(parts))
+		except (ValueError, RuntimeError) as e:
+			yield _sse("error", {"detail": f"AI service error: {str(e)}"})
+			return
+		
+		# The request's session is closed once streaming starts; record with a fresh one
+		def record() -> datetime:
+			with SessionLocal() as session:
+				return _record_insight(cache_key, insight, user_id, session)
+		
+		generated_at = await run_in_threadpool(record)
+		yield _sse("done", _insight_response(insight, generated_at, cached=False).model_dump())
 	
-	return InsightResponse(
-		text=insight.get("text", ""),
-		highlights=insight.get("highlights", []),
-		meta=meta,
+	return StreamingResponse(
+		events(),
+		media_type="text/event-stream",
+		headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
 	)
-
@@ -1,13 +1,26 @@
-import requests
 import logging
+import httpx
 from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from app.core.config import settings
+from app.services.ai_client import get_ai_client
 
 router = APIRouter()
 log = logging.getLogger("proxy_ai")
 
 @router.post("/insights")
 async def proxy_ai_insights(request: Request):
+    return await _forward(request, "/ai/insights")
+
+
+@router.post("/insights/stream")
+async def proxy_ai_insights_stream(request: Request):
+    # SSE passes through chunk by chunk, so the caller sees tokens as the AI service emits them
+    return await _forward(request, "/ai/insights/stream")
+
+
+async def _forward(request: Request, path: str):
     if not settings.ai_service_url:
         raise HTTPException(status_code=500, detail="AI_SERVICE_URL not set")
 
@@ -24,20 +37,32 @@ async def proxy_ai_insights(request: Request):
     if rid:
         headers["X-Request-ID"] = rid
 
-    url = f"{settings.ai_service_url}/ai/insights"
+    url = f"{settings.ai_service_url}{path}"
     log.info("Forwarding AI request", extra={"request_id": rid, "url": url})
 
+    client = get_ai_client()
     try:
-        r = requests.post(url, json=payload, headers=headers, timeout=60)
-    except Exception as e:
+        r = await client.send(client.build_request("POST", url, json=payload, headers=headers), stream=True)
+    except httpx.HTTPError as e:
         log.exception("AI service unreachable", extra={"request_id": rid})
         raise HTTPException(status_code=502, detail=f"AI service unreachable: {e}")
 
     if r.status_code >= 400:
+        try:
+            body = (await r.aread()).decode("utf-8", errors="replace")
+        finally:
+            await r.aclose()
         log.warning(
             "AI service error",
-            extra={"request_id": rid, "status_code": r.status_code, "body": r.text[:1000]},
+            extra={"request_id": rid, "status_code": r.status_code, "body": body[:1000]},
         )
-        raise HTTPException(status_code=r.status_code, detail=r.text)
+        raise HTTPException(status_code=r.status_code, detail=body)
 
-    return r.json()
+    # Relay the body as it arrives; the upstream connection goes back to the pool once it is drained.
+    return StreamingResponse(
+        r.aiter_bytes(),
+        status_code=r.status_code,
+        media_type=r.headers.get("content-type", "application/json"),
+        headers={"Cache-Control": r.headers["cache-control"]} if "cache-control" in r.headers else None,
+        background=BackgroundTask(r.aclose),
+    )
@@ -1,30 +1,21 @@
 from __future__ import annotations
-import json
+from datetime import datetime
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.db.database import get_db
-from app.db.models import AnalysisRun, Dataset, User
+from app.db.models import AnalysisJob, AnalysisRun, Dataset, User
 from app.routers.auth import get_current_user
-from app.schemas.analysis import AnalyzeParams, AnalysisRunOut
-from app.services.analysis import compute_summary, dbscan_clustering, grid_density
-from app.services.parsing import parse_csv_points, parse_geojson_points
+from app.schemas.analysis import AnalysisJobOut, AnalyzeParams, AnalysisRunOut
+from app.services.jobs import WORKER_ID as JOB_WORKER_ID, submit_analysis_job
+from app.services.pipeline import analyze_dataset_cached
 
 
 router = APIRouter()
 
 
-def _load_points_for_dataset(dataset: Dataset) -> list[dict]:
-	with open(dataset.storage_path, "rb") as f:
-		content = f.read()
-	if dataset.file_type == "csv":
-		return parse_csv_points(content)
-	else:
-		return parse_geojson_points(content)
-
-
 @router.post("/{dataset_id}/analyze", response_model=AnalysisRunOut)
 def analyze_dataset(
 	dataset_id: int,
@@ -36,33 +27,60 @@ def analyze_dataset(
 	if not dataset:
 		raise HTTPException(status_code=404, detail="Dataset not found")
 
-	points = _load_points_for_dataset(dataset)
-	if not points:
-		raise HTTPException(status_code=400, detail="No points to analyze")
-
-	summary = compute_summary(points, category_field=params.category_field)
-	grid = grid_density(points, grid_cell_size=params.grid_cell_size)
-
-	eps_km = params.dbscan_eps_km
-	eps_deg = params.dbscan_eps
-	clusters = dbscan_clustering(points, eps_km=eps_km, min_samples=params.dbscan_min_samples, eps_degrees=eps_deg)
-
-	result = {
-		"summary": summary,
-		"grid_density": grid,
-		"clustering": clusters,
-	}
+	try:
+		result_json, cache_hit = analyze_dataset_cached(dataset, params)
+	except ValueError as e:
+		raise HTTPException(status_code=400, detail=str(e))
 
 	run = AnalysisRun(
 		dataset_id=dataset.id,
 		user_id=current_user.id,
 		params_json=params.model_dump_json(),
-		result_json=json.dumps(result),
+		result_json=result_json,
 	)
 	db.add(run)
 	db.commit()
 	db.refresh(run)
-	return run
+	return AnalysisRunOut.model_validate(run).model_copy(update={"cache_hit": cache_hit})
+
+
+@router.post("/{dataset_id}/jobs", response_model=AnalysisJobOut, status_code=202)
+def create_analysis_job(
+	dataset_id: int,
+	params: AnalyzeParams,
+	db: Session = Depends(get_db),
+	current_user: User = Depends(get_current_user),
+):
+	"""
+	Queue an analysis and return immediately. Poll GET /analysis/jobs/{job_id}
+	until status is "succeeded" (then fetch analysis_run_id) or "failed".
+	"""
+	dataset = db.query(Dataset).filter(Dataset.id == dataset_id, Dataset.user_id == current_user.id).first()
+	if not dataset:
+		raise HTTPException(status_code=404, detail="Dataset not found")
+
+	job = AnalysisJob(
+		dataset_id=dataset.id,
+		user_id=current_user.id,
+		params_json=params.model_dump_json(),
+		status="queued",
+		progress=0.0,
+		worker_id=JOB_WORKER_ID,
+		heartbeat_at=datetime.utcnow(),
+	)
+	db.add(job)
+	db.commit()
+	db.refresh(job)
+	submit_analysis_job(job.id)
+	return job
+
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJobOut)
+def get_analysis_job(job_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+	job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id, AnalysisJob.user_id == current_user.id).first()
+	if not job:
+		raise HTTPException(status_code=404, detail="Analysis job not found")
+	return job
 
 
 @router.get("/{analysis_run_id}", response_model=AnalysisRunOut)
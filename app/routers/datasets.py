@@ -2,9 +2,10 @@ from __future__ import annotations
 import json
 import os
 import secrets
-from typing import Annotated
+from typing import Annotated, BinaryIO, Dict, Literal, Optional, Tuple
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
@@ -12,7 +13,13 @@ from app.db.database import get_db
 from app.db.models import Dataset, User
 from app.routers.auth import get_current_user
 from app.schemas.datasets import DatasetList, DatasetOut, UploadResponse
-from app.services.parsing import compute_bbox, parse_csv_points, parse_geojson_points
+from app.services.analysis import grid_density
+from app.services.density import density_cache
+from app.services.parsing import compute_bbox, iter_csv_points, parse_geojson_points
+from app.services.point_store import HashingTee, store_dir_for, write_point_store
+from app.services.pipeline import dataset_content_hash, load_points_for_dataset
+from app.services.points import PointSetBuilder
+from app.services.tiles import MAX_ZOOM, MVT_MEDIA_TYPE, tile_cache, tile_etag
 
 
 router = APIRouter()
@@ -22,6 +29,43 @@ def ensure_upload_dir() -> None:
 	os.makedirs(settings.upload_dir, exist_ok=True)
 
 
+def _ingest_upload(src: BinaryIO, ext: str, storage_path: str) -> Tuple[str, int, Dict[str, float]]:
+	"""
+	Parse an upload while streaming it to `storage_path`, then write its columnar store.
+	Blocking; returns (file_type, n_points, bbox).
+	"""
+	try:
+		with open(storage_path, "wb") as f:
+			tee = HashingTee(src, copy_to=f)
+			if ext == ".csv":
+				# Stream straight off the upload spool into compact columns; no per-row dicts are kept.
+				builder = PointSetBuilder()
+				for p in iter_csv_points(tee):
+					builder.append(p["lat"], p["lon"], p["attributes"])
+				point_set = builder.build()
+				file_type = "csv"
+			else:
+				point_set = parse_geojson_points(tee.read())
+				file_type = "geojson"
+			content_hash = tee.hexdigest()
+		if not len(point_set):
+			raise ValueError("No valid points found in file")
+		# Columnar sidecar so analyses can memory-map points instead of re-parsing the file
+		write_point_store(store_dir_for(storage_path), point_set, content_hash=content_hash)
+	except BaseException:
+		if os.path.exists(storage_path):
+			os.remove(storage_path)
+		raise
+	return file_type, len(point_set), compute_bbox(point_set)
+
+
+def _create_dataset(db: Session, dataset: Dataset) -> Dataset:
+	db.add(dataset)
+	db.commit()
+	db.refresh(dataset)
+	return dataset
+
+
 @router.post("/upload", response_model=UploadResponse)
 async def upload_dataset(
 	file: UploadFile = File(...),
@@ -34,37 +78,25 @@ async def upload_dataset(
 	if ext not in [".csv", ".geojson", ".json"]:
 		raise HTTPException(status_code=400, detail="Unsupported file type. Use CSV or GeoJSON.")
 
-	content = await file.read()
-	if ext == ".csv":
-		points = parse_csv_points(content)
-		file_type = "csv"
-	else:
-		points = parse_geojson_points(content)
-		file_type = "geojson"
-
-	if not points:
-		raise HTTPException(status_code=400, detail="No valid points found in file")
-
-	bbox = compute_bbox(points)
-
-	# Save file
 	random_suffix = secrets.token_hex(8)
 	storage_name = f"{current_user.id}_{random_suffix}{ext}"
 	storage_path = os.path.join(settings.upload_dir, storage_name)
-	with open(storage_path, "wb") as f:
-		f.write(content)
+	await file.seek(0)
+	# Parsing, disk writes and the DB commit are all blocking; keep them off the event loop.
+	try:
+		file_type, n_points, bbox = await run_in_threadpool(_ingest_upload, file.file, ext, storage_path)
+	except ValueError as e:
+		raise HTTPException(status_code=400, detail=str(e))
 
 	dataset = Dataset(
 		user_id=current_user.id,
 		filename=filename,
 		file_type=file_type,
 		storage_path=storage_path,
-		n_points=len(points),
+		n_points=n_points,
 		bbox_json=json.dumps(bbox),
 	)
-	db.add(dataset)
-	db.commit()
-	db.refresh(dataset)
+	dataset = await run_in_threadpool(_create_dataset, db, dataset)
 
 	return UploadResponse(
 		dataset_id=dataset.id,
@@ -86,3 +118,75 @@ def list_datasets(db: Session = Depends(get_db), current_user: User = Depends(ge
 	return DatasetList(items=items)
 
 
+@router.get("/{dataset_id}/density")
+def get_dataset_density(
+	dataset_id: int,
+	grid_cell_size: float = Query(default=0.01, gt=0),
+	encoding: Literal["cells", "sparse", "dense"] = Query(default="cells"),
+	db: Session = Depends(get_db),
+	current_user: User = Depends(get_current_user),
+):
+	"""
+	grid_density for any cell size, answered from the dataset's density pyramid
+	without rescanning the points. `approximate` is true when the size is not
+	an exact pyramid level (base cell times a power of two); sizes below the
+	base cell are binned from the points exactly.
+	"""
+	dataset = db.query(Dataset).filter(Dataset.id == dataset_id, Dataset.user_id == current_user.id).first()
+	if not dataset:
+		raise HTTPException(status_code=404, detail="Dataset not found")
+	if not dataset.n_points:
+		raise HTTPException(status_code=400, detail="No points in dataset")
+	pyramid = None
+	if grid_cell_size >= settings.density_pyramid_base_cell:
+		pyramid = density_cache.get(
+			dataset_content_hash(dataset),
+			lambda: load_points_for_dataset(dataset),
+			store_dir=store_dir_for(dataset.storage_path),
+		)
+	if pyramid is None:
+		points = load_points_for_dataset(dataset)
+		if not len(points):
+			raise HTTPException(status_code=400, detail="No points in dataset")
+		return {**grid_density(points, grid_cell_size=grid_cell_size, encoding=encoding), "approximate": False}
+	result, exact = pyramid.grid_density(grid_cell_size, encoding=encoding)
+	return {**result, "approximate": not exact}
+
+
+@router.get("/{dataset_id}/tiles/{z}/{x}/{y}")
+def get_dataset_tile(
+	dataset_id: int,
+	z: int,
+	x: int,
+	y: int,
+	request: Request,
+	fields: Optional[str] = Query(default=None, description="Comma-separated attribute columns to include as feature properties."),
+	db: Session = Depends(get_db),
+	current_user: User = Depends(get_current_user),
+):
+	"""Mapbox Vector Tile (layer "points") of a dataset's points; 204 when the tile is empty."""
+	if not (0 <= z <= MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)):
+		raise HTTPException(status_code=400, detail="Invalid tile coordinates")
+	dataset = db.query(Dataset).filter(Dataset.id == dataset_id, Dataset.user_id == current_user.id).first()
+	if not dataset:
+		raise HTTPException(status_code=404, detail="Dataset not found")
+
+	field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else []
+	content_hash = dataset_content_hash(dataset)
+	etag = tile_etag(content_hash, z, x, y, field_list)
+	headers = {"ETag": etag, "Cache-Control": "private, max-age=3600"}
+	if request.headers.get("if-none-match") == etag:
+		return Response(status_code=304, headers=headers)
+
+	tile = tile_cache.get_tile(
+		content_hash,
+		lambda: load_points_for_dataset(dataset),
+		z,
+		x,
+		y,
+		fields=field_list,
+		store_dir=store_dir_for(dataset.storage_path),
+	)
+	if not tile:
+		return Response(status_code=204, headers=headers)
+	return Response(content=tile, media_type=MVT_MEDIA_TYPE, headers=headers)
@@ -1,14 +1,93 @@
 from datetime import datetime
-from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional, Tuple
+from pydantic import BaseModel, Field, PositiveFloat, model_validator
+
+
+class SampleParams(BaseModel):
+	size: Optional[int] = Field(default=None, ge=1, description="Number of points to sample.")
+	fraction: Optional[float] = Field(default=None, gt=0, le=1, description="Share of points to sample.")
+	seed: int = Field(default=0, description="Seed; the same seed and dataset give the same sample.")
+	method: Literal["reservoir", "stratified"] = Field(
+		default="reservoir",
+		description="reservoir: uniform over rows; stratified: proportional per grid_cell_size cell.",
+	)
+
+	@model_validator(mode="after")
+	def _one_of_size_or_fraction(self) -> "SampleParams":
+		if (self.size is None) == (self.fraction is None):
+			raise ValueError("Set exactly one of size or fraction")
+		return self
+
+
+class BBoxParams(BaseModel):
+	min_lat: float = Field(ge=-90, le=90)
+	max_lat: float = Field(ge=-90, le=90)
+	min_lon: float = Field(ge=-180, le=180)
+	max_lon: float = Field(ge=-180, le=180)
+
+	@model_validator(mode="after")
+	def _ordered(self) -> "BBoxParams":
+		if self.min_lat > self.max_lat or self.min_lon > self.max_lon:
+			raise ValueError("bbox minimums must not exceed maximums")
+		return self
+
+	def bounds(self) -> Tuple[float, float, float, float]:
+		return self.min_lat, self.max_lat, self.min_lon, self.max_lon
 
 
 class AnalyzeParams(BaseModel):
 	grid_cell_size: float = Field(default=0.01, gt=0)
+	grid_encoding: Literal["cells", "sparse", "dense"] = Field(
+		default="cells",
+		description="cells: bbox dict per cell; sparse: origin + parallel i/j/counts arrays; dense: count matrix for small grids.",
+	)
+	kde_bandwidth_km: Optional[float] = Field(
+		default=None, gt=0, description="Gaussian bandwidth (km) of the KDE heatmap stage; unset skips the stage."
+	)
+	kde_cell_size: Optional[float] = Field(
+		default=None, gt=0, description="KDE raster cell size in degrees (defaults to grid_cell_size)."
+	)
+	hotspots: bool = Field(
+		default=False, description="Run Getis-Ord Gi* over the grid_cell_size grid and return significant cells under hotspots."
+	)
+	nearest_neighbor: bool = Field(
+		default=False, description="Return average nearest-neighbor distance and the Clark-Evans ratio under nearest_neighbor."
+	)
+	ripley_distances_km: Optional[List[PositiveFloat]] = Field(
+		default=None,
+		max_length=20,
+		description="Distance bands (km) for Ripley's K/L, returned under ripley; unset skips the stage.",
+	)
+	bbox: Optional[BBoxParams] = Field(
+		default=None, description="Analyze only points inside this box (e.g. the map viewport_bbox)."
+	)
+	polygon: Optional[List[Tuple[float, float]]] = Field(
+		default=None,
+		min_length=3,
+		max_length=1000,
+		description="Analyze only points inside this ring of [lon, lat] vertices (GeoJSON order); combines with bbox.",
+	)
+	sample: Optional[SampleParams] = Field(
+		default=None,
+		description="Analyze a seeded sample instead of every point; stages report scale factors and error bounds.",
+	)
+	density_mode: Literal["grid", "hexbin"] = Field(
+		default="grid",
+		description="grid: square cells with bboxes; hexbin: axial hex cells (circumradius grid_cell_size) as q/r/counts arrays.",
+	)
 	dbscan_eps: Optional[float] = Field(default=None, gt=0, description="Neighborhood radius in degrees (optional).")
 	dbscan_eps_km: Optional[float] = Field(default=1.0, gt=0, description="Neighborhood radius in kilometers (preferred).")
 	dbscan_min_samples: int = Field(default=5, ge=1)
 	category_field: Optional[str] = Field(default="category")
+	algorithm: Literal["dbscan", "optics", "hdbscan"] = Field(
+		default="dbscan",
+		description="dbscan, or optics/hdbscan: one hierarchy fitted per dataset and cut at dbscan_eps_km.",
+	)
+	cluster_levels_km: Optional[List[PositiveFloat]] = Field(
+		default=None,
+		max_length=10,
+		description="Extra eps values (km) to extract flat clusterings at, returned under clustering.levels.",
+	)
 
 
 class AnalysisRunOut(BaseModel):
@@ -18,6 +97,23 @@ class AnalysisRunOut(BaseModel):
 	params_json: str
 	result_json: str
 	created_at: datetime
+	cache_hit: bool = Field(default=False, description="True when result_json was served from the result cache.")
+
+	class Config:
+		from_attributes = True
+
+
+class AnalysisJobOut(BaseModel):
+	id: int
+	dataset_id: int
+	status: str
+	stage: Optional[str] = None
+	progress: float
+	error: Optional[str] = None
+	analysis_run_id: Optional[int] = None
+	created_at: datetime
+	started_at: Optional[datetime] = None
+	finished_at: Optional[datetime] = None
 
 	class Config:
 		from_attributes = True
@@ -0,0 +1,40 @@
+"""
+Shared async HTTP client for calls from the main backend to the AI service.
+
+One client per process keeps connections to the AI service alive across
+requests; it is created on first use and closed from the app lifespan.
+"""
+from __future__ import annotations
+
+import httpx
+
+from app.core.config import settings
+
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_ai_client() -> httpx.AsyncClient:
+	global _client
+	if _client is None:
+		_client = httpx.AsyncClient(
+			base_url=settings.ai_service_url or "",
+			limits=httpx.Limits(
+				max_connections=settings.ai_proxy_max_connections,
+				max_keepalive_connections=settings.ai_proxy_max_keepalive,
+			),
+			timeout=httpx.Timeout(
+				connect=settings.ai_proxy_connect_timeout,
+				read=settings.ai_proxy_read_timeout,
+				write=settings.ai_proxy_write_timeout,
+				pool=settings.ai_proxy_pool_timeout,
+			),
+		)
+	return _client
+
+
+async def close_ai_client() -> None:
+	global _client
+	if _client is not None:
+		client, _client = _client, None
+		await client.aclose()
@@ -1,10 +1,13 @@
 """
 Gemini AI service for generating insights from analysis results.
 """
+import asyncio
 import json
-import os
+import logging
 import re
-from typing import Any, Dict
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Tuple
 
 try:
 	import google.generativeai as genai
@@ -16,6 +19,9 @@ except ImportError:
 from app.core.config import settings
 
 
+log = logging.getLogger("ai_gemini")
+
+
 def _get_available_models() -> list[str]:
 	"""
 	List available Gemini models for generateContent.
@@ -28,7 +34,7 @@ def _get_available_models() -> list[str]:
 		return []
 	
 	try:
-		genai.configure(api_key=settings.gemini_api_key)
+		_configure()
 		models = genai.list_models()
 		
 		available = []
@@ -73,6 +79,96 @@ def _find_working_model(preferred: str) -> str:
 	return available[0] if available else preferred
 
 
+_SAFETY_SETTINGS = None
+if GEMINI_AVAILABLE:
+	_SAFETY_SETTINGS = {
+		HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+		HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+		HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+		HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+	}
+
+_configured_key: str | None = None
+_model_lock = threading.Lock()
+# (model_name, model, monotonic expiry); rebuilt after settings.gemini_model_cache_ttl seconds
+_model_cache: Tuple[str, Any, float] | None = None
+
+
+def _configure() -> None:
+	"""Configure the genai client once per API key rather than on every call."""
+	global _configured_key
+	if _configured_key != settings.gemini_api_key:
+		genai.configure(api_key=settings.gemini_api_key)
+		_configured_key = settings.gemini_api_key
+
+
+def _create_model() -> Tuple[str, Any]:
+	"""Resolve the model name against the API and build its GenerativeModel, falling back to known names."""
+	model_name = _find_working_model(settings.gemini_model)
+	try:
+		return model_name, genai.GenerativeModel(model_name=model_name, safety_settings=_SAFETY_SETTINGS)
+	except Exception as e:
+		last_error = str(e)
+
+	# Try fallback models, both with and without the models/ prefix
+	fallback_models = ["gemini-1.5-pro", "gemini-1.0-pro", "gemini-pro"]
+	for fallback in fallback_models:
+		for variant in [fallback, f"models/{fallback}"]:
+			try:
+				return variant, genai.GenerativeModel(model_name=variant, safety_settings=_SAFETY_SETTINGS)
+			except Exception:
+				continue
+
+	available_models = _get_available_models()
+	available_str = ", ".join(available_models[:5]) if available_models else "none found"
+	raise RuntimeError(
+		f"Failed to initialize Gemini model. Original error: {last_error}. "
+		f"Tried: {settings.gemini_model}, {model_name}, and fallbacks. "
+		f"Available models: {available_str}"
+	)
+
+
+def get_model() -> Tuple[str, Any]:
+	"""
+	Return the cached (model_name, GenerativeModel), resolving it on first use
+	and again once the TTL lapses. A failed refresh keeps serving the previous model.
+	"""
+	global _model_cache
+	if not GEMINI_AVAILABLE:
+		raise RuntimeError("google-generativeai package not installed")
+	if not settings.gemini_api_key:
+		raise ValueError("GEMINI_API_KEY not configured")
+
+	cached = _model_cache
+	if cached is not None and cached[2] > time.monotonic():
+		return cached[0], cached[1]
+	with _model_lock:
+		cached = _model_cache
+		if cached is not None and cached[2] > time.monotonic():
+			return cached[0], cached[1]
+		try:
+			_configure()
+			model_name, model = _create_model()
+		except Exception:
+			if cached is None:
+				raise
+			log.warning("Gemini model refresh failed; keeping %s", cached[0], exc_info=True)
+			model_name, model = cached[0], cached[1]
+		_model_cache = (model_name, model, time.monotonic() + settings.gemini_model_cache_ttl)
+		return model_name, model
+
+
+def warm_model_cache() -> None:
+	"""Resolve the model at startup so the first insight request doesn't pay for discovery."""
+	if not GEMINI_AVAILABLE or not settings.gemini_api_key:
+		return
+	try:
+		model_name, _ = get_model()
+		log.info("Gemini model resolved: %s", model_name)
+	except Exception:
+		log.warning("Gemini model resolution failed at startup; will retry on first request", exc_info=True)
+
+
 def generate_insight(analysis_result: Dict[str, Any], context: Dict[str, Any] | None = None) -> Dict[str, Any]:
 	"""
 	Generate AI insight from analysis result using Gemini.
@@ -84,78 +180,22 @@ def generate_insight(analysis_result: Dict[str, Any], context: Dict[str, Any] |
 	Returns:
 		Dict with 'text', 'highlights', and 'method' keys
 	"""
+	return generate_insight_from_prompt(build_prompt(analysis_result, context))
+
+
+def generate_insight_from_prompt(prompt: str) -> Dict[str, Any]:
+	"""Run a prompt from build_prompt through Gemini and parse the insight out of the reply."""
 	if not GEMINI_AVAILABLE:
 		raise RuntimeError("google-generativeai package not installed")
 	
 	if not settings.gemini_api_key:
 		raise ValueError("GEMINI_API_KEY not configured")
 	
-	genai.configure(api_key=settings.gemini_api_key)
-	
-	# Find a working model by checking available models
-	model_name = _find_working_model(settings.gemini_model)
-	
-	# Try to create model
-	try:
-		model = genai.GenerativeModel(
-			model_name=model_name,
-			safety_settings={
-				HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-				HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-				HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-				HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-			},
-		)
-	except Exception as e:
-		# If still fails, try fallback models
-		fallback_models = ["gemini-1.5-pro", "gemini-1.0-pro", "gemini-pro"]
-		model = None
-		last_error = str(e)
-		
-		for fallback in fallback_models:
-			try:
-				# Try both with and without models/ prefix
-				for variant in [fallback, f"models/{fallback}"]:
-					try:
-						model = genai.GenerativeModel(
-							model_name=variant,
-							safety_settings={
-								HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-								HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-								HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-								HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-							},
-						)
-						model_name = variant
-						break
-					except Exception:
-						continue
-				if model:
-					break
-			except Exception:
-				continue
-		
-		if model is None:
-			available_models = _get_available_models()
-			available_str = ", ".join(available_models[:5]) if available_models else "none found"
-			raise RuntimeError(
-				f"Failed to initialize Gemini model. Original error: {last_error}. "
-				f"Tried: {settings.gemini_model}, {model_name}, and fallbacks. "
-				f"Available models: {available_str}"
-			)
-	
-	# Build prompt
-	prompt = _build_prompt(analysis_result, context)
+	_, model = get_model()
 	
 	# Generate response
 	try:
-		response = model.generate_content(
-			prompt,
-			generation_config={
-				"temperature": 0.7,
-				"max_output_tokens": max(settings.ai_max_output_tokens, 1000),  # Ensure at least 1000 tokens
-			},
-		)
+		response = model.generate_content(prompt, generation_config=_generation_config())
 	except Exception as e:
 		raise RuntimeError(f"Failed to generate content from Gemini: {str(e)}")
 	
@@ -163,9 +203,42 @@ def generate_insight(analysis_result: Dict[str, Any], context: Dict[str, Any] |
 	if not hasattr(response, 'text') or not response.text:
 		raise RuntimeError("Empty response from Gemini model")
 	
+	return parse_insight_text(response.text)
+
+
+async def stream_insight_text(prompt: str) -> AsyncIterator[str]:
+	"""
+	Stream the raw model output for `prompt` chunk by chunk via the SDK's async API.
+	Feed the concatenated chunks to parse_insight_text for the structured insight.
+	"""
+	# Resolving the model may list models over the network; keep it off the event loop.
+	_, model = await asyncio.to_thread(get_model)
+	try:
+		response = await model.generate_content_async(prompt, generation_config=_generation_config(), stream=True)
+		async for chunk in response:
+			try:
+				text = chunk.text
+			except ValueError:
+				# Chunk without text parts (e.g. only safety metadata)
+				continue
+			if text:
+				yield text
+	except Exception as e:
+		raise RuntimeError(f"Failed to generate content from Gemini: {str(e)}")
+
+
+def _generation_config() -> Dict[str, Any]:
+	return {
+		"temperature": 0.7,
+		"max_output_tokens": max(settings.ai_max_output_tokens, 1000),  # Ensure at least 1000 tokens
+	}
+
+
+def parse_insight_text(raw_text: str) -> Dict[str, Any]:
+	"""Extract {text, highlights, method} from the model output, tolerating markdown and truncated JSON."""
 	# Get the complete response text
 	# Handle cases where response might be truncated
-	text = response.text.strip()
+	text = raw_text.strip()
 	
 	# Check if response was truncated (Gemini sometimes returns incomplete JSON)
 	# If the text doesn't end with }, try to get more
@@ -319,7 +392,7 @@ def generate_insight(analysis_result: Dict[str, Any], context: Dict[str, Any] |
 	return result
 
 
-def _build_prompt(analysis_result: Dict[str, Any], context: Dict[str, Any] | None = None) -> str:
+def build_prompt(analysis_result: Dict[str, Any], context: Dict[str, Any] | None = None) -> str:
 	"""Build the prompt for Gemini."""
 	
 	summary = analysis_result.get("summary", {})
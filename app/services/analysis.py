@@ -1,21 +1,26 @@
 from __future__ import annotations
 from typing import Any, Dict, List, Tuple
-from collections import Counter, defaultdict
+from collections import defaultdict
+from dataclasses import dataclass
 import math
 
 import numpy as np
-from sklearn.cluster import DBSCAN
+from scipy import signal, sparse
+from sklearn.cluster import DBSCAN, HDBSCAN, OPTICS, cluster_optics_dbscan
+from sklearn.neighbors import BallTree
+
+from app.services.points import PointSet
 
 
 EARTH_RADIUS_KM = 6371.0088
 
 
-def compute_summary(points: List[Dict[str, Any]], category_field: str | None = "category") -> Dict[str, Any]:
+def compute_summary(points: PointSet, category_field: str | None = "category") -> Dict[str, Any]:
 	n = len(points)
 	if n == 0:
 		return {"total_points": 0, "bbox": None, "mean_center": None, "category_counts": {}}
-	lats = np.array([p["lat"] for p in points], dtype=float)
-	lons = np.array([p["lon"] for p in points], dtype=float)
+	lats = np.asarray(points.lat, dtype=float)
+	lons = np.asarray(points.lon, dtype=float)
 	bbox = {
 		"min_lat": float(lats.min()),
 		"max_lat": float(lats.max()),
@@ -24,68 +29,512 @@ def compute_summary(points: List[Dict[str, Any]], category_field: str | None = "
 	}
 	mean_center = {"lat": float(lats.mean()), "lon": float(lons.mean())}
 	category_counts: Dict[str, int] = {}
-	if category_field:
-		values = []
-		for p in points:
-			attrs = p.get("attributes") or {}
-			if category_field in attrs:
-				values.append(str(attrs[category_field]))
-		category_counts = dict(Counter(values))
+	if category_field and category_field in points.columns:
+		col = points.columns[category_field]
+		codes = np.asarray(col.codes)
+		counts = np.bincount(codes[codes >= 0], minlength=len(col.values))
+		# Codes are assigned in first-seen order, so this keeps Counter's ordering.
+		for value, count in zip(col.values, counts.tolist()):
+			if count:
+				key = str(value)
+				category_counts[key] = category_counts.get(key, 0) + count
 	return {"total_points": n, "bbox": bbox, "mean_center": mean_center, "category_counts": category_counts}
 
 
-def grid_density(points: List[Dict[str, Any]], grid_cell_size: float) -> Dict[str, Any]:
-	if not points:
+# Grids with at most this many cells (or one cell per point, if larger) are counted densely.
+_DENSE_GRID_MIN_CELLS = 1 << 22
+_FIRST_SEEN_CHUNK = 1 << 16
+
+
+def _first_seen_order(flat: np.ndarray, n_cells: int, n_nonempty: int) -> np.ndarray:
+	# Walk the points in chunks and record cells the first time they appear.
+	# Nearly every cell turns up early, so later chunks only cost a boolean gather.
+	seen = np.zeros(n_cells, dtype=bool)
+	parts = []
+	found = 0
+	for start in range(0, flat.shape[0], _FIRST_SEEN_CHUNK):
+		chunk = flat[start:start + _FIRST_SEEN_CHUNK]
+		fresh = chunk[~seen[chunk]]
+		if fresh.size:
+			ids, first = np.unique(fresh, return_index=True)
+			ids = ids[np.argsort(first, kind="stable")]
+			seen[ids] = True
+			parts.append(ids)
+			found += ids.size
+			if found == n_nonempty:
+				break
+	return np.concatenate(parts)
+
+
+def _bin_cells(
+	lats: np.ndarray, lons: np.ndarray, min_lat: float, min_lon: float, grid_cell_size: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+	"""
+	Assign points to square cells anchored at (min_lat, min_lon).
+	Returns row index, column index and count per non-empty cell, in the order
+	each cell is first hit by a point.
+	"""
+	i = np.floor((lats - min_lat) / grid_cell_size).astype(np.int64)
+	j = np.floor((lons - min_lon) / grid_cell_size).astype(np.int64)
+	n_rows = int(i.max()) + 1
+	n_cols = int(j.max()) + 1
+	if n_rows * n_cols >= np.iinfo(np.int64).max:
+		# Cell ids would overflow int64 (absurdly small cells); unique on (i, j) pairs instead.
+		pairs, first_seen, counts = np.unique(np.column_stack([i, j]), axis=0, return_index=True, return_counts=True)
+		order = np.argsort(first_seen, kind="stable")
+		return pairs[order, 0], pairs[order, 1], counts[order]
+
+	flat = i * n_cols + j
+	n_cells = n_rows * n_cols
+	if n_cells <= max(flat.shape[0], _DENSE_GRID_MIN_CELLS):
+		dense_counts = np.bincount(flat, minlength=n_cells)
+		cell_ids = _first_seen_order(flat, n_cells, int(np.count_nonzero(dense_counts)))
+		counts = dense_counts[cell_ids]
+	else:
+		cell_ids, first_seen, counts = np.unique(flat, return_index=True, return_counts=True)
+		order = np.argsort(first_seen, kind="stable")
+		cell_ids = cell_ids[order]
+		counts = counts[order]
+	return cell_ids // n_cols, cell_ids % n_cols, counts
+
+
+def grid_density(points: PointSet, grid_cell_size: float, encoding: str = "cells") -> Dict[str, Any]:
+	if not len(points):
 		return {"grid_cell_size": grid_cell_size, "cells": [], "bbox": None}
-	min_lat = min(p["lat"] for p in points)
-	max_lat = max(p["lat"] for p in points)
-	min_lon = min(p["lon"] for p in points)
-	max_lon = max(p["lon"] for p in points)
-
-	def cell_index(lat: float, lon: float) -> Tuple[int, int]:
-		i = int(math.floor((lat - min_lat) / grid_cell_size))
-		j = int(math.floor((lon - min_lon) / grid_cell_size))
-		return i, j
-
-	counts: Dict[Tuple[int, int], int] = defaultdict(int)
-	for p in points:
-		idx = cell_index(p["lat"], p["lon"])
-		counts[idx] += 1
-
-	cells = []
-	for (i, j), count in counts.items():
-		cell_min_lat = min_lat + i * grid_cell_size
-		cell_min_lon = min_lon + j * grid_cell_size
-		cell_max_lat = cell_min_lat + grid_cell_size
-		cell_max_lon = cell_min_lon + grid_cell_size
-		cells.append(
-			{
-				"min_lat": cell_min_lat,
-				"max_lat": cell_max_lat,
-				"min_lon": cell_min_lon,
-				"max_lon": cell_max_lon,
-				"count": count,
-			}
+	lats = np.asarray(points.lat, dtype=float)
+	lons = np.asarray(points.lon, dtype=float)
+	min_lat = float(lats.min())
+	max_lat = float(lats.max())
+	min_lon = float(lons.min())
+	max_lon = float(lons.max())
+
+	i, j, counts = _bin_cells(lats, lons, min_lat, min_lon, grid_cell_size)
+	return grid_density_result(grid_cell_size, min_lat, max_lat, min_lon, max_lon, i, j, counts, encoding=encoding)
+
+
+# Largest rows * cols grid returned as a dense matrix; bigger grids fall back to sparse.
+DENSE_GRID_MAX_CELLS = 1 << 16
+
+
+def grid_density_result(
+	grid_cell_size: float,
+	min_lat: float,
+	max_lat: float,
+	min_lon: float,
+	max_lon: float,
+	i: np.ndarray,
+	j: np.ndarray,
+	counts: np.ndarray,
+	encoding: str = "cells",
+) -> Dict[str, Any]:
+	"""
+	Format binned cells (row/column indices anchored at the bbox minimum, in
+	first-seen order) as the grid_density result.
+
+	encoding="cells" lists a bbox dict per non-empty cell. "sparse" returns
+	parallel i / j / counts arrays and "dense" a row-major n_rows x n_cols count
+	matrix (sparse if that exceeds DENSE_GRID_MAX_CELLS); cell (i, j) spans
+	origin + (i, j) * grid_cell_size to origin + (i + 1, j + 1) * grid_cell_size.
+	"""
+	bbox = {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon}
+	if encoding in ("sparse", "dense"):
+		result: Dict[str, Any] = {
+			"grid_cell_size": grid_cell_size,
+			"bbox": bbox,
+			"origin": {"lat": min_lat, "lon": min_lon},
+		}
+		n_rows = int(i.max()) + 1 if i.size else 0
+		n_cols = int(j.max()) + 1 if j.size else 0
+		if encoding == "dense" and n_rows * n_cols <= DENSE_GRID_MAX_CELLS:
+			matrix = np.zeros((n_rows, n_cols), dtype=np.int64)
+			matrix[i, j] = counts
+			result.update(encoding="dense", n_rows=n_rows, n_cols=n_cols, counts=matrix.tolist())
+		else:
+			result.update(encoding="sparse", i=i.tolist(), j=j.tolist(), counts=counts.tolist())
+		return result
+
+	cell_min_lat = min_lat + i * grid_cell_size
+	cell_min_lon = min_lon + j * grid_cell_size
+	cell_max_lat = cell_min_lat + grid_cell_size
+	cell_max_lon = cell_min_lon + grid_cell_size
+
+	cells = [
+		{
+			"min_lat": c_min_lat,
+			"max_lat": c_max_lat,
+			"min_lon": c_min_lon,
+			"max_lon": c_max_lon,
+			"count": count,
+		}
+		for c_min_lat, c_max_lat, c_min_lon, c_max_lon, count in zip(
+			cell_min_lat.tolist(),
+			cell_max_lat.tolist(),
+			cell_min_lon.tolist(),
+			cell_max_lon.tolist(),
+			counts.tolist(),
 		)
+	]
 	return {
 		"grid_cell_size": grid_cell_size,
-		"bbox": {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon},
+		"bbox": bbox,
 		"cells": cells,
 	}
 
 
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+# Kernel support in bandwidths; the Gaussian mass beyond it is < 0.3%.
+_KDE_RADIUS_BANDWIDTHS = 3.0
+
+
+def kde_heatmap(points: PointSet, cell_size: float, bandwidth_km: float, max_cells: int = 1 << 20) -> Dict[str, Any]:
+	"""
+	Gaussian kernel density raster: points are binned with the grid_density
+	binning, then the count grid is convolved with the kernel by FFT, so the
+	cost is O(cells log cells) regardless of n. The raster is padded by the
+	kernel radius; if it would exceed `max_cells` the cell size is doubled
+	until it fits (at least 3 x 3 cells are always allowed, since the kernel
+	never shrinks below one cell of padding). `values` is a row-major n_rows x n_cols matrix of points
+	per km², row 0 starting at origin.lat.
+	"""
+	if not len(points):
+		return {"cell_size": cell_size, "bandwidth_km": bandwidth_km, "origin": None, "n_rows": 0, "n_cols": 0, "values": []}
+	lats = np.asarray(points.lat, dtype=float)
+	lons = np.asarray(points.lon, dtype=float)
+	min_lat = float(lats.min())
+	min_lon = float(lons.min())
+	lon_scale = max(math.cos(math.radians((min_lat + float(lats.max())) / 2.0)), 1e-6)
+	sigma_lat = bandwidth_km / KM_PER_DEGREE_LAT
+	sigma_lon = sigma_lat / lon_scale
+
+	span_lat = float(lats.max()) - min_lat
+	span_lon = float(lons.max()) - min_lon
+	max_cells = max(max_cells, 9)
+	while True:
+		pad_i = int(math.ceil(_KDE_RADIUS_BANDWIDTHS * sigma_lat / cell_size))
+		pad_j = int(math.ceil(_KDE_RADIUS_BANDWIDTHS * sigma_lon / cell_size))
+		# Same floor expression as _bin_cells, so the largest bin index always fits.
+		n_rows = int(np.floor(span_lat / cell_size)) + 1 + 2 * pad_i
+		n_cols = int(np.floor(span_lon / cell_size)) + 1 + 2 * pad_j
+		if n_rows * n_cols <= max_cells:
+			break
+		cell_size *= 2.0
+
+	i, j, counts = _bin_cells(lats, lons, min_lat, min_lon, cell_size)
+	grid = np.zeros((n_rows, n_cols), dtype=np.float64)
+	grid[i + pad_i, j + pad_j] = counts
+
+	ky = np.exp(-0.5 * (np.arange(-pad_i, pad_i + 1) * cell_size / sigma_lat) ** 2)
+	kx = np.exp(-0.5 * (np.arange(-pad_j, pad_j + 1) * cell_size / sigma_lon) ** 2)
+	kernel = np.outer(ky, kx)
+	kernel /= kernel.sum()
+	smoothed = signal.fftconvolve(grid, kernel, mode="same")
+	# FFT round-off leaves tiny negatives where the density is zero.
+	np.maximum(smoothed, 0.0, out=smoothed)
+	cell_area_km2 = (cell_size * KM_PER_DEGREE_LAT) * (cell_size * KM_PER_DEGREE_LAT * lon_scale)
+	return {
+		"cell_size": cell_size,
+		"bandwidth_km": bandwidth_km,
+		"origin": {"lat": min_lat - pad_i * cell_size, "lon": min_lon - pad_j * cell_size},
+		"n_rows": n_rows,
+		"n_cols": n_cols,
+		"values": (smoothed / cell_area_km2).astype(np.float32).tolist(),
+	}
+
+
+_SQRT3 = math.sqrt(3.0)
+
+
+def hexbin_density(points: PointSet, hex_size: float) -> Dict[str, Any]:
+	"""
+	Count points per pointy-top hexagon of circumradius `hex_size` (degrees of
+	latitude) on an axial (q, r) grid anchored at the bbox minimum. Longitudes
+	are scaled by cos(mid latitude) first so hexagons are near-regular on the
+	ground. A cell's center is
+		lat = origin.lat + hex_size * 1.5 * r
+		lon = origin.lon + hex_size * sqrt(3) * (q + r / 2) / lon_scale
+	Cells come back as parallel q / r / counts arrays sorted by (r, q).
+	"""
+	if not len(points):
+		return {"mode": "hexbin", "hex_size": hex_size, "bbox": None, "q": [], "r": [], "counts": []}
+	lats = np.asarray(points.lat, dtype=float)
+	lons = np.asarray(points.lon, dtype=float)
+	min_lat = float(lats.min())
+	max_lat = float(lats.max())
+	min_lon = float(lons.min())
+	max_lon = float(lons.max())
+	lon_scale = math.cos(math.radians((min_lat + max_lat) / 2.0))
+
+	x = (lons - min_lon) * lon_scale
+	y = lats - min_lat
+	qf = (_SQRT3 / 3.0 * x - y / 3.0) / hex_size
+	rf = (2.0 / 3.0 * y) / hex_size
+	# Cube rounding: round all three cube coordinates, then fix the one that moved most.
+	sf = -qf - rf
+	q = np.rint(qf)
+	r = np.rint(rf)
+	s = np.rint(sf)
+	dq = np.abs(q - qf)
+	dr = np.abs(r - rf)
+	ds = np.abs(s - sf)
+	fix_q = (dq > dr) & (dq > ds)
+	fix_r = ~fix_q & (dr > ds)
+	q = np.where(fix_q, -r - s, q).astype(np.int64)
+	r = np.where(fix_r, -q - s, r).astype(np.int64)
+
+	q_min = int(q.min())
+	r_min = int(r.min())
+	n_q = int(q.max()) - q_min + 1
+	flat = (r - r_min) * n_q + (q - q_min)
+	cell_ids, counts = np.unique(flat, return_counts=True)
+	return {
+		"mode": "hexbin",
+		"hex_size": hex_size,
+		"origin": {"lat": min_lat, "lon": min_lon},
+		"lon_scale": lon_scale,
+		"bbox": {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon},
+		"q": (cell_ids % n_q + q_min).tolist(),
+		"r": (cell_ids // n_q + r_min).tolist(),
+		"counts": counts.tolist(),
+	}
+
+
+# Two-sided normal critical values for 90 / 95 / 99 % confidence.
+_GI_Z_THRESHOLDS = (1.645, 1.96, 2.576)
+_QUEEN_OFFSETS = [(di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)]
+
+
+def getis_ord_hotspots(points: PointSet, grid_cell_size: float) -> Dict[str, Any]:
+	"""
+	Getis-Ord Gi* over the grid_density cell counts, with binary queen
+	weights (the cell and its 8 neighbours) on the full bbox raster, empty
+	cells included.
+
+	Only cells that touch a non-empty cell have a non-zero local sum, so Gi* is
+	evaluated for those through a sparse (candidate x occupied) weight matrix;
+	every other interior cell shares `background_z`. Significant cells come
+	back as parallel i / j / z / class arrays, class being +-1, +-2, +-3 for
+	hot/cold spots at 90 / 95 / 99 % confidence.
+	"""
+	if not len(points):
+		return {"cell_size": grid_cell_size, "origin": None, "n_cells": 0, "i": [], "j": [], "z": [], "class": []}
+	lats = np.asarray(points.lat, dtype=float)
+	lons = np.asarray(points.lon, dtype=float)
+	min_lat = float(lats.min())
+	min_lon = float(lons.min())
+	i, j, counts = _bin_cells(lats, lons, min_lat, min_lon, grid_cell_size)
+	n_rows = int(i.max()) + 1
+	n_cols = int(j.max()) + 1
+	n = float(n_rows) * float(n_cols)
+	x = counts.astype(np.float64)
+
+	mean = x.sum() / n
+	std = math.sqrt(max(float(np.dot(x, x)) / n - mean * mean, 0.0))
+
+	occupied = np.arange(len(x), dtype=np.int64)
+	ni = np.concatenate([i + di for di, _ in _QUEEN_OFFSETS])
+	nj = np.concatenate([j + dj for _, dj in _QUEEN_OFFSETS])
+	src = np.tile(occupied, len(_QUEEN_OFFSETS))
+	inside = (ni >= 0) & (ni < n_rows) & (nj >= 0) & (nj < n_cols)
+	ni, nj, src = ni[inside], nj[inside], src[inside]
+	flat = ni * n_cols + nj
+	n_cells = n_rows * n_cols
+	if n_cells <= max(flat.shape[0], _DENSE_GRID_MIN_CELLS):
+		# Raster small enough to scatter into directly, which skips the sort.
+		dense_sum = np.bincount(flat, weights=x[src], minlength=n_cells)
+		cell_ids = np.flatnonzero(dense_sum)
+		local_sum = dense_sum[cell_ids]
+	else:
+		cell_ids, target = np.unique(flat, return_inverse=True)
+		weights = sparse.csr_matrix((np.ones(len(src)), (target, src)), shape=(len(cell_ids), len(x)))
+		local_sum = weights @ x
+	ci, cj = cell_ids // n_cols, cell_ids % n_cols
+
+	def gi_star(local: np.ndarray, w: np.ndarray) -> np.ndarray:
+		# Binary weights: sum of w_ij^2 equals the neighbour count w.
+		denom = std * np.sqrt(np.maximum(n * w - w * w, 0.0) / max(n - 1.0, 1.0))
+		with np.errstate(divide="ignore", invalid="ignore"):
+			z = (local - mean * w) / denom
+		return np.where(denom > 0, z, 0.0)
+
+	# Window size clipped to the raster edge.
+	w = (np.minimum(ci + 1, n_rows - 1) - np.maximum(ci - 1, 0) + 1) * (
+		np.minimum(cj + 1, n_cols - 1) - np.maximum(cj - 1, 0) + 1
+	)
+	z = gi_star(local_sum, w.astype(np.float64))
+	background_z = float(gi_star(np.zeros(1), np.array([float(min(n_rows, 3) * min(n_cols, 3))]))[0])
+
+	level = np.zeros(len(z), dtype=np.int64)
+	for k, threshold in enumerate(_GI_Z_THRESHOLDS, start=1):
+		level[np.abs(z) >= threshold] = k
+	cls = level * np.sign(z).astype(np.int64)
+	keep = np.flatnonzero(cls)
+	return {
+		"cell_size": grid_cell_size,
+		"origin": {"lat": min_lat, "lon": min_lon},
+		"n_rows": n_rows,
+		"n_cols": n_cols,
+		"n_cells": int(n_rows * n_cols),
+		"mean": mean,
+		"std": std,
+		"background_z": background_z,
+		"i": ci[keep].tolist(),
+		"j": cj[keep].tolist(),
+		"z": np.round(z[keep], 4).tolist(),
+		"class": cls[keep].tolist(),
+	}
+
+
+def _bbox_area_km2(coords_rad: np.ndarray) -> float:
+	"""Area of the spherical lat/lon rectangle bounding (lat, lon) radians coordinates."""
+	lat_rad = coords_rad[:, 0]
+	lon_rad = coords_rad[:, 1]
+	return EARTH_RADIUS_KM ** 2 * float(lon_rad.max() - lon_rad.min()) * abs(
+		math.sin(float(lat_rad.max())) - math.sin(float(lat_rad.min()))
+	)
+
+
+# Standard error constant of the Clark-Evans mean nearest-neighbour distance under CSR.
+_CLARK_EVANS_SE = 0.26136
+
+
+def nearest_neighbor_stats(
+	points: PointSet, tree: BallTree | None = None, neighbor_graph: sparse.csr_matrix | None = None
+) -> Dict[str, Any]:
+	"""
+	Average nearest-neighbour distance and Clark-Evans ratio over the dataset
+	bbox. `tree` is a haversine BallTree on the points' radians coordinates
+	(the per-dataset one shared with clustering); without it one is built.
+	`neighbor_graph`, a radius graph with rows sorted by distance, answers
+	every point that has a neighbour within its radius without a tree query.
+	A ratio below 1 means clustered, above 1 dispersed; `z_score` tests it
+	against complete spatial randomness.
+	"""
+	n = len(points)
+	if n < 2:
+		return {
+			"n_points": n,
+			"mean_distance_km": None,
+			"median_distance_km": None,
+			"expected_distance_km": None,
+			"area_km2": None,
+			"clark_evans_ratio": None,
+			"z_score": None,
+			"pattern": None,
+		}
+	if tree is None:
+		tree = BallTree(np.radians(np.column_stack([points.lat, points.lon]).astype(float, copy=False)), metric="haversine")
+	coords_rad = np.asarray(tree.data)
+	nn_rad = np.empty(n, dtype=np.float64)
+	pending = np.arange(n)
+	if neighbor_graph is not None:
+		# Each row starts with the point itself; the next entry is its nearest neighbour.
+		has_neighbor = np.diff(neighbor_graph.indptr) >= 2
+		nn_rad[has_neighbor] = neighbor_graph.data[neighbor_graph.indptr[:-1][has_neighbor] + 1]
+		pending = np.flatnonzero(~has_neighbor)
+	if len(pending):
+		# k=2: the first hit is the point itself (or a duplicate, at the same zero distance).
+		dist, _ = tree.query(coords_rad[pending], k=2)
+		nn_rad[pending] = dist[:, 1]
+	nn_km = nn_rad * EARTH_RADIUS_KM
+	observed = float(nn_km.mean())
+
+	area = _bbox_area_km2(coords_rad)
+	expected = ratio = z = None
+	pattern = None
+	if area > 0:
+		expected = 0.5 * math.sqrt(area / n)
+		ratio = observed / expected
+		z = (observed - expected) / (_CLARK_EVANS_SE * math.sqrt(area) / n)
+		pattern = "random" if abs(z) < 1.96 else ("clustered" if z < 0 else "dispersed")
+	return {
+		"n_points": n,
+		"mean_distance_km": observed,
+		"median_distance_km": float(np.median(nn_km)),
+		"expected_distance_km": expected,
+		"area_km2": area,
+		"clark_evans_ratio": ratio,
+		"z_score": z,
+		"pattern": pattern,
+	}
+
+
+def ripley_k(
+	points: PointSet,
+	distances_km: List[float],
+	max_points: int = 2000,
+	n_bootstrap: int = 200,
+	seed: int = 0,
+) -> Dict[str, Any]:
+	"""
+	Ripley's K and L = sqrt(K / pi) at each distance (km) over the spherical
+	bbox, without edge correction. Pairs are counted per point with a
+	haversine BallTree. Above `max_points` the estimate runs on a seeded random
+	subsample of that size and adds 95% bootstrap bands (k_low/k_high,
+	l_low/l_high) from resampling the per-point counts, which keeps the cost
+	bounded by max_points rather than the dataset size. L(d) above d means
+	clustering at that scale.
+	"""
+	distances = sorted(float(d) for d in distances_km)
+	n = len(points)
+	result: Dict[str, Any] = {"distances_km": distances, "n_points": n, "n_sampled": n, "k": [], "l": []}
+	if n < 2 or not distances:
+		return result
+	rng = np.random.default_rng(seed)
+	sampled = n > max_points
+	lats = np.asarray(points.lat, dtype=float)
+	lons = np.asarray(points.lon, dtype=float)
+	if sampled:
+		# Draw the subsample first so only its rows are converted.
+		rows = rng.choice(n, size=max_points, replace=False)
+		lats, lons = lats[rows], lons[rows]
+	coords_rad = np.radians(np.column_stack([lats, lons]))
+	m = coords_rad.shape[0]
+	area = _bbox_area_km2(coords_rad)
+	if area <= 0:
+		return result
+
+	tree = BallTree(coords_rad, metric="haversine")
+	# counts[p, b]: other sampled points within distances[b] of point p (the point itself excluded).
+	counts = np.column_stack([
+		tree.query_radius(coords_rad, r=d / EARTH_RADIUS_KM, count_only=True) - 1 for d in distances
+	]).astype(np.float64)
+	scale = area / (m * (m - 1.0))
+	k = scale * counts.sum(axis=0)
+	result.update(n_sampled=m, area_km2=area, k=k.tolist(), l=np.sqrt(k / math.pi).tolist())
+	if sampled and n_bootstrap > 0:
+		weights = rng.multinomial(m, np.full(m, 1.0 / m), size=n_bootstrap)
+		k_boot = scale * (weights @ counts)
+		k_low, k_high = np.percentile(k_boot, [2.5, 97.5], axis=0)
+		result.update(
+			k_low=k_low.tolist(),
+			k_high=k_high.tolist(),
+			l_low=np.sqrt(k_low / math.pi).tolist(),
+			l_high=np.sqrt(k_high / math.pi).tolist(),
+		)
+	return result
+
+
 def dbscan_clustering(
-	points: List[Dict[str, Any]],
+	points: PointSet,
 	eps_km: float | None,
 	min_samples: int,
 	eps_degrees: float | None = None,
+	neighbor_graph: sparse.csr_matrix | None = None,
 ) -> Dict[str, Any]:
-	if not points:
+	"""
+	`neighbor_graph`, if given, holds haversine distances (radians) for every
+	pair within eps_km; clustering then runs on it instead of the coordinates.
+	"""
+	if not len(points):
 		return {"labels": [], "clusters": [], "num_clusters": 0, "num_noise": 0}
 
-	coords_deg = np.array([[p["lat"], p["lon"]] for p in points], dtype=float)
+	coords_deg = np.column_stack([points.lat, points.lon]).astype(float, copy=False)
 
-	if eps_km is not None:
+	if eps_km is not None and neighbor_graph is not None:
+		eps = eps_km / EARTH_RADIUS_KM
+		model = DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed")
+		labels = model.fit_predict(neighbor_graph)
+	elif eps_km is not None:
 		coords_rad = np.radians(coords_deg)
 		eps = eps_km / EARTH_RADIUS_KM
 		model = DBSCAN(eps=eps, min_samples=min_samples, metric="haversine")
@@ -95,6 +544,10 @@ def dbscan_clustering(
 		model = DBSCAN(eps=eps, min_samples=min_samples, metric="euclidean")
 		labels = model.fit_predict(coords_deg)
 
+	return _clusters_from_labels(coords_deg, labels)
+
+
+def _clusters_from_labels(coords_deg: np.ndarray, labels: np.ndarray) -> Dict[str, Any]:
 	labels_list = labels.tolist()
 
 	# Aggregate clusters
@@ -118,3 +571,83 @@ def dbscan_clustering(
 	}
 
 
+@dataclass
+class ClusterHierarchy:
+	"""
+	Density hierarchy fitted once per dataset, from which a flat clustering for
+	any eps (up to max_eps for OPTICS) is extracted in O(n).
+	Distances are radians for the haversine metric and degrees for euclidean.
+	"""
+
+	algorithm: str  # optics | hdbscan
+	metric: str  # haversine | euclidean
+	min_samples: int
+	max_eps: float
+	ordering: np.ndarray | None = None
+	reachability: np.ndarray | None = None
+	core_distances: np.ndarray | None = None
+	model: HDBSCAN | None = None
+
+	def labels_at(self, eps: float) -> np.ndarray:
+		if self.algorithm == "optics":
+			return cluster_optics_dbscan(
+				reachability=self.reachability,
+				core_distances=self.core_distances,
+				ordering=self.ordering,
+				eps=eps,
+			)
+		return self.model.dbscan_clustering(cut_distance=eps, min_cluster_size=max(2, self.min_samples))
+
+
+def fit_cluster_hierarchy(
+	points: PointSet,
+	algorithm: str,
+	min_samples: int,
+	max_eps_km: float | None,
+	max_eps_degrees: float | None = None,
+) -> ClusterHierarchy:
+	"""Fit OPTICS or HDBSCAN on haversine coordinates (max_eps_km set) or on raw degrees."""
+	coords_deg = np.column_stack([points.lat, points.lon]).astype(float, copy=False)
+	if max_eps_km is not None:
+		metric = "haversine"
+		coords = np.radians(coords_deg)
+		max_eps = max_eps_km / EARTH_RADIUS_KM
+	else:
+		metric = "euclidean"
+		coords = coords_deg
+		max_eps = max_eps_degrees if max_eps_degrees is not None else 0.01
+
+	if algorithm == "optics":
+		# OPTICS requires min_samples > 1.
+		model = OPTICS(min_samples=max(2, min_samples), max_eps=max_eps, metric=metric, cluster_method="dbscan", eps=max_eps)
+		model.fit(coords)
+		return ClusterHierarchy(
+			algorithm=algorithm,
+			metric=metric,
+			min_samples=min_samples,
+			max_eps=max_eps,
+			ordering=model.ordering_,
+			reachability=model.reachability_,
+			core_distances=model.core_distances_,
+		)
+	if algorithm == "hdbscan":
+		model = HDBSCAN(min_samples=min_samples, min_cluster_size=max(2, min_samples), metric=metric)
+		model.fit(coords)
+		return ClusterHierarchy(algorithm=algorithm, metric=metric, min_samples=min_samples, max_eps=np.inf, model=model)
+	raise ValueError(f"Unsupported clustering algorithm: {algorithm}")
+
+
+def hierarchy_clustering(
+	points: PointSet,
+	hierarchy: ClusterHierarchy,
+	eps_km: float | None,
+	eps_degrees: float | None = None,
+) -> Dict[str, Any]:
+	if not len(points):
+		return {"labels": [], "clusters": [], "num_clusters": 0, "num_noise": 0}
+	if hierarchy.metric == "haversine":
+		eps = eps_km / EARTH_RADIUS_KM
+	else:
+		eps = eps_degrees if eps_degrees is not None else 0.01
+	coords_deg = np.column_stack([points.lat, points.lon]).astype(float, copy=False)
+	return _clusters_from_labels(coords_deg, hierarchy.labels_at(eps))
@@ -0,0 +1,219 @@
+"""
+Per-dataset pyramid of sparse density grids at power-of-two cell sizes.
+
+Level k holds the non-empty cells of size base_cell_size * 2**k anchored at
+the dataset's bbox minimum: their row/column indices, point counts and the
+first row index that fell in them (which reproduces grid_density's
+first-seen cell order). Level 0 is binned from the points once; every
+coarser level is aggregated from the one below, so any grid request is
+answered from the pyramid without touching the points.
+
+Cell sizes that are base_cell_size times a power of two are answered exactly
+(dividing by a power of two commutes with float rounding, so the cell
+assignment matches binning the points directly). Other sizes are
+approximated from the nearest finer level and flagged as such; sizes below
+the base cell have no finer level and must be binned from the points.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+import math
+import os
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.analysis import grid_density_result
+from app.services.lru import LRUCache
+from app.services.persisted import load_or_build, write_atomic
+from app.services.points import PointSet
+
+
+_MAX_LEVELS = 48
+
+
+def exact_pyramid_level(grid_cell_size: float, base_cell_size: float) -> int | None:
+	"""k such that grid_cell_size == base_cell_size * 2**k exactly, else None."""
+	if base_cell_size <= 0:
+		return None
+	ratio = grid_cell_size / base_cell_size
+	if ratio < 1:
+		return None
+	level = round(math.log2(ratio))
+	if base_cell_size * 2.0 ** level != grid_cell_size:
+		return None
+	return level
+
+
+@dataclass
+class DensityLevel:
+	"""Non-empty cells of one pyramid level, sorted by cell id."""
+
+	i: np.ndarray
+	j: np.ndarray
+	counts: np.ndarray
+	first_row: np.ndarray
+
+
+@dataclass
+class DensityPyramid:
+	base_cell_size: float
+	min_lat: float
+	max_lat: float
+	min_lon: float
+	max_lon: float
+	levels: List[DensityLevel]
+
+	def cell_size(self, level: int) -> float:
+		return self.base_cell_size * 2.0 ** level
+
+	def exact_level(self, grid_cell_size: float) -> int | None:
+		"""Pyramid level whose cell size is exactly grid_cell_size, if any."""
+		level = exact_pyramid_level(grid_cell_size, self.base_cell_size)
+		if level is None:
+			return None
+		# The top level is a single cell, which every coarser size reproduces.
+		return min(level, len(self.levels) - 1)
+
+	def grid_density(self, grid_cell_size: float, encoding: str = "cells") -> Tuple[Dict[str, Any], bool]:
+		"""
+		grid_density-shaped result for `grid_cell_size` plus whether it is exact.
+		Approximate answers assign each cell of the nearest finer level to the
+		target cell holding its center. Sizes below the base cell raise ValueError.
+		"""
+		if grid_cell_size < self.base_cell_size:
+			raise ValueError("grid_cell_size is below the density pyramid's base cell")
+		level = self.exact_level(grid_cell_size)
+		if level is not None:
+			cells = self.levels[level]
+			i, j, counts, first_row = cells.i, cells.j, cells.counts, cells.first_row
+			exact = True
+		else:
+			level = min(int(math.floor(math.log2(grid_cell_size / self.base_cell_size))), len(self.levels) - 1)
+			i, j, counts, first_row = _regrid(self.levels[level], self.cell_size(level), grid_cell_size)
+			exact = False
+		order = np.argsort(first_row, kind="stable")
+		result = grid_density_result(
+			grid_cell_size,
+			self.min_lat,
+			self.max_lat,
+			self.min_lon,
+			self.max_lon,
+			i[order],
+			j[order],
+			counts[order],
+			encoding=encoding,
+		)
+		return result, exact
+
+
+def _group(
+	i: np.ndarray, j: np.ndarray, counts: np.ndarray, first_row: np.ndarray
+) -> DensityLevel:
+	n_cols = int(j.max()) + 1
+	flat = i * n_cols + j
+	order = np.argsort(flat, kind="stable")
+	flat = flat[order]
+	starts = np.flatnonzero(np.concatenate([[True], flat[1:] != flat[:-1]]))
+	ids = flat[starts]
+	return DensityLevel(
+		i=ids // n_cols,
+		j=ids % n_cols,
+		counts=np.add.reduceat(counts[order], starts),
+		first_row=np.minimum.reduceat(first_row[order], starts),
+	)
+
+
+def _regrid(level: DensityLevel, level_cell_size: float, grid_cell_size: float) -> Tuple[np.ndarray, ...]:
+	ti = np.floor((level.i + 0.5) * level_cell_size / grid_cell_size).astype(np.int64)
+	tj = np.floor((level.j + 0.5) * level_cell_size / grid_cell_size).astype(np.int64)
+	grouped = _group(ti, tj, level.counts, level.first_row)
+	return grouped.i, grouped.j, grouped.counts, grouped.first_row
+
+
+def build_density_pyramid(points: PointSet, base_cell_size: float) -> DensityPyramid:
+	lats = np.asarray(points.lat, dtype=float)
+	lons = np.asarray(points.lon, dtype=float)
+	min_lat = float(lats.min())
+	min_lon = float(lons.min())
+	i = np.floor((lats - min_lat) / base_cell_size).astype(np.int64)
+	j = np.floor((lons - min_lon) / base_cell_size).astype(np.int64)
+	rows = np.arange(len(points), dtype=np.int64)
+	levels = [_group(i, j, np.ones(len(points), dtype=np.int64), rows)]
+	while len(levels[-1].counts) > 1 and len(levels) < _MAX_LEVELS:
+		prev = levels[-1]
+		levels.append(_group(prev.i // 2, prev.j // 2, prev.counts, prev.first_row))
+	return DensityPyramid(
+		base_cell_size=base_cell_size,
+		min_lat=min_lat,
+		max_lat=float(lats.max()),
+		min_lon=min_lon,
+		max_lon=float(lons.max()),
+		levels=levels,
+	)
+
+
+def _pyramid_path(store_dir: str, base_cell_size: float) -> str:
+	return os.path.join(store_dir, f"density_pyramid_{base_cell_size:g}.npz")
+
+
+def _save_pyramid(path: str, pyramid: DensityPyramid) -> None:
+	arrays: Dict[str, np.ndarray] = {
+		"bounds": np.array(
+			[pyramid.base_cell_size, pyramid.min_lat, pyramid.max_lat, pyramid.min_lon, pyramid.max_lon]
+		),
+	}
+	for k, level in enumerate(pyramid.levels):
+		arrays[f"l{k}_i"] = level.i.astype(np.int32 if level.i.max(initial=0) < 2**31 else np.int64)
+		arrays[f"l{k}_j"] = level.j.astype(np.int32 if level.j.max(initial=0) < 2**31 else np.int64)
+		arrays[f"l{k}_counts"] = level.counts
+		arrays[f"l{k}_first"] = level.first_row
+	np.savez(path, **arrays)
+
+
+def _load_pyramid(path: str) -> DensityPyramid:
+	with np.load(path) as data:
+		base, min_lat, max_lat, min_lon, max_lon = data["bounds"].tolist()
+		levels = []
+		k = 0
+		while f"l{k}_i" in data:
+			levels.append(DensityLevel(
+				i=data[f"l{k}_i"].astype(np.int64),
+				j=data[f"l{k}_j"].astype(np.int64),
+				counts=data[f"l{k}_counts"],
+				first_row=data[f"l{k}_first"],
+			))
+			k += 1
+	if not levels:
+		raise ValueError("Density pyramid has no levels")
+	return DensityPyramid(base, min_lat, max_lat, min_lon, max_lon, levels)
+
+
+class DensityPyramidCache:
+	def __init__(self, max_entries: int) -> None:
+		self._entries: LRUCache[Tuple[str, float], DensityPyramid] = LRUCache(max_entries=max(max_entries, 1))
+
+	def get(
+		self, dataset_key: str, load_points: Callable[[], PointSet], store_dir: str | None = None
+	) -> DensityPyramid | None:
+		"""
+		The dataset's pyramid at settings.density_pyramid_base_cell, or None if
+		disabled. `load_points` (which must return a non-empty PointSet) is only
+		called when the pyramid is neither cached nor persisted.
+		"""
+		base = settings.density_pyramid_base_cell
+		if base <= 0:
+			return None
+		return self._entries.get_or_build((dataset_key, base), lambda: self._load_or_build(load_points, base, store_dir))
+
+	def _load_or_build(self, load_points: Callable[[], PointSet], base: float, store_dir: str | None) -> DensityPyramid:
+		return load_or_build(
+			_pyramid_path(store_dir, base) if store_dir else None,
+			load=_load_pyramid,
+			build=lambda: build_density_pyramid(load_points(), base),
+			save=lambda path, pyramid: write_atomic(path, lambda tmp: _save_pyramid(tmp, pyramid)),
+			what="density pyramid",
+		)
+
+
+density_cache = DensityPyramidCache(max_entries=settings.density_cache_entries)
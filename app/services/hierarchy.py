@@ -0,0 +1,94 @@
+"""
+Per-dataset cache of fitted OPTICS/HDBSCAN hierarchies.
+
+OPTICS orderings are small (three length-n arrays) and persist next to the
+point store; HDBSCAN models are kept in memory only.
+"""
+from __future__ import annotations
+from typing import Tuple
+import os
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.analysis import ClusterHierarchy, fit_cluster_hierarchy
+from app.services.lru import LRUCache
+from app.services.persisted import load_or_build, write_atomic
+from app.services.points import PointSet
+
+
+# (dataset content hash, algorithm, min_samples, metric, max_eps)
+HierarchyKey = Tuple[str, str, int, str, float | None]
+
+
+def _optics_path(store_dir: str, min_samples: int, max_eps_km: float | None, max_eps_degrees: float | None) -> str:
+	scope = f"{max_eps_km:g}km" if max_eps_km is not None else f"{max_eps_degrees:g}deg"
+	return os.path.join(store_dir, f"optics_ms{min_samples}_{scope}.npz")
+
+
+class ClusterHierarchyCache:
+	def __init__(self, max_entries: int) -> None:
+		self._entries: LRUCache[HierarchyKey, ClusterHierarchy] = LRUCache(max_entries=max(max_entries, 1))
+
+	def get(
+		self,
+		dataset_key: str,
+		points: PointSet,
+		algorithm: str,
+		min_samples: int,
+		max_eps_km: float | None,
+		max_eps_degrees: float | None = None,
+		store_dir: str | None = None,
+	) -> ClusterHierarchy:
+		metric = "haversine" if max_eps_km is not None else "euclidean"
+		max_eps = max_eps_km if max_eps_km is not None else max_eps_degrees
+		# HDBSCAN's tree covers every distance, so max_eps is not part of its key.
+		key: HierarchyKey = (dataset_key, algorithm, min_samples, metric, None if algorithm == "hdbscan" else max_eps)
+		return self._entries.get_or_build(
+			key, lambda: self._load_or_fit(points, algorithm, min_samples, max_eps_km, max_eps_degrees, store_dir)
+		)
+
+	def _load_or_fit(
+		self,
+		points: PointSet,
+		algorithm: str,
+		min_samples: int,
+		max_eps_km: float | None,
+		max_eps_degrees: float | None,
+		store_dir: str | None,
+	) -> ClusterHierarchy:
+		path = _optics_path(store_dir, min_samples, max_eps_km, max_eps_degrees) if store_dir and algorithm == "optics" else None
+		return load_or_build(
+			path,
+			load=lambda p: _load_optics(p, min_samples),
+			build=lambda: fit_cluster_hierarchy(points, algorithm, min_samples, max_eps_km, max_eps_degrees),
+			save=_save_optics,
+			what="OPTICS ordering",
+		)
+
+
+def _load_optics(path: str, min_samples: int) -> ClusterHierarchy:
+	with np.load(path) as data:
+		return ClusterHierarchy(
+			algorithm="optics",
+			metric=str(data["metric"]),
+			min_samples=min_samples,
+			max_eps=float(data["max_eps"]),
+			ordering=data["ordering"],
+			reachability=data["reachability"],
+			core_distances=data["core_distances"],
+		)
+
+
+def _save_optics(path: str, hierarchy: ClusterHierarchy) -> None:
+	write_atomic(path, lambda tmp: np.savez(
+		tmp,
+		metric=np.array(hierarchy.metric),
+		max_eps=np.array(hierarchy.max_eps),
+		ordering=hierarchy.ordering,
+		reachability=hierarchy.reachability,
+		core_distances=hierarchy.core_distances,
+	))
+
+
+hierarchy_cache = ClusterHierarchyCache(max_entries=settings.hierarchy_cache_entries)
@@ -0,0 +1,106 @@
+"""
+Content-addressed cache of generated insights.
+
+Keys are a hash of the model name and the exact prompt from build_prompt, so
+identical analysis results + context reuse one Gemini answer. A TTL'd,
+size-bounded in-memory LRU sits in front of an optional database table
+(INSIGHT_CACHE_PERSIST) that survives restarts and is shared across workers.
+"""
+from __future__ import annotations
+from datetime import datetime, timedelta
+from typing import Any, Dict, Tuple
+import hashlib
+import json
+import logging
+import time
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import InsightCacheEntry
+from app.services.lru import LRUCache
+
+
+log = logging.getLogger("insight_cache")
+
+# (insight, generated_at)
+CachedInsight = Tuple[Dict[str, Any], datetime]
+
+
+def insight_cache_key(model: str, prompt: str) -> str:
+	return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+class InsightCache:
+	def __init__(self, max_entries: int, ttl_seconds: int, persist: bool = False) -> None:
+		self.max_entries = max_entries
+		self.ttl_seconds = ttl_seconds
+		self.persist = persist
+		# key -> (insight, generated_at, monotonic expiry)
+		self._entries: LRUCache[str, Tuple[Dict[str, Any], datetime, float]] = LRUCache(max_entries=max(max_entries, 0))
+
+	def get(self, key: str, db: Session | None = None) -> CachedInsight | None:
+		entry = self._entries.get(key)
+		if entry is not None:
+			if entry[2] > time.monotonic():
+				return entry[0], entry[1]
+			self._entries.pop(key)
+		if not (self.persist and db is not None):
+			return None
+
+		try:
+			row = db.get(InsightCacheEntry, key)
+		except SQLAlchemyError:
+			log.warning("Insight cache lookup failed", exc_info=True)
+			return None
+		if row is None:
+			return None
+		age = (datetime.utcnow() - row.created_at).total_seconds()
+		if age >= self.ttl_seconds:
+			return None
+		insight = json.loads(row.insight_json)
+		self._memory_put(key, insight, row.created_at, self.ttl_seconds - age)
+		return insight, row.created_at
+
+	def put(self, key: str, insight: Dict[str, Any], model: str, db: Session | None = None) -> datetime:
+		generated_at = datetime.utcnow()
+		self._memory_put(key, insight, generated_at, self.ttl_seconds)
+		if self.persist and db is not None:
+			try:
+				db.merge(InsightCacheEntry(
+					prompt_hash=key, insight_json=json.dumps(insight), model=model, created_at=generated_at
+				))
+				self._trim_table(db)
+				db.commit()
+			except SQLAlchemyError:
+				db.rollback()
+				log.warning("Could not persist insight cache entry", exc_info=True)
+		return generated_at
+
+	def clear(self) -> None:
+		self._entries.clear()
+
+	def _memory_put(self, key: str, insight: Dict[str, Any], generated_at: datetime, ttl: float) -> None:
+		self._entries.put(key, (insight, generated_at, time.monotonic() + ttl))
+
+	def _trim_table(self, db: Session) -> None:
+		cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+		db.query(InsightCacheEntry).filter(InsightCacheEntry.created_at < cutoff).delete(synchronize_session=False)
+		# Keep only the newest max_entries rows
+		oldest_kept = (
+			db.query(InsightCacheEntry.created_at)
+			.order_by(InsightCacheEntry.created_at.desc())
+			.offset(max(self.max_entries, 1) - 1)
+			.limit(1)
+			.scalar()
+		)
+		if oldest_kept is not None:
+			db.query(InsightCacheEntry).filter(InsightCacheEntry.created_at < oldest_kept).delete(synchronize_session=False)
+
+
+insight_cache = InsightCache(
+	max_entries=settings.insight_cache_max_entries,
+	ttl_seconds=settings.insight_cache_ttl,
+	persist=settings.insight_cache_persist,
+)
@@ -0,0 +1,198 @@
+"""
+In-process background runner for analysis jobs.
+
+Job state lives in the analysis_jobs table, so any API worker can answer
+status polls; the pipeline itself runs on a small thread pool owned by the
+worker that accepted the job. Each job records that worker's WORKER_ID, and
+the worker heartbeats its queued and running jobs; a job whose heartbeat goes
+stale (its worker exited or crashed) is marked failed by whichever worker
+notices, and jobs cancelled at shutdown are failed immediately.
+"""
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+import logging
+import os
+import socket
+import threading
+import uuid
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import AnalysisJob, AnalysisRun, Dataset
+from app.schemas.analysis import AnalyzeParams
+from app.services.pipeline import analyze_dataset_cached
+
+
+log = logging.getLogger("analysis_jobs")
+
+# Identifies this API process as the owner of the jobs it accepts.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+ACTIVE_STATUSES = ("queued", "running")
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_monitor: threading.Thread | None = None
+_monitor_stop = threading.Event()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+	global _executor
+	with _executor_lock:
+		if _executor is None:
+			_executor = ThreadPoolExecutor(
+				max_workers=max(1, settings.analysis_job_workers),
+				thread_name_prefix="analysis-job",
+			)
+		return _executor
+
+
+def shutdown_job_executor() -> None:
+	global _executor, _monitor
+	with _executor_lock:
+		if _monitor is not None:
+			_monitor_stop.set()
+			_monitor = None
+		if _executor is not None:
+			_executor.shutdown(wait=False, cancel_futures=True)
+			_executor = None
+
+
+def start_job_monitor() -> None:
+	"""Start the thread that heartbeats this worker's jobs and fails jobs whose worker went silent."""
+	global _monitor
+	with _executor_lock:
+		if _monitor is None:
+			_monitor_stop.clear()
+			_monitor = threading.Thread(target=_monitor_loop, name="analysis-job-monitor", daemon=True)
+			_monitor.start()
+
+
+def _monitor_loop() -> None:
+	while True:
+		heartbeat_and_fail_stale_jobs()
+		if _monitor_stop.wait(settings.analysis_job_heartbeat_seconds):
+			return
+
+
+def submit_analysis_job(job_id: int) -> None:
+	future = _get_executor().submit(_run_job, job_id)
+	future.add_done_callback(lambda f: _fail_if_cancelled(job_id, f))
+
+
+def heartbeat_and_fail_stale_jobs() -> None:
+	"""
+	Refresh the heartbeat of this worker's active jobs, then fail active jobs
+	of any worker whose heartbeat is older than ANALYSIS_JOB_STALE_SECONDS.
+	"""
+	now = datetime.utcnow()
+	cutoff = now - timedelta(seconds=settings.analysis_job_stale_seconds)
+	db = SessionLocal()
+	try:
+		db.query(AnalysisJob).filter(
+			AnalysisJob.worker_id == WORKER_ID, AnalysisJob.status.in_(ACTIVE_STATUSES)
+		).update({"heartbeat_at": now}, synchronize_session=False)
+		count = (
+			db.query(AnalysisJob)
+			.filter(
+				AnalysisJob.status.in_(ACTIVE_STATUSES),
+				or_(
+					AnalysisJob.heartbeat_at < cutoff,
+					and_(AnalysisJob.heartbeat_at.is_(None), AnalysisJob.created_at < cutoff),
+				),
+			)
+			.update(
+				{"status": "failed", "error": "The worker running this job stopped", "finished_at": now},
+				synchronize_session=False,
+			)
+		)
+		db.commit()
+		if count:
+			log.warning("Marked %d analysis jobs with a stale heartbeat as failed", count)
+	except SQLAlchemyError:
+		db.rollback()
+		log.warning("Could not refresh analysis job heartbeats", exc_info=True)
+	finally:
+		db.close()
+
+
+def _fail_if_cancelled(job_id: int, future: Future) -> None:
+	if not future.cancelled():
+		return
+	db = SessionLocal()
+	try:
+		db.query(AnalysisJob).filter(AnalysisJob.id == job_id, AnalysisJob.status == "queued").update(
+			{"status": "failed", "error": "Cancelled at server shutdown", "finished_at": datetime.utcnow()},
+			synchronize_session=False,
+		)
+		db.commit()
+	finally:
+		db.close()
+
+
+def _update_job(job_id: int, **fields) -> None:
+	db = SessionLocal()
+	try:
+		db.query(AnalysisJob).filter(AnalysisJob.id == job_id).update(fields)
+		db.commit()
+	finally:
+		db.close()
+
+
+def _run_job(job_id: int) -> None:
+	db = SessionLocal()
+	try:
+		job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+		if job is None or job.status != "queued":
+			return
+		job.status = "running"
+		job.stage = "loading"
+		job.started_at = datetime.utcnow()
+		db.commit()
+
+		dataset = db.query(Dataset).filter(Dataset.id == job.dataset_id).first()
+		if dataset is None:
+			raise ValueError("Dataset not found")
+		params = AnalyzeParams.model_validate_json(job.params_json)
+
+		def on_progress(stage: str, fraction: float) -> None:
+			_update_job(job_id, stage=stage, progress=fraction, heartbeat_at=datetime.utcnow())
+
+		result_json, _ = analyze_dataset_cached(dataset, params, on_progress=on_progress)
+
+		run = AnalysisRun(
+			dataset_id=job.dataset_id,
+			user_id=job.user_id,
+			params_json=job.params_json,
+			result_json=result_json,
+		)
+		db.add(run)
+		db.flush()
+		# Only a job still running here may succeed; one already failed as stale stays failed.
+		finished = (
+			db.query(AnalysisJob)
+			.filter(AnalysisJob.id == job_id, AnalysisJob.status == "running")
+			.update(
+				{
+					"status": "succeeded",
+					"stage": None,
+					"progress": 1.0,
+					"analysis_run_id": run.id,
+					"finished_at": datetime.utcnow(),
+				},
+				synchronize_session=False,
+			)
+		)
+		if not finished:
+			db.rollback()
+			return
+		db.commit()
+	except Exception as e:
+		log.exception("Analysis job failed", extra={"job_id": job_id})
+		db.rollback()
+		_update_job(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+	finally:
+		db.close()
@@ -0,0 +1,97 @@
+"""
+Thread-safe LRU used by the in-process caches (indexes, results, tiles, insights).
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, TypeVar
+import threading
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+	"""
+	Bounded by entry count (`max_entries`, None = unbounded, 0 = disabled)
+	and/or by total `sizeof` of the values (`max_bytes`, None = unbounded;
+	single values above it are not cached).
+	"""
+
+	def __init__(
+		self,
+		max_entries: int | None = None,
+		max_bytes: int | None = None,
+		sizeof: Callable[[V], int] = len,
+	) -> None:
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		self._sizeof = sizeof
+		self._entries: OrderedDict[K, V] = OrderedDict()
+		self._bytes = 0
+		self._lock = threading.Lock()
+		self._build_locks: Dict[K, threading.Lock] = {}
+
+	def __len__(self) -> int:
+		with self._lock:
+			return len(self._entries)
+
+	@property
+	def total_bytes(self) -> int:
+		return self._bytes
+
+	def get(self, key: K) -> V | None:
+		with self._lock:
+			value = self._entries.get(key)
+			if value is not None:
+				self._entries.move_to_end(key)
+			return value
+
+	def put(self, key: K, value: V) -> None:
+		if self.max_entries == 0:
+			return
+		size = self._sizeof(value) if self.max_bytes is not None else 0
+		if self.max_bytes is not None and size > self.max_bytes:
+			return
+		with self._lock:
+			self._discard(key)
+			self._entries[key] = value
+			self._bytes += size
+			while (self.max_entries is not None and len(self._entries) > self.max_entries) or (
+				self.max_bytes is not None and self._bytes > self.max_bytes
+			):
+				self._discard(next(iter(self._entries)))
+
+	def pop(self, key: K) -> V | None:
+		with self._lock:
+			value = self._entries.get(key)
+			self._discard(key)
+			return value
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+			self._bytes = 0
+
+	def get_or_build(self, key: K, build: Callable[[], V]) -> V:
+		"""The cached value for `key`, building it at most once at a time per key."""
+		value = self.get(key)
+		if value is not None:
+			return value
+		with self._lock:
+			build_lock = self._build_locks.setdefault(key, threading.Lock())
+		with build_lock:
+			try:
+				value = self.get(key)
+				if value is None:
+					value = build()
+					self.put(key, value)
+				return value
+			finally:
+				with self._lock:
+					self._build_locks.pop(key, None)
+
+	def _discard(self, key: K) -> None:
+		value = self._entries.pop(key, None)
+		if value is not None and self.max_bytes is not None:
+			self._bytes -= self._sizeof(value)
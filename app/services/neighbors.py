@@ -0,0 +1,129 @@
+"""
+Per-dataset spatial index and radius-neighbors graph for haversine DBSCAN.
+
+The graph is built once at settings.dbscan_graph_max_eps_km; any later
+clustering with a smaller eps (or a different min_samples) filters it and
+runs DBSCAN with metric="precomputed" instead of re-querying the tree.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+import os
+import threading
+
+import numpy as np
+from scipy import sparse
+from sklearn.neighbors import BallTree
+
+from app.core.config import settings
+from app.services.analysis import EARTH_RADIUS_KM
+from app.services.lru import LRUCache
+from app.services.persisted import load_or_build, write_atomic
+from app.services.points import PointSet
+
+
+_QUERY_CHUNK = 50_000
+
+
+@dataclass
+class RadiusGraph:
+	"""CSR haversine distances (radians) for all pairs within eps_km, each row sorted by distance."""
+
+	graph: sparse.csr_matrix
+	eps_km: float
+
+	def within(self, eps_km: float) -> sparse.csr_matrix:
+		if eps_km > self.eps_km:
+			raise ValueError(f"Radius graph was built for eps <= {self.eps_km} km")
+		if eps_km == self.eps_km:
+			return self.graph
+		eps = eps_km / EARTH_RADIUS_KM
+		# Rows are sorted by distance, so the kept entries stay sorted.
+		g = self.graph
+		mask = g.data <= eps
+		kept = np.concatenate([[0], np.cumsum(mask)])
+		indptr = kept[g.indptr]
+		return sparse.csr_matrix((g.data[mask], g.indices[mask], indptr), shape=g.shape)
+
+
+class NeighborIndex:
+	"""Radians coordinates of one dataset plus its lazily built BallTree and radius graph."""
+
+	def __init__(self, coords_rad: np.ndarray) -> None:
+		self.coords_rad = coords_rad
+		self.graph: RadiusGraph | None = None
+		# Set once a graph build was attempted; graph stays None if it exceeded the edge budget.
+		self.graph_attempted = False
+		self.lock = threading.RLock()
+		self._tree: BallTree | None = None
+
+	@property
+	def tree(self) -> BallTree:
+		with self.lock:
+			if self._tree is None:
+				self._tree = BallTree(self.coords_rad, metric="haversine")
+			return self._tree
+
+
+def _build_radius_graph(tree: BallTree, coords_rad: np.ndarray, eps_km: float, max_edges: int) -> RadiusGraph | None:
+	radius = eps_km / EARTH_RADIUS_KM
+	n = coords_rad.shape[0]
+	row_lengths = np.empty(n, dtype=np.int64)
+	index_parts = []
+	dist_parts = []
+	total = 0
+	for start in range(0, n, _QUERY_CHUNK):
+		ind, dist = tree.query_radius(
+			coords_rad[start:start + _QUERY_CHUNK], r=radius, return_distance=True, sort_results=True
+		)
+		lengths = np.fromiter((len(a) for a in ind), dtype=np.int64, count=len(ind))
+		total += int(lengths.sum())
+		if total > max_edges:
+			return None
+		row_lengths[start:start + len(ind)] = lengths
+		index_parts.extend(ind)
+		dist_parts.extend(dist)
+	indptr = np.concatenate([[0], np.cumsum(row_lengths)])
+	indices = np.concatenate(index_parts) if index_parts else np.empty(0, dtype=np.int64)
+	data = np.concatenate(dist_parts) if dist_parts else np.empty(0, dtype=np.float64)
+	return RadiusGraph(graph=sparse.csr_matrix((data, indices, indptr), shape=(n, n)), eps_km=eps_km)
+
+
+def _graph_path(store_dir: str, eps_km: float) -> str:
+	return os.path.join(store_dir, f"radius_graph_{eps_km:g}km.npz")
+
+
+class NeighborIndexCache:
+	def __init__(self, max_entries: int) -> None:
+		self._entries: LRUCache[str, NeighborIndex] = LRUCache(max_entries=max(max_entries, 1))
+
+	def index_for(self, dataset_key: str, points: PointSet) -> NeighborIndex:
+		# Cheap to create: the tree and graph inside are built lazily under the index's own lock.
+		return self._entries.get_or_build(
+			dataset_key,
+			lambda: NeighborIndex(coords_rad=np.radians(np.column_stack([points.lat, points.lon]).astype(float, copy=False))),
+		)
+
+	def radius_graph(self, dataset_key: str, points: PointSet, eps_km: float, store_dir: str | None = None) -> RadiusGraph | None:
+		"""
+		The shared radius graph for a dataset if it can answer `eps_km`, else None
+		(eps above the configured maximum, or the graph would be too large).
+		"""
+		max_eps_km = settings.dbscan_graph_max_eps_km
+		if max_eps_km <= 0 or eps_km > max_eps_km:
+			return None
+		index = self.index_for(dataset_key, points)
+		with index.lock:
+			if index.graph_attempted:
+				return index.graph
+			index.graph = load_or_build(
+				_graph_path(store_dir, max_eps_km) if store_dir else None,
+				load=lambda path: RadiusGraph(graph=sparse.load_npz(path).tocsr(), eps_km=max_eps_km),
+				build=lambda: _build_radius_graph(index.tree, index.coords_rad, max_eps_km, settings.dbscan_graph_max_edges),
+				save=lambda path, graph: write_atomic(path, lambda tmp: sparse.save_npz(tmp, graph.graph, compressed=False)),
+				what="radius graph",
+			)
+			index.graph_attempted = True
+			return index.graph
+
+
+neighbor_cache = NeighborIndexCache(max_entries=settings.neighbor_cache_entries)
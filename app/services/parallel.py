@@ -0,0 +1,152 @@
+"""
+Process-pool backend for the CPU-bound analysis stages.
+
+Coordinates (and the category column used by the summary) are copied once
+into a shared memory block; worker processes map the block as NumPy arrays
+instead of receiving pickled points.
+"""
+from __future__ import annotations
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Tuple
+import threading
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.points import DictColumn, PointSet
+
+
+# A stage run in a worker: fn(points, **kwargs) -> result.
+Stage = Tuple[Callable[..., Dict[str, Any]], Dict[str, Any]]
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class SharedPointsHandle:
+	"""Picklable description of a PointSet laid out in a shared memory block."""
+
+	shm_name: str
+	n_points: int
+	category_field: str | None
+	category_values: List[Any]
+
+
+def _layout(n: int, with_codes: bool) -> Tuple[int, int, int, int]:
+	lat_off = 0
+	lon_off = 8 * n
+	codes_off = 16 * n
+	size = codes_off + (4 * n if with_codes else 0)
+	return lat_off, lon_off, codes_off, max(size, 1)
+
+
+def _views(buf, handle: SharedPointsHandle) -> PointSet:
+	n = handle.n_points
+	lat_off, lon_off, codes_off, _ = _layout(n, handle.category_field is not None)
+	lat = np.ndarray((n,), dtype=np.float64, buffer=buf, offset=lat_off)
+	lon = np.ndarray((n,), dtype=np.float64, buffer=buf, offset=lon_off)
+	columns: Dict[str, DictColumn] = {}
+	if handle.category_field is not None:
+		codes = np.ndarray((n,), dtype=np.int32, buffer=buf, offset=codes_off)
+		columns[handle.category_field] = DictColumn(codes=codes, values=handle.category_values)
+	return PointSet(lat=lat, lon=lon, columns=columns)
+
+
+class SharedPoints:
+	"""Context manager that owns the shared memory block for one analysis."""
+
+	def __init__(self, points: PointSet, category_field: str | None) -> None:
+		n = len(points)
+		column = points.columns.get(category_field) if category_field else None
+		_, _, _, size = _layout(n, column is not None)
+		self._shm = SharedMemory(create=True, size=size)
+		self.handle = SharedPointsHandle(
+			shm_name=self._shm.name,
+			n_points=n,
+			category_field=category_field if column is not None else None,
+			category_values=list(column.values) if column is not None else [],
+		)
+		try:
+			view = _views(self._shm.buf, self.handle)
+			view.lat[:] = points.lat
+			view.lon[:] = points.lon
+			if column is not None:
+				view.columns[category_field].codes[:] = column.codes
+			del view
+		except Exception:
+			self.__exit__()
+			raise
+
+	def __enter__(self) -> SharedPointsHandle:
+		return self.handle
+
+	def __exit__(self, *exc) -> None:
+		self._shm.close()
+		self._shm.unlink()
+
+
+def _run_on_shared(handle: SharedPointsHandle, fn: Callable[..., Dict[str, Any]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+	shm = SharedMemory(name=handle.shm_name)
+	try:
+		return fn(_views(shm.buf, handle), **kwargs)
+	finally:
+		try:
+			shm.close()
+		except BufferError:
+			# A propagating traceback can still pin the array views; the mapping goes with the exception.
+			pass
+
+
+def _get_pool() -> ProcessPoolExecutor:
+	global _pool
+	with _pool_lock:
+		if _pool is None:
+			# spawn, not fork: the API process has live threads (event loop, job runners).
+			_pool = ProcessPoolExecutor(max_workers=settings.analysis_process_workers, mp_context=get_context("spawn"))
+		return _pool
+
+
+def shutdown_process_pool() -> None:
+	global _pool
+	with _pool_lock:
+		if _pool is not None:
+			_pool.shutdown(wait=False, cancel_futures=True)
+			_pool = None
+
+
+def process_pool_enabled(n_points: int) -> bool:
+	return settings.analysis_process_workers > 0 and n_points >= settings.analysis_parallel_min_points
+
+
+def run_stages_in_pool(
+	points: PointSet,
+	category_field: str | None,
+	stages: Dict[str, Stage],
+	on_stage_done: Callable[[str], None] | None = None,
+) -> Dict[str, Dict[str, Any]]:
+	"""
+	Run every stage, fn(points, **kwargs), concurrently in worker processes and
+	return the results by stage name. Stage functions must be module-level so
+	they pickle; per-dataset structures they cache stay in the worker that ran
+	them.
+	"""
+	pool = _get_pool()
+	with SharedPoints(points, category_field) as handle:
+		futures: Dict[Future, str] = {
+			pool.submit(_run_on_shared, handle, fn, kwargs): stage for stage, (fn, kwargs) in stages.items()
+		}
+		results: Dict[str, Dict[str, Any]] = {}
+		try:
+			for future in as_completed(futures):
+				stage = futures[future]
+				results[stage] = future.result()
+				if on_stage_done is not None:
+					on_stage_done(stage)
+		finally:
+			# The block is unlinked on exit; don't pull it from under a worker still attaching.
+			wait(futures)
+	return results
@@ -1,9 +1,18 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Tuple
+from typing import Any, BinaryIO, Dict, Iterator, List, Tuple
+import codecs
 import csv
 import io
 import json
 
+import numpy as np
+
+from app.services.points import PointSet, PointSetBuilder
+
+
+# Bytes pulled from the upload spool per read while streaming a CSV.
+CSV_CHUNK_SIZE = 1024 * 1024
+
 
 def normalize_lat_lon_keys(header: List[str]) -> Dict[str, str]:
 	normalized = [h.strip().lower() for h in header]
@@ -23,30 +32,57 @@ def validate_coordinate(lat: float, lon: float) -> bool:
 	return -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0
 
 
-def parse_csv_points(file_bytes: bytes) -> List[Dict[str, Any]]:
-	text = file_bytes.decode("utf-8-sig")
-	reader = csv.DictReader(io.StringIO(text))
+def _iter_text_lines(stream: BinaryIO, chunk_size: int) -> Iterator[str]:
+	# Decode incrementally so a multi-byte character split across two chunks
+	# is handled, and only ever hold one chunk plus the trailing partial line.
+	decoder = codecs.getincrementaldecoder("utf-8-sig")()
+	pending = ""
+	while True:
+		chunk = stream.read(chunk_size)
+		pending += decoder.decode(chunk, final=not chunk)
+		if pending:
+			lines = pending.split("\n")
+			pending = lines.pop()
+			for line in lines:
+				yield line + "\n"
+		if not chunk:
+			break
+	if pending:
+		yield pending
+
+
+def iter_csv_points(
+	stream: BinaryIO,
+	chunk_size: int = CSV_CHUNK_SIZE,
+) -> Iterator[Dict[str, Any]]:
+	"""
+	Stream points out of a binary CSV file object without loading it whole.
+	"""
+	reader = csv.DictReader(_iter_text_lines(stream, chunk_size))
 	if not reader.fieldnames:
 		raise ValueError("CSV has no header")
 	key_map = normalize_lat_lon_keys(reader.fieldnames)
 	if "lat" not in key_map or "lon" not in key_map:
 		raise ValueError("CSV must contain latitude and longitude columns")
 
-	points: List[Dict[str, Any]] = []
+	lat_key, lon_key = key_map["lat"], key_map["lon"]
 	for row in reader:
 		try:
-			lat = float(row[key_map["lat"]])
-			lon = float(row[key_map["lon"]])
+			lat = float(row[lat_key])
+			lon = float(row[lon_key])
 		except Exception:
 			continue
 		if not validate_coordinate(lat, lon):
 			continue
-		attrs = {k: v for k, v in row.items() if k not in (key_map["lat"], key_map["lon"])}
-		points.append({"lat": lat, "lon": lon, "attributes": attrs})
-	return points
+		attrs = {k: v for k, v in row.items() if k not in (lat_key, lon_key)}
+		yield {"lat": lat, "lon": lon, "attributes": attrs}
+
+
+def parse_csv_points(file_bytes: bytes) -> PointSet:
+	return PointSet.from_records(iter_csv_points(io.BytesIO(file_bytes)))
 
 
-def parse_geojson_points(file_bytes: bytes) -> List[Dict[str, Any]]:
+def iter_geojson_points(file_bytes: bytes) -> Iterator[Dict[str, Any]]:
 	try:
 		data = json.loads(file_bytes.decode("utf-8"))
 	except Exception as e:
@@ -54,7 +90,6 @@ def parse_geojson_points(file_bytes: bytes) -> List[Dict[str, Any]]:
 	if data.get("type") != "FeatureCollection":
 		raise ValueError("Only FeatureCollection is supported")
 	features = data.get("features", [])
-	points: List[Dict[str, Any]] = []
 	for feat in features:
 		geom = feat.get("geometry") or {}
 		if geom.get("type") != "Point":
@@ -66,17 +101,22 @@ def parse_geojson_points(file_bytes: bytes) -> List[Dict[str, Any]]:
 		if not validate_coordinate(lat, lon):
 			continue
 		attrs = feat.get("properties") or {}
-		points.append({"lat": lat, "lon": lon, "attributes": attrs})
-	return points
+		yield {"lat": lat, "lon": lon, "attributes": attrs}
 
 
-def compute_bbox(points: List[Dict[str, Any]]) -> Dict[str, float]:
-	if not points:
-		raise ValueError("No valid points found")
-	min_lat = min(p["lat"] for p in points)
-	max_lat = max(p["lat"] for p in points)
-	min_lon = min(p["lon"] for p in points)
-	max_lon = max(p["lon"] for p in points)
-	return {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon}
+def parse_geojson_points(file_bytes: bytes) -> PointSet:
+	builder = PointSetBuilder()
+	for p in iter_geojson_points(file_bytes):
+		builder.append(p["lat"], p["lon"], p["attributes"])
+	return builder.build()
 
 
+def compute_bbox(points: PointSet) -> Dict[str, float]:
+	if not len(points):
+		raise ValueError("No valid points found")
+	return {
+		"min_lat": float(np.min(points.lat)),
+		"max_lat": float(np.max(points.lat)),
+		"min_lon": float(np.min(points.lon)),
+		"max_lon": float(np.max(points.lon)),
+	}
@@ -0,0 +1,65 @@
+"""
+Load-or-build for per-dataset indexes persisted next to the point store.
+
+Files are written to a temporary name in the same directory and moved into
+place with os.replace, so a crash or a concurrent reader in another worker
+never sees a partial file; anything that still fails to load is treated as
+missing and rebuilt.
+"""
+from __future__ import annotations
+from typing import Callable, TypeVar
+import logging
+import os
+import tempfile
+import zipfile
+
+
+log = logging.getLogger("persisted")
+
+T = TypeVar("T")
+
+# What np.load / sparse.load_npz raise for missing, truncated or foreign files.
+UNREADABLE_ERRORS = (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile)
+
+
+def write_atomic(path: str, write: Callable[[str], None]) -> None:
+	"""Call write(tmp_path) and move the result to `path`."""
+	directory = os.path.dirname(path) or "."
+	# Keep the extension: np.savez / save_npz append ".npz" to names without it.
+	fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+	os.close(fd)
+	try:
+		write(tmp_path)
+		os.replace(tmp_path, path)
+	except BaseException:
+		try:
+			os.remove(tmp_path)
+		except OSError:
+			pass
+		raise
+
+
+def load_or_build(
+	path: str | None,
+	load: Callable[[str], T],
+	build: Callable[[], T | None],
+	save: Callable[[str, T], None],
+	what: str,
+) -> T | None:
+	"""
+	Load `path` if it exists and is readable, else build and persist it
+	(`save` must write atomically, e.g. through write_atomic). A None from
+	`build` is returned as is and not persisted.
+	"""
+	if path and os.path.exists(path):
+		try:
+			return load(path)
+		except UNREADABLE_ERRORS:
+			log.warning("Ignoring unreadable %s %s", what, path, exc_info=True)
+	value = build()
+	if path and value is not None:
+		try:
+			save(path, value)
+		except OSError:
+			log.warning("Could not persist %s %s", what, path, exc_info=True)
+	return value
@@ -0,0 +1,205 @@
+"""
+End-to-end analysis pipeline shared by the synchronous endpoint and background jobs.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Tuple
+import json
+
+from app.core.config import settings
+from app.db.models import Dataset
+from app.schemas.analysis import AnalyzeParams
+from app.services.analysis import (
+	compute_summary,
+	getis_ord_hotspots,
+	kde_heatmap,
+	nearest_neighbor_stats,
+	ripley_k,
+)
+from app.services.neighbors import neighbor_cache
+from app.services.parallel import Stage, process_pool_enabled, run_stages_in_pool
+from app.services.parsing import iter_csv_points, parse_geojson_points
+from app.services.point_store import hash_stream, load_point_store, read_store_meta, store_dir_for, write_point_store
+from app.services.points import PointSet
+from app.services.result_cache import analysis_cache_key, result_cache
+from app.services.sampling import PointSample, annotate_sampled_result, sample_points
+from app.services.spatial_filter import area_rows
+from app.services.stages import clustering_stage, grid_stage
+from app.services.tiles import tile_cache
+
+
+# Called with (stage, fraction_complete) as the pipeline advances.
+ProgressCallback = Callable[[str, float], None]
+
+
+def load_points_for_dataset(dataset: Dataset) -> PointSet:
+	store_dir = store_dir_for(dataset.storage_path)
+	points = load_point_store(store_dir)
+	if points is not None:
+		return points
+
+	# Uploaded before the columnar store existed: parse once and backfill it.
+	with open(dataset.storage_path, "rb") as f:
+		content_hash = hash_stream(f)
+		f.seek(0)
+		if dataset.file_type == "csv":
+			points = PointSet.from_records(iter_csv_points(f))
+		else:
+			points = parse_geojson_points(f.read())
+	try:
+		write_point_store(store_dir, points, content_hash=content_hash)
+	except OSError:
+		pass
+	return points
+
+
+def dataset_content_hash(dataset: Dataset) -> str:
+	meta = read_store_meta(store_dir_for(dataset.storage_path))
+	if meta and meta.get("content_hash"):
+		return meta["content_hash"]
+	with open(dataset.storage_path, "rb") as f:
+		return hash_stream(f)
+
+
+def run_analysis(
+	points: PointSet,
+	params: AnalyzeParams,
+	on_progress: ProgressCallback | None = None,
+	dataset_key: str | None = None,
+	store_dir: str | None = None,
+	sample: PointSample | None = None,
+) -> Dict[str, Any]:
+	"""
+	`dataset_key` (the dataset content hash) enables per-dataset reusable
+	indexes; `store_dir` lets them persist next to the point store. When
+	`points` is a `sample` of the dataset, DBSCAN's min_samples is scaled by the
+	sampling fraction and each stage reports how to scale its counts.
+	"""
+	def progress(stage: str, fraction: float) -> None:
+		if on_progress is not None:
+			on_progress(stage, fraction)
+
+	if sample is not None:
+		params = params.model_copy(
+			update={"dbscan_min_samples": max(1, round(params.dbscan_min_samples * sample.fraction))}
+		)
+
+	stage_kwargs = {"params": params, "dataset_key": dataset_key, "store_dir": store_dir}
+	stages: Dict[str, Stage] = {
+		"summary": (compute_summary, {"category_field": params.category_field}),
+		"grid_density": (grid_stage, stage_kwargs),
+		"clustering": (clustering_stage, stage_kwargs),
+	}
+	if process_pool_enabled(len(points)):
+		done: list[str] = []
+
+		def stage_done(stage: str) -> None:
+			done.append(stage)
+			progress(stage, 0.1 + 0.3 * len(done))
+
+		progress("stages", 0.1)
+		results = run_stages_in_pool(points, params.category_field, stages, on_stage_done=stage_done)
+	else:
+		results = {}
+		for (stage, (fn, kwargs)), fraction in zip(stages.items(), (0.1, 0.3, 0.5)):
+			progress(stage, fraction)
+			results[stage] = fn(points, **kwargs)
+
+	result = {
+		"summary": results["summary"],
+		"grid_density": results["grid_density"],
+		"clustering": results["clustering"],
+	}
+	if params.hotspots:
+		progress("hotspots", 0.7)
+		result["hotspots"] = getis_ord_hotspots(points, grid_cell_size=params.grid_cell_size)
+	if params.nearest_neighbor:
+		progress("nearest_neighbor", 0.75)
+		# Share the dataset's BallTree (and radius graph, if clustering built one in this process) with the clustering stage.
+		tree = graph = None
+		if dataset_key is not None:
+			index = neighbor_cache.index_for(dataset_key, points)
+			tree, graph = index.tree, index.graph.graph if index.graph is not None else None
+		result["nearest_neighbor"] = nearest_neighbor_stats(points, tree=tree, neighbor_graph=graph)
+	if params.ripley_distances_km:
+		progress("ripley", 0.78)
+		result["ripley"] = ripley_k(
+			points,
+			params.ripley_distances_km,
+			max_points=settings.ripley_max_points,
+			n_bootstrap=settings.ripley_bootstrap,
+		)
+	if params.kde_bandwidth_km is not None:
+		progress("kde", 0.8)
+		result["kde"] = kde_heatmap(
+			points,
+			cell_size=params.kde_cell_size or params.grid_cell_size,
+			bandwidth_km=params.kde_bandwidth_km,
+			max_cells=settings.kde_max_cells,
+		)
+	if sample is not None:
+		annotate_sampled_result(result, sample, min_samples=params.dbscan_min_samples)
+	return result
+
+
+def analyze_dataset_cached(
+	dataset: Dataset, params: AnalyzeParams, on_progress: ProgressCallback | None = None
+) -> Tuple[str, bool]:
+	"""
+	Return (result_json, cache_hit) for a dataset, serving identical
+	dataset content + parameters from the result cache.
+	"""
+	content_hash = dataset_content_hash(dataset)
+	key = analysis_cache_key(content_hash, params.model_dump_json())
+	cached = result_cache.get(key)
+	if cached is not None:
+		return cached, True
+
+	if on_progress is not None:
+		on_progress("loading", 0.0)
+	points = load_points_for_dataset(dataset)
+	if not len(points):
+		raise ValueError("No points to analyze")
+	dataset_key: str | None = content_hash
+	store_dir: str | None = store_dir_for(dataset.storage_path)
+	area: Dict[str, Any] | None = None
+	selected = None
+	if params.bbox is not None or params.polygon is not None:
+		index = tile_cache.index_for(content_hash, points, store_dir)
+		bbox = params.bbox.bounds() if params.bbox is not None else None
+		selected = area_rows(index, points, bbox=bbox, polygon=params.polygon)
+		if not len(selected):
+			raise ValueError("No points inside the requested area")
+		area = {
+			"bbox": params.bbox.model_dump() if params.bbox is not None else None,
+			"polygon": params.polygon is not None,
+			"n_total": len(points),
+			"n_selected": int(len(selected)),
+		}
+		points = points.take(selected)
+	sample = sample_points(points, params.sample, cell_size=params.grid_cell_size) if params.sample else None
+	if sample is not None:
+		points = sample.points
+		if selected is not None:
+			# Report dataset row ids, not positions within the area.
+			sample.rows = selected[sample.rows]
+	if selected is not None or sample is not None:
+		# Indexes over a one-off subset are built per request: caching them would
+		# evict the whole-dataset entries from the shared per-dataset caches.
+		dataset_key = None
+		store_dir = None
+	result = run_analysis(
+		points,
+		params,
+		on_progress=on_progress,
+		dataset_key=dataset_key,
+		store_dir=store_dir,
+		sample=sample,
+	)
+	if area is not None:
+		if sample is None:
+			# Per-point outputs (clustering labels) follow these dataset rows.
+			area["rows"] = selected.tolist()
+		result["area"] = area
+	result_json = json.dumps(result)
+	result_cache.put(key, result_json)
+	return result_json, False
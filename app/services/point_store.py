@@ -0,0 +1,164 @@
+"""
+On-disk columnar point store written next to each uploaded file.
+
+Layout of `<storage_path>.store/`:
+	meta.json      small header: format version, point count, source file
+	               content hash, attribute column names and dictionary sizes
+	lat.npy        float64 latitudes
+	lon.npy        float64 longitudes
+	col_<k>.npy    int32 dictionary codes for attribute column k (-1 = missing)
+	col_<k>.json   the dictionary (distinct values) of column k, read on first use
+	zorder/        the points in Z-order (see tiles.TileIndex): row ids, curve
+	               codes, lat/lon in that order and a block bbox index
+
+Arrays are plain .npy files so they can be memory-mapped instead of re-parsed;
+dictionaries live outside meta.json so hash lookups and tile requests only
+parse the header.
+Columns stay in upload row order, which every per-point result refers to; the
+Z-order copy of the coordinates serves spatial range reads.
+"""
+from __future__ import annotations
+from typing import Any, BinaryIO, Dict, Iterator, List, Sequence
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from app.services.points import DictColumn, PointSet
+from app.services.tiles import build_tile_index, write_spatial_layout
+
+
+STORE_VERSION = 2
+STORE_SUFFIX = ".store"
+META_FILE = "meta.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def store_dir_for(storage_path: str) -> str:
+	return storage_path + STORE_SUFFIX
+
+
+def hash_stream(stream: BinaryIO, copy_to: BinaryIO | None = None) -> str:
+	"""SHA-256 of a binary stream, optionally copying it to `copy_to` in the same pass."""
+	digest = hashlib.sha256()
+	for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+		digest.update(chunk)
+		if copy_to is not None:
+			copy_to.write(chunk)
+	return digest.hexdigest()
+
+
+class HashingTee:
+	"""
+	Read-through wrapper that hashes every byte read and copies it to `copy_to`,
+	so a parser consuming the stream also persists and fingerprints it in one pass.
+	"""
+
+	def __init__(self, stream: BinaryIO, copy_to: BinaryIO) -> None:
+		self._stream = stream
+		self._copy_to = copy_to
+		self._digest = hashlib.sha256()
+
+	def read(self, size: int = -1) -> bytes:
+		chunk = self._stream.read(size)
+		if chunk:
+			self._digest.update(chunk)
+			self._copy_to.write(chunk)
+		return chunk
+
+	def hexdigest(self) -> str:
+		"""Drain whatever the consumer left unread, then return the SHA-256 of the whole stream."""
+		for _ in iter(lambda: self.read(HASH_CHUNK_SIZE), b""):
+			pass
+		return self._digest.hexdigest()
+
+
+class StoredValues(Sequence[Any]):
+	"""A column dictionary on disk, parsed on first access; its length comes from the header."""
+
+	def __init__(self, path: str, size: int) -> None:
+		self._path = path
+		self._size = size
+		self._values: List[Any] | None = None
+
+	def _load(self) -> List[Any]:
+		# Concurrent first reads may both parse the file; either result is the same list.
+		if self._values is None:
+			with open(self._path, "r", encoding="utf-8") as f:
+				self._values = json.load(f)
+		return self._values
+
+	def __len__(self) -> int:
+		return self._size
+
+	def __getitem__(self, index: Any) -> Any:
+		return self._load()[index]
+
+	def __iter__(self) -> Iterator[Any]:
+		return iter(self._load())
+
+
+def write_point_store(store_dir: str, points: PointSet, content_hash: str | None = None) -> None:
+	parent = os.path.dirname(os.path.abspath(store_dir))
+	tmp_dir = tempfile.mkdtemp(prefix=".store-", dir=parent)
+	try:
+		np.save(os.path.join(tmp_dir, "lat.npy"), np.ascontiguousarray(points.lat, dtype=np.float64))
+		np.save(os.path.join(tmp_dir, "lon.npy"), np.ascontiguousarray(points.lon, dtype=np.float64))
+		columns = []
+		for k, (name, col) in enumerate(points.columns.items()):
+			filename = f"col_{k}.npy"
+			values_file = f"col_{k}.json"
+			np.save(os.path.join(tmp_dir, filename), np.ascontiguousarray(col.codes, dtype=np.int32))
+			with open(os.path.join(tmp_dir, values_file), "w", encoding="utf-8") as f:
+				json.dump(list(col.values), f, default=str)
+			columns.append({"name": name, "file": filename, "values_file": values_file, "n_values": len(col.values)})
+		meta: Dict[str, Any] = {
+			"version": STORE_VERSION,
+			"n_points": len(points),
+			"content_hash": content_hash,
+			"columns": columns,
+		}
+		write_spatial_layout(tmp_dir, build_tile_index(points))
+		with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+			json.dump(meta, f, default=str)
+		if os.path.isdir(store_dir):
+			shutil.rmtree(store_dir)
+		os.replace(tmp_dir, store_dir)
+	except Exception:
+		shutil.rmtree(tmp_dir, ignore_errors=True)
+		raise
+
+
+def read_store_meta(store_dir: str) -> Dict[str, Any] | None:
+	"""
+	Read a store's meta.json. Returns None when no usable store exists
+	(legacy uploads, or a store written by an incompatible version).
+	"""
+	meta_path = os.path.join(store_dir, META_FILE)
+	if not os.path.isfile(meta_path):
+		return None
+	with open(meta_path, "r", encoding="utf-8") as f:
+		meta = json.load(f)
+	if meta.get("version") != STORE_VERSION:
+		return None
+	return meta
+
+
+def load_point_store(store_dir: str) -> PointSet | None:
+	"""Memory-map a point store, or return None if there is no usable one."""
+	meta = read_store_meta(store_dir)
+	if meta is None:
+		return None
+	lat = np.load(os.path.join(store_dir, "lat.npy"), mmap_mode="r")
+	lon = np.load(os.path.join(store_dir, "lon.npy"), mmap_mode="r")
+	columns = {
+		col["name"]: DictColumn(
+			codes=np.load(os.path.join(store_dir, col["file"]), mmap_mode="r"),
+			values=StoredValues(os.path.join(store_dir, col["values_file"]), col["n_values"]),
+		)
+		for col in meta.get("columns", [])
+	}
+	return PointSet(lat=lat, lon=lon, columns=columns)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Iterable, List, Sequence
+import json
+
+import numpy as np
+
+
+@dataclass
+class DictColumn:
+	"""Dictionary-encoded attribute column: codes index into values, -1 means the attribute is missing."""
+
+	codes: np.ndarray
+	values: Sequence[Any]
+
+
+@dataclass
+class PointSet:
+	"""Columnar point collection: float64 coordinate arrays plus dictionary-encoded attributes."""
+
+	lat: np.ndarray
+	lon: np.ndarray
+	columns: Dict[str, DictColumn] = field(default_factory=dict)
+
+	def __len__(self) -> int:
+		return int(self.lat.shape[0])
+
+	def take(self, rows: np.ndarray) -> "PointSet":
+		"""New PointSet holding `rows` (in the given order); columns keep their value tables."""
+		return PointSet(
+			lat=self.lat[rows],
+			lon=self.lon[rows],
+			columns={name: DictColumn(codes=col.codes[rows], values=col.values) for name, col in self.columns.items()},
+		)
+
+	@classmethod
+	def from_records(cls, records: Iterable[Dict[str, Any]]) -> "PointSet":
+		builder = PointSetBuilder()
+		for rec in records:
+			builder.append(rec["lat"], rec["lon"], rec.get("attributes") or {})
+		return builder.build()
+
+
+def _value_key(value: Any) -> Hashable:
+	# Keep the type in the key so 1, 1.0 and True stay distinct values.
+	if isinstance(value, Hashable):
+		return (type(value).__name__, value)
+	return ("json", json.dumps(value, sort_keys=True, default=str))
+
+
+class _ColumnBuilder:
+	def __init__(self, n_missing: int) -> None:
+		self.codes = array("i", [-1]) * n_missing
+		self.values: List[Any] = []
+		self._lookup: Dict[Hashable, int] = {}
+
+	def append(self, value: Any) -> None:
+		key = _value_key(value)
+		code = self._lookup.get(key)
+		if code is None:
+			code = self._lookup[key] = len(self.values)
+			self.values.append(value)
+		self.codes.append(code)
+
+
+class PointSetBuilder:
+	"""Accumulates points one at a time into compact typed buffers."""
+
+	def __init__(self) -> None:
+		self._lat = array("d")
+		self._lon = array("d")
+		self._columns: Dict[str, _ColumnBuilder] = {}
+
+	def __len__(self) -> int:
+		return len(self._lat)
+
+	def append(self, lat: float, lon: float, attributes: Dict[str, Any]) -> None:
+		n = len(self._lat)
+		self._lat.append(lat)
+		self._lon.append(lon)
+		for name, value in attributes.items():
+			# csv.DictReader puts overflow fields under a None key; those are not columns.
+			if not isinstance(name, str):
+				continue
+			col = self._columns.get(name)
+			if col is None:
+				col = self._columns[name] = _ColumnBuilder(n)
+			col.append(value)
+		n += 1
+		for col in self._columns.values():
+			if len(col.codes) < n:
+				col.codes.append(-1)
+
+	def build(self) -> PointSet:
+		columns = {
+			name: DictColumn(codes=np.frombuffer(col.codes, dtype=np.int32), values=col.values)
+			for name, col in self._columns.items()
+		}
+		return PointSet(
+			lat=np.frombuffer(self._lat, dtype=np.float64),
+			lon=np.frombuffer(self._lon, dtype=np.float64),
+			columns=columns,
+		)
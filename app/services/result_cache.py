@@ -0,0 +1,121 @@
+"""
+Cache of serialized analysis results, keyed by dataset content and parameters.
+
+A size-bounded in-memory LRU sits in front of an optional directory of JSON
+files, so repeat analyses skip the pipeline even across restarts or workers.
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from app.core.config import settings
+from app.services.lru import LRUCache
+
+
+log = logging.getLogger("result_cache")
+
+# Bump when the result format changes so stale entries stop matching.
+RESULT_CACHE_VERSION = 2
+
+
+def analysis_cache_key(content_hash: str, params_json: str) -> str:
+	raw = f"v{RESULT_CACHE_VERSION}:{content_hash}:{params_json}"
+	return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+	def __init__(self, max_bytes: int, disk_dir: str | None = None, disk_max_bytes: int = 0) -> None:
+		self.max_bytes = max_bytes
+		self.disk_dir = disk_dir
+		self.disk_max_bytes = disk_max_bytes
+		self._entries: LRUCache[str, str] = LRUCache(max_bytes=max_bytes)
+		self._disk_bytes: int | None = None
+		self._lock = threading.Lock()
+
+	def get(self, key: str) -> str | None:
+		value = self._entries.get(key)
+		if value is not None:
+			return value
+		value = self._disk_get(key)
+		if value is not None:
+			self._entries.put(key, value)
+		return value
+
+	def put(self, key: str, value: str) -> None:
+		self._entries.put(key, value)
+		self._disk_put(key, value)
+
+	def clear(self) -> None:
+		self._entries.clear()
+
+	def _disk_path(self, key: str) -> str:
+		return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+	def _disk_get(self, key: str) -> str | None:
+		if not self.disk_dir:
+			return None
+		path = self._disk_path(key)
+		try:
+			with open(path, "r", encoding="utf-8") as f:
+				value = f.read()
+			os.utime(path)  # mtime doubles as last-use time for eviction
+			return value
+		except OSError:
+			return None
+
+	def _disk_put(self, key: str, value: str) -> None:
+		if not self.disk_dir:
+			return
+		path = self._disk_path(key)
+		try:
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+			with os.fdopen(fd, "w", encoding="utf-8") as f:
+				f.write(value)
+			os.replace(tmp_path, path)
+		except OSError:
+			log.warning("Could not write analysis result to disk cache", exc_info=True)
+			return
+		if self.disk_max_bytes > 0:
+			self._trim_disk(len(value))
+
+	def _trim_disk(self, added: int) -> None:
+		with self._lock:
+			if self._disk_bytes is None:
+				self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+			else:
+				self._disk_bytes += added
+			if self._disk_bytes <= self.disk_max_bytes:
+				return
+			# Drop least recently used files until comfortably under the limit.
+			target = int(self.disk_max_bytes * 0.9)
+			for mtime, size, path in sorted(self._disk_files()):
+				if self._disk_bytes <= target:
+					break
+				try:
+					os.remove(path)
+					self._disk_bytes -= size
+				except OSError:
+					pass
+
+	def _disk_files(self):
+		for root, _, files in os.walk(self.disk_dir):
+			for name in files:
+				if not name.endswith(".json"):
+					continue
+				path = os.path.join(root, name)
+				try:
+					st = os.stat(path)
+				except OSError:
+					continue
+				yield st.st_mtime, st.st_size, path
+
+
+result_cache = ResultCache(
+	max_bytes=settings.analysis_cache_max_bytes,
+	disk_dir=settings.analysis_cache_dir,
+	disk_max_bytes=settings.analysis_cache_disk_max_bytes,
+)
@@ -0,0 +1,143 @@
+"""
+Seeded point sampling for approximate preview analyses.
+
+A sample keeps every point with the same probability `fraction`, so a count
+taken on it estimates the full count as count * scale_factor, with a 95%
+half-width of error_coefficient * sqrt(count) (binomial approximation; it is
+conservative for the stratified method, whose per-cell totals are fixed up to
+rounding).
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict
+import math
+
+import numpy as np
+
+from app.schemas.analysis import SampleParams
+from app.services.points import PointSet
+
+
+_Z_95 = 1.96
+# Stratification grids up to this many cells (or one per point) are counted densely.
+_DENSE_CELLS = 1 << 22
+
+
+@dataclass
+class PointSample:
+	points: PointSet
+	# Row ids of the sampled points in the full dataset, ascending.
+	rows: np.ndarray
+	n_total: int
+	method: str
+	seed: int
+
+	@property
+	def fraction(self) -> float:
+		return len(self.rows) / self.n_total
+
+	@property
+	def scale_factor(self) -> float:
+		return self.n_total / len(self.rows)
+
+	@property
+	def error_coefficient(self) -> float:
+		f = self.fraction
+		return _Z_95 * math.sqrt(max(1.0 - f, 0.0)) / f
+
+	def describe(self) -> Dict[str, Any]:
+		return {
+			"method": self.method,
+			"seed": self.seed,
+			"n_total": self.n_total,
+			"n_sampled": int(len(self.rows)),
+			"fraction": self.fraction,
+			"scale_factor": self.scale_factor,
+			"error_coefficient": self.error_coefficient,
+			"confidence": 0.95,
+		}
+
+
+def _reservoir_rows(n: int, m: int, rng: np.random.Generator) -> np.ndarray:
+	# The row count is known up front, so a reservoir pass reduces to choosing m distinct rows.
+	return np.sort(rng.choice(n, size=m, replace=False))
+
+
+def _stratified_rows(points: PointSet, m: int, cell_size: float, rng: np.random.Generator) -> np.ndarray:
+	"""
+	Proportional allocation over square cells of `cell_size` degrees: each cell
+	keeps fraction * count points, randomly rounded so the expectation is exact,
+	chosen uniformly within the cell.
+	"""
+	n = len(points)
+	lats = np.asarray(points.lat, dtype=float)
+	lons = np.asarray(points.lon, dtype=float)
+	i = np.floor((lats - lats.min()) / cell_size).astype(np.int64)
+	j = np.floor((lons - lons.min()) / cell_size).astype(np.int64)
+	n_cols = int(j.max()) + 1
+	cell = i * n_cols + j
+	if (int(i.max()) + 1) * n_cols <= max(n, _DENSE_CELLS):
+		counts = np.bincount(cell)
+	else:
+		_, cell, counts = np.unique(cell, return_inverse=True, return_counts=True)
+	quota = np.floor(counts * (m / n) + rng.random(len(counts))).astype(np.int64)
+
+	# Only sort a candidate set: each point is drawn with a per-cell probability
+	# a few standard deviations above its quota, and every cell keeps the quota
+	# candidates with the smallest keys (all of them on the rare shortfall).
+	keys = rng.random(n)
+	p = np.minimum(1.0, (quota + 3.0 * np.sqrt(quota) + 1.0) / np.maximum(counts, 1))
+	candidates = np.flatnonzero(keys < p[cell])
+	order = candidates[np.lexsort((keys[candidates], cell[candidates]))]
+	sorted_cell = cell[order]
+	starts = np.flatnonzero(np.concatenate([[True], sorted_cell[1:] != sorted_cell[:-1]]))
+	rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.append(starts, len(order))))
+	return np.sort(order[rank < quota[sorted_cell]])
+
+
+def sample_points(points: PointSet, params: SampleParams, cell_size: float) -> PointSample | None:
+	"""
+	Draw the sample described by `params` (stratified over `cell_size` cells),
+	or None when it would keep every point.
+	"""
+	n = len(points)
+	m = params.size if params.size is not None else math.ceil(params.fraction * n)
+	if n == 0 or m >= n:
+		return None
+	rng = np.random.default_rng(params.seed)
+	if params.method == "stratified":
+		rows = _stratified_rows(points, m, cell_size, rng)
+	else:
+		rows = _reservoir_rows(n, m, rng)
+	if not len(rows):
+		return None
+	return PointSample(points=points.take(rows), rows=rows, n_total=n, method=params.method, seed=params.seed)
+
+
+def annotate_sampled_result(result: Dict[str, Any], sample: PointSample, min_samples: int) -> None:
+	"""
+	Record the sample and, per stage, the factors that turn its counts into
+	full-dataset estimates. Counts themselves stay as measured on the sample.
+	"""
+	scale = sample.scale_factor
+	coef = sample.error_coefficient
+	result["sampling"] = sample.describe()
+
+	summary = result["summary"]
+	summary["sample"] = {
+		"scale_factor": scale,
+		"estimated_total_points": sample.n_total,
+		"category_count_errors": {
+			key: coef * math.sqrt(count) for key, count in summary.get("category_counts", {}).items()
+		},
+	}
+	result["grid_density"]["sample"] = {"scale_factor": scale, "error_coefficient": coef}
+	# Labels index the sampled points; `rows` maps them back to dataset rows.
+	result["clustering"]["sample"] = {
+		"scale_factor": scale,
+		"error_coefficient": coef,
+		"min_samples": min_samples,
+		"rows": sample.rows.tolist(),
+	}
+	if "kde" in result:
+		result["kde"]["sample"] = {"scale_factor": scale}
@@ -0,0 +1,151 @@
+"""
+Bounding-box / polygon selection of dataset rows through the tile index.
+
+The query rectangle is decomposed into quadtree cells of the Morton-sorted
+tile index (see tiles.py); each fully covered cell is one contiguous run of
+the index, and cells on the boundary are refined down to INDEX_ZOOM tiles
+(or until MAX_RANGES runs). Runs are then clipped to the blocks of the
+index's block bbox index that intersect the query, and the coordinates of
+what remains are read contiguously from the curve-ordered layout for an
+exact test. Only the points in those runs are read.
+"""
+from __future__ import annotations
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.points import PointSet
+from app.services.tiles import INDEX_ZOOM, TileIndex, mercator_xy, morton_codes
+
+
+# Boundary cells stop being refined once this many index runs are pending.
+MAX_RANGES = 4096
+
+# (min_lat, max_lat, min_lon, max_lon)
+BBox = Tuple[float, float, float, float]
+
+
+def _tile_rect(bbox: BBox) -> Tuple[int, int, int, int]:
+	min_lat, max_lat, min_lon, max_lon = bbox
+	x, y = mercator_xy(np.array([max_lat, min_lat]), np.array([min_lon, max_lon]))
+	scale = 1 << INDEX_ZOOM
+	tx = np.clip((x * scale).astype(np.int64), 0, scale - 1)
+	ty = np.clip((y * scale).astype(np.int64), 0, scale - 1)
+	# Mercator y grows southwards, so max_lat gives the top row.
+	return int(tx[0]), int(ty[0]), int(tx[1]), int(ty[1])
+
+
+def morton_ranges(bbox: BBox, max_ranges: int = MAX_RANGES) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Half-open [lo, hi) INDEX_ZOOM Morton code ranges whose union covers `bbox`
+	(a superset: boundary cells are included whole).
+	"""
+	tx0, ty0, tx1, ty1 = _tile_rect(bbox)
+	x = np.zeros(1, dtype=np.int64)
+	y = np.zeros(1, dtype=np.int64)
+	lo_parts: List[np.ndarray] = []
+	hi_parts: List[np.ndarray] = []
+	for level in range(INDEX_ZOOM + 1):
+		shift = INDEX_ZOOM - level
+		size = 1 << shift
+		x0, y0 = x << shift, y << shift
+		full = (x0 >= tx0) & (x0 + size - 1 <= tx1) & (y0 >= ty0) & (y0 + size - 1 <= ty1)
+		last = level == INDEX_ZOOM or 4 * int((~full).sum()) + sum(len(p) for p in lo_parts) > max_ranges
+		take = np.ones_like(full) if last else full
+		lo = morton_codes(x[take], y[take]).astype(np.int64) << (2 * shift)
+		lo_parts.append(lo)
+		hi_parts.append(lo + (1 << (2 * shift)))
+		if last:
+			break
+		# Children of boundary cells that still overlap the rectangle.
+		x = np.repeat(x[~full] * 2, 4) + np.tile([0, 1, 0, 1], int((~full).sum()))
+		y = np.repeat(y[~full] * 2, 4) + np.tile([0, 0, 1, 1], int((~full).sum()))
+		child = shift - 1
+		overlap = ((x + 1) << child > tx0) & (x << child <= tx1) & ((y + 1) << child > ty0) & (y << child <= ty1)
+		x, y = x[overlap], y[overlap]
+	return np.concatenate(lo_parts), np.concatenate(hi_parts)
+
+
+def _in_polygon(lat: np.ndarray, lon: np.ndarray, ring: np.ndarray) -> np.ndarray:
+	"""Even-odd rule for a [lon, lat] ring, vectorized over points."""
+	inside = np.zeros(len(lat), dtype=bool)
+	x2, y2 = ring[-1]
+	for x1, y1 in ring:
+		crosses = (y1 > lat) != (y2 > lat)
+		with np.errstate(divide="ignore", invalid="ignore"):
+			x_at = x1 + (lat - y1) * (x2 - x1) / (y2 - y1)
+		inside ^= crosses & (lon < x_at)
+		x2, y2 = x1, y1
+	return inside
+
+
+def area_rows(
+	index: TileIndex, points: PointSet, bbox: BBox | None = None, polygon: Sequence[Sequence[float]] | None = None
+) -> np.ndarray:
+	"""
+	Ascending row ids of the points inside `bbox` and, if given, inside the
+	`polygon` ring of [lon, lat] vertices. Without a bbox the polygon's own
+	bounds drive the index lookup.
+	"""
+	ring = np.asarray(polygon, dtype=np.float64) if polygon is not None else None
+	if ring is not None:
+		poly_box = (ring[:, 1].min(), ring[:, 1].max(), ring[:, 0].min(), ring[:, 0].max())
+		if bbox is None:
+			bbox = poly_box
+		else:
+			bbox = (max(bbox[0], poly_box[0]), min(bbox[1], poly_box[1]), max(bbox[2], poly_box[2]), min(bbox[3], poly_box[3]))
+	if bbox is None:
+		return np.arange(len(points), dtype=np.int64)
+	min_lat, max_lat, min_lon, max_lon = bbox
+	if min_lat > max_lat or min_lon > max_lon:
+		return np.empty(0, dtype=np.int64)
+
+	starts, stops = _candidate_runs(index, bbox)
+	row_parts: List[np.ndarray] = []
+	for a, b in zip(starts.tolist(), stops.tolist()):
+		# Coordinates are stored in index order, so each run is one contiguous read.
+		lat = index.lat[a:b]
+		lon = index.lon[a:b]
+		keep = (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+		if ring is not None:
+			keep[keep] = _in_polygon(lat[keep], lon[keep], ring)
+		row_parts.append(index.order[a:b][keep])
+	if not row_parts:
+		return np.empty(0, dtype=np.int64)
+	return np.sort(np.concatenate(row_parts)).astype(np.int64, copy=False)
+
+
+def _candidate_runs(index: TileIndex, bbox: BBox) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Position runs [start, stop) of the index to scan: the Morton ranges covering
+	`bbox`, clipped to blocks whose bounds intersect it and merged where adjacent.
+	"""
+	lo, hi = morton_ranges(bbox)
+	# Match the index dtype so the search doesn't cast the codes to float.
+	starts = np.searchsorted(index.codes, lo.astype(index.codes.dtype))
+	stops = np.searchsorted(index.codes, hi.astype(index.codes.dtype))
+	nonempty = stops > starts
+	starts, stops = starts[nonempty], stops[nonempty]
+	if not len(starts):
+		return starts, stops
+
+	min_lat, max_lat, min_lon, max_lon = bbox
+	bounds = index.block_bounds
+	hit = (bounds[:, 0] <= max_lat) & (bounds[:, 1] >= min_lat) & (bounds[:, 2] <= max_lon) & (bounds[:, 3] >= min_lon)
+	# Split every run at block boundaries and drop the pieces in blocks that miss the bbox.
+	block_starts = np.asarray(index.block_starts)
+	first = np.searchsorted(block_starts, starts, side="right") - 1
+	last = np.searchsorted(block_starts, stops - 1, side="right") - 1
+	n_pieces = last - first + 1
+	run = np.repeat(np.arange(len(starts)), n_pieces)
+	block = np.repeat(first, n_pieces) + (np.arange(int(n_pieces.sum())) - np.repeat(np.cumsum(n_pieces) - n_pieces, n_pieces))
+	block_end = np.append(block_starts[1:], len(index.codes))
+	piece_starts = np.maximum(starts[run], block_starts[block])
+	piece_stops = np.minimum(stops[run], block_end[block])
+	keep = hit[block]
+	piece_starts, piece_stops = piece_starts[keep], piece_stops[keep]
+	if not len(piece_starts):
+		return piece_starts, piece_stops
+	# Merge pieces that continue each other into one read.
+	new_run = np.concatenate([[True], piece_starts[1:] != piece_stops[:-1]])
+	return piece_starts[new_run], piece_stops[np.append(np.flatnonzero(new_run)[1:] - 1, len(piece_stops) - 1)]
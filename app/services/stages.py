@@ -0,0 +1,92 @@
+"""
+Analysis stages that reuse per-dataset structures.
+
+Each stage is a module-level function of (points, params, dataset_key,
+store_dir), so the pipeline can call it directly or submit it to the process
+pool as is. The cached structure a stage needs (density pyramid, radius
+graph, cluster hierarchy) is fetched inside the stage, from the caches of
+whichever process runs it; with a `store_dir` it is persisted next to the
+point store, so other processes load it instead of rebuilding it.
+"""
+from __future__ import annotations
+from typing import Any, Dict
+
+from app.core.config import settings
+from app.schemas.analysis import AnalyzeParams
+from app.services.analysis import (
+	ClusterHierarchy,
+	dbscan_clustering,
+	fit_cluster_hierarchy,
+	grid_density,
+	hexbin_density,
+	hierarchy_clustering,
+)
+from app.services.density import density_cache, exact_pyramid_level
+from app.services.hierarchy import hierarchy_cache
+from app.services.neighbors import neighbor_cache
+from app.services.points import PointSet
+
+
+def grid_stage(
+	points: PointSet, params: AnalyzeParams, dataset_key: str | None = None, store_dir: str | None = None
+) -> Dict[str, Any]:
+	"""
+	Grid density (or hexbin) for `params`. Square grids whose cell size is an
+	exact level of the dataset's density pyramid are read from the pyramid.
+	"""
+	if params.density_mode == "hexbin":
+		return hexbin_density(points, hex_size=params.grid_cell_size)
+	exact_level = exact_pyramid_level(params.grid_cell_size, settings.density_pyramid_base_cell)
+	if dataset_key is not None and exact_level is not None and len(points):
+		pyramid = density_cache.get(dataset_key, lambda: points, store_dir=store_dir)
+		if pyramid is not None:
+			return pyramid.grid_density(params.grid_cell_size, encoding=params.grid_encoding)[0]
+	return grid_density(points, grid_cell_size=params.grid_cell_size, encoding=params.grid_encoding)
+
+
+def clustering_stage(
+	points: PointSet, params: AnalyzeParams, dataset_key: str | None = None, store_dir: str | None = None
+) -> Dict[str, Any]:
+	"""
+	Clustering for `params`, plus one result per cluster_levels_km entry. DBSCAN
+	in km runs on the dataset's radius graph and OPTICS/HDBSCAN extract from its
+	fitted hierarchy; without a `dataset_key` both are built for this call only.
+	"""
+	eps_km = params.dbscan_eps_km
+	eps_deg = params.dbscan_eps
+	min_samples = params.dbscan_min_samples
+	levels = list(params.cluster_levels_km or []) if eps_km is not None else []
+
+	if params.algorithm == "dbscan":
+		radius_graph = None
+		if eps_km is not None and dataset_key is not None:
+			radius_graph = neighbor_cache.radius_graph(dataset_key, points, max([eps_km, *levels]), store_dir=store_dir)
+
+		def cluster_at(eps: float | None) -> Dict[str, Any]:
+			graph = radius_graph.within(eps) if radius_graph is not None else None
+			return dbscan_clustering(points, eps_km=eps, min_samples=min_samples, eps_degrees=eps_deg, neighbor_graph=graph)
+	else:
+		if eps_km is not None:
+			max_eps_km = max([settings.cluster_hierarchy_max_eps_km, eps_km, *levels])
+			max_eps_deg = None
+		else:
+			max_eps_km = None
+			# Fit once up to the ceiling, so any dbscan_eps below it reuses the same hierarchy.
+			max_eps_deg = max(settings.cluster_hierarchy_max_eps_degrees, eps_deg if eps_deg is not None else 0.01)
+		hierarchy: ClusterHierarchy
+		if dataset_key is not None:
+			hierarchy = hierarchy_cache.get(
+				dataset_key, points, params.algorithm, min_samples, max_eps_km, max_eps_deg, store_dir=store_dir
+			)
+		else:
+			hierarchy = fit_cluster_hierarchy(points, params.algorithm, min_samples, max_eps_km, max_eps_deg)
+
+		def cluster_at(eps: float | None) -> Dict[str, Any]:
+			return hierarchy_clustering(points, hierarchy, eps_km=eps, eps_degrees=eps_deg)
+
+	clusters = cluster_at(eps_km)
+	if params.algorithm != "dbscan":
+		clusters["algorithm"] = params.algorithm
+	if levels:
+		clusters["levels"] = [{"eps_km": level, **cluster_at(level)} for level in levels]
+	return clusters
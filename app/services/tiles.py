@@ -0,0 +1,400 @@
+"""
+Mapbox Vector Tiles (MVT v2) for dataset points.
+
+Points are indexed once per dataset by the Morton (Z-order) code of their
+Web Mercator tile at INDEX_ZOOM. Every tile at zoom <= INDEX_ZOOM is then a
+contiguous run of that sorted index, found with two binary searches; deeper
+tiles filter the run of their INDEX_ZOOM ancestor. The index, together with
+the coordinates in curve order and a per-block bbox index, is stored inside
+the point store (LAYOUT_DIR) and memory-mapped, so range reads touch
+contiguous runs; encoded tiles are kept in a byte-bounded LRU.
+
+The protobuf encoding is done by hand with vectorized varints, so a tile is
+built without a per-point Python loop or an extra dependency.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Callable, List, Sequence, Tuple
+import hashlib
+import math
+import os
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.lru import LRUCache
+from app.services.persisted import load_or_build
+from app.services.points import PointSet
+
+
+INDEX_ZOOM = 16
+MAX_ZOOM = 24
+TILE_EXTENT = 4096
+LAYER_NAME = "points"
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+MAX_MERCATOR_LAT = 85.0511287798066
+
+# Points per block of the layout's block index.
+BLOCK_SIZE = 4096
+# Store subdirectory holding the index as memory-mappable arrays.
+LAYOUT_DIR = "zorder"
+_LAYOUT_ARRAYS = ("order", "codes", "lat", "lon", "block_bounds", "block_starts")
+
+
+def _part1by1(v: np.ndarray) -> np.ndarray:
+	v = v.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+	v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+	v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+	v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+	v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+	v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+	return v
+
+
+def morton_codes(tx: np.ndarray, ty: np.ndarray) -> np.ndarray:
+	return _part1by1(tx) | (_part1by1(ty) << np.uint64(1))
+
+
+def mercator_xy(lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+	"""Web Mercator coordinates normalized to [0, 1) with y growing southwards."""
+	lat = np.clip(np.asarray(lat, dtype=np.float64), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT)
+	x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0
+	s = np.sin(np.radians(lat))
+	y = 0.5 - np.log((1.0 + s) / (1.0 - s)) / (4.0 * math.pi)
+	return x, y
+
+
+@dataclass
+class TileIndex:
+	"""
+	A dataset's points in INDEX_ZOOM Morton order: the row permutation, the
+	sorted codes, the coordinates in that order, and a block index holding the
+	lat/lon bounds (min_lat, max_lat, min_lon, max_lon) of every BLOCK_SIZE
+	consecutive points and the position each block starts at.
+	"""
+
+	order: np.ndarray
+	codes: np.ndarray
+	lat: np.ndarray
+	lon: np.ndarray
+	block_bounds: np.ndarray
+	block_starts: np.ndarray
+
+
+def block_index(lat: np.ndarray, lon: np.ndarray, block_size: int = BLOCK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+	"""(bounds, starts) of consecutive `block_size` runs of curve-ordered coordinates."""
+	starts = np.arange(0, len(lat), block_size, dtype=np.int64)
+	if not len(starts):
+		return np.empty((0, 4), dtype=np.float64), starts
+	bounds = np.column_stack([
+		np.minimum.reduceat(lat, starts),
+		np.maximum.reduceat(lat, starts),
+		np.minimum.reduceat(lon, starts),
+		np.maximum.reduceat(lon, starts),
+	]).astype(np.float64, copy=False)
+	return bounds, starts
+
+
+def build_tile_index(points: PointSet) -> TileIndex:
+	x, y = mercator_xy(points.lat, points.lon)
+	scale = 1 << INDEX_ZOOM
+	tx = np.clip((x * scale).astype(np.int64), 0, scale - 1)
+	ty = np.clip((y * scale).astype(np.int64), 0, scale - 1)
+	codes = morton_codes(tx, ty)
+	order = np.argsort(codes, kind="stable").astype(np.int64, copy=False)
+	lat = np.asarray(points.lat, dtype=np.float64)[order]
+	lon = np.asarray(points.lon, dtype=np.float64)[order]
+	bounds, starts = block_index(lat, lon)
+	return TileIndex(order=order, codes=codes[order], lat=lat, lon=lon, block_bounds=bounds, block_starts=starts)
+
+
+def _varint_len(v: np.ndarray) -> np.ndarray:
+	n = np.ones(v.shape, dtype=np.int64)
+	rest = v >> np.uint64(7)
+	while rest.any():
+		n += rest > 0
+		rest >>= np.uint64(7)
+	return n
+
+
+def _put_varints(buf: np.ndarray, pos: np.ndarray, v: np.ndarray) -> None:
+	v = v.copy()
+	pos = pos.copy()
+	while v.size:
+		more = v >= np.uint64(0x80)
+		buf[pos] = ((v & np.uint64(0x7F)) | (more.astype(np.uint64) << np.uint64(7))).astype(np.uint8)
+		v = v[more] >> np.uint64(7)
+		pos = pos[more] + 1
+
+
+def _zigzag(v: np.ndarray) -> np.ndarray:
+	v = v.astype(np.int64)
+	return ((v << 1) ^ (v >> 63)).astype(np.uint64)
+
+
+def _row_lengths(cells: np.ndarray, present: np.ndarray) -> np.ndarray:
+	return np.where(present, _varint_len(cells), 0).sum(axis=1)
+
+
+def _encode_rows(cells: np.ndarray, present: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Varint-encode an (n, k) matrix row by row, skipping cells where `present`
+	is False. Returns (bytes, row lengths).
+	"""
+	lengths = np.where(present, _varint_len(cells), 0)
+	flat_len = lengths.ravel()
+	starts = np.cumsum(flat_len) - flat_len
+	buf = np.empty(int(flat_len.sum()), dtype=np.uint8)
+	keep = present.ravel()
+	_put_varints(buf, starts[keep], cells.ravel()[keep])
+	return buf, lengths.sum(axis=1)
+
+
+def _bytes_field(field: int, payload: bytes) -> bytes:
+	return _scalar_varint((field << 3) | 2) + _scalar_varint(len(payload)) + payload
+
+
+def _scalar_varint(value: int) -> bytes:
+	out = bytearray()
+	while True:
+		byte = value & 0x7F
+		value >>= 7
+		if value:
+			out.append(byte | 0x80)
+		else:
+			out.append(byte)
+			return bytes(out)
+
+
+def _encode_value(value: Any) -> bytes:
+	# MVT Value: string=1, double=3, sint=6, bool=7
+	if isinstance(value, bool):
+		return _scalar_varint((7 << 3) | 0) + _scalar_varint(int(value))
+	if isinstance(value, int) and -(1 << 63) <= value < (1 << 63):
+		return _scalar_varint((6 << 3) | 0) + _scalar_varint((value << 1) ^ (value >> 63))
+	if isinstance(value, float):
+		return _scalar_varint((3 << 3) | 1) + struct.pack("<d", value)
+	return _bytes_field(1, str(value).encode("utf-8"))
+
+
+def encode_tile(
+	points: PointSet,
+	rows: np.ndarray,
+	lat: np.ndarray,
+	lon: np.ndarray,
+	z: int,
+	x: int,
+	y: int,
+	fields: Sequence[str] = (),
+) -> bytes:
+	"""
+	Encode `rows` of `points`, located at `lat`/`lon`, as one MVT layer of
+	POINT features for tile z/x/y. Feature ids are the original row indices;
+	`fields` become feature properties.
+	"""
+	n = len(rows)
+	if n == 0:
+		return b""
+	mx, my = mercator_xy(lat, lon)
+	scale = float(1 << z)
+	px = np.floor((mx * scale - x) * TILE_EXTENT).astype(np.int64)
+	py = np.floor((my * scale - y) * TILE_EXTENT).astype(np.int64)
+
+	# Properties: keys are the field names, values the dictionary entries used in this tile.
+	keys: List[str] = []
+	values: List[Any] = []
+	tag_cols: List[np.ndarray] = []
+	tag_present: List[np.ndarray] = []
+	for name in fields:
+		column = points.columns.get(name)
+		if column is None:
+			continue
+		codes = np.asarray(column.codes[rows], dtype=np.int64)
+		used = np.unique(codes[codes >= 0])
+		used_values = [column.values[int(c)] for c in used]
+		# Null dictionary entries get no tag pair at all, like missing codes.
+		not_null = np.array([v is not None for v in used_values], dtype=bool)
+		used = used[not_null]
+		remap = np.full(len(column.values) + 1, -1, dtype=np.int64)
+		remap[used] = np.arange(len(values), len(values) + len(used))
+		values.extend(v for v in used_values if v is not None)
+		tagged = remap[codes]
+		tag_cols.append(np.full(n, len(keys), dtype=np.int64))
+		tag_cols.append(np.maximum(tagged, 0))
+		keys.append(name)
+		tag_present.extend([tagged >= 0, tagged >= 0])
+
+	ones = np.ones(n, dtype=bool)
+	geom = np.column_stack([
+		np.full(n, 9, dtype=np.uint64),  # MoveTo, count 1
+		_zigzag(px),
+		_zigzag(py),
+	])
+	geom_bytes, geom_len = _encode_rows(geom, np.ones(geom.shape, dtype=bool))
+	if tag_cols:
+		tags = np.column_stack(tag_cols).astype(np.uint64)
+		tags_present = np.column_stack(tag_present)
+		tags_len = _row_lengths(tags, tags_present)
+	else:
+		tags = np.empty((n, 0), dtype=np.uint64)
+		tags_present = np.empty((n, 0), dtype=bool)
+		tags_len = np.zeros(n, dtype=np.int64)
+
+	has_tags = tags_len > 0
+	# Feature: id=1, tags=2 (packed), type=3 (POINT), geometry=4 (packed)
+	body = np.column_stack([
+		np.full(n, 0x08, dtype=np.uint64), rows.astype(np.uint64),
+		np.full(n, 0x12, dtype=np.uint64), tags_len.astype(np.uint64),
+		tags,
+		np.full(n, 0x18, dtype=np.uint64), np.ones(n, dtype=np.uint64),
+		np.full(n, 0x22, dtype=np.uint64), geom_len.astype(np.uint64),
+	])
+	body_present = np.column_stack([ones, ones, has_tags, has_tags, tags_present, ones, ones, ones, ones])
+	body_len = _row_lengths(body, body_present)
+	feature_len = body_len + geom_len
+
+	# Layer.features=2: tag, length, feature body, then the geometry bytes appended per row
+	cells = np.column_stack([np.full(n, 0x12, dtype=np.uint64), feature_len.astype(np.uint64), body])
+	present = np.column_stack([ones, ones, body_present])
+	head_bytes, head_len = _encode_rows(cells, present)
+	out = np.empty(int(head_len.sum() + geom_len.sum()), dtype=np.uint8)
+	row_start = np.cumsum(head_len + geom_len) - (head_len + geom_len)
+	head_start = np.cumsum(head_len) - head_len
+	geom_start = np.cumsum(geom_len) - geom_len
+	_scatter_rows(out, row_start, head_bytes, head_start, head_len)
+	_scatter_rows(out, row_start + head_len, geom_bytes, geom_start, geom_len)
+
+	layer = bytearray()
+	layer += _scalar_varint((15 << 3) | 0) + _scalar_varint(2)
+	layer += _bytes_field(1, LAYER_NAME.encode("utf-8"))
+	layer += out.tobytes()
+	for key in keys:
+		layer += _bytes_field(3, key.encode("utf-8"))
+	for value in values:
+		layer += _bytes_field(4, _encode_value(value))
+	layer += _scalar_varint((5 << 3) | 0) + _scalar_varint(TILE_EXTENT)
+	return _bytes_field(3, bytes(layer))
+
+
+def _scatter_rows(out: np.ndarray, out_start: np.ndarray, src: np.ndarray, src_start: np.ndarray, lengths: np.ndarray) -> None:
+	total = int(lengths.sum())
+	if total == 0:
+		return
+	row = np.repeat(np.arange(len(lengths)), lengths)
+	offset = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+	out[out_start[row] + offset] = src[src_start[row] + offset]
+
+
+def tile_span(index: TileIndex, z: int, x: int, y: int, max_points: int) -> Tuple[slice, np.ndarray | None]:
+	"""
+	The run of the curve order covering tile z/x/y, and the offsets within it
+	to keep (None = all): points outside a tile deeper than INDEX_ZOOM are
+	dropped, and an even stride thins tiles above max_points.
+	"""
+	if z <= INDEX_ZOOM:
+		shift = INDEX_ZOOM - z
+		lo = int(morton_codes(np.array([x]), np.array([y]))[0]) << (2 * shift)
+		hi = lo + (1 << (2 * shift))
+		start, stop = np.searchsorted(index.codes, [lo, hi])
+		pick = None
+	else:
+		shift = z - INDEX_ZOOM
+		parent = int(morton_codes(np.array([x >> shift]), np.array([y >> shift]))[0])
+		start, stop = np.searchsorted(index.codes, [parent, parent + 1])
+		# The index keeps coordinates in the same order, so this reads one contiguous run.
+		mx, my = mercator_xy(index.lat[start:stop], index.lon[start:stop])
+		scale = float(1 << z)
+		pick = np.flatnonzero((np.floor(mx * scale) == x) & (np.floor(my * scale) == y))
+	count = int(stop - start) if pick is None else len(pick)
+	if max_points > 0 and count > max_points:
+		# The Morton order is spatially coherent, so an even stride thins the tile evenly.
+		stride = np.linspace(0, count - 1, max_points).astype(np.int64)
+		pick = stride if pick is None else pick[stride]
+	return slice(int(start), int(stop)), pick
+
+
+def write_spatial_layout(store_dir: str, index: TileIndex) -> None:
+	"""Persist `index` as the store's curve-ordered layout (LAYOUT_DIR), replacing any previous one."""
+	tmp_dir = tempfile.mkdtemp(prefix=".layout-", dir=store_dir)
+	try:
+		for name in _LAYOUT_ARRAYS:
+			np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(getattr(index, name)))
+		target = os.path.join(store_dir, LAYOUT_DIR)
+		if os.path.isdir(target):
+			shutil.rmtree(target)
+		os.replace(tmp_dir, target)
+	except Exception:
+		shutil.rmtree(tmp_dir, ignore_errors=True)
+		raise
+
+
+def load_spatial_layout(store_dir: str) -> TileIndex | None:
+	"""Memory-map the store's curve-ordered layout, or None if it has none."""
+	layout_dir = os.path.join(store_dir, LAYOUT_DIR)
+	if not os.path.isdir(layout_dir):
+		return None
+	arrays = {name: np.load(os.path.join(layout_dir, f"{name}.npy"), mmap_mode="r") for name in _LAYOUT_ARRAYS}
+	return TileIndex(**arrays)
+
+
+def tile_etag(content_hash: str, z: int, x: int, y: int, fields: Sequence[str]) -> str:
+	raw = f"{content_hash}:{z}/{x}/{y}:{','.join(fields)}:{settings.tile_max_points}"
+	return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+class TileCache:
+	"""Per-dataset tile indexes plus a byte-bounded LRU of encoded tiles keyed by zoom/x/y."""
+
+	def __init__(self, max_bytes: int, max_indexes: int) -> None:
+		self._tiles: LRUCache[Tuple[str, Tuple[str, ...], int, int, int], bytes] = LRUCache(max_bytes=max_bytes)
+		self._indexes: LRUCache[str, TileIndex] = LRUCache(max_entries=max(max_indexes, 1))
+
+	def index_for(self, dataset_key: str, points: PointSet, store_dir: str | None = None) -> TileIndex:
+		return self._indexes.get_or_build(dataset_key, lambda: self._load_or_build(points, store_dir))
+
+	def _load_or_build(self, points: PointSet, store_dir: str | None) -> TileIndex:
+		def load(_: str) -> TileIndex:
+			index = load_spatial_layout(store_dir)
+			if index is None or len(index.order) != len(points):
+				raise ValueError("Spatial layout does not match the point store")
+			return index
+
+		# Stores written before the layout existed get it on first use.
+		return load_or_build(
+			os.path.join(store_dir, LAYOUT_DIR) if store_dir else None,
+			load=load,
+			build=lambda: build_tile_index(points),
+			save=lambda _, index: write_spatial_layout(store_dir, index),
+			what="spatial layout",
+		)
+
+	def get_tile(
+		self,
+		dataset_key: str,
+		load_points: Callable[[], PointSet],
+		z: int,
+		x: int,
+		y: int,
+		fields: Sequence[str] = (),
+		store_dir: str | None = None,
+	) -> bytes:
+		"""The encoded tile; `load_points` is only called when it is not cached."""
+		key = (dataset_key, tuple(fields), z, x, y)
+		tile = self._tiles.get(key)
+		if tile is None:
+			points = load_points()
+			index = self.index_for(dataset_key, points, store_dir)
+			span, pick = tile_span(index, z, x, y, settings.tile_max_points)
+			# Coordinates come from the curve-ordered copy; only attributes are gathered by row id.
+			rows, lat, lon = index.order[span], index.lat[span], index.lon[span]
+			if pick is not None:
+				rows, lat, lon = rows[pick], lat[pick], lon[pick]
+			tile = encode_tile(points, np.asarray(rows, dtype=np.int64), lat, lon, z, x, y, fields)
+			self._tiles.put(key, tile)
+		return tile
+
+tile_cache = TileCache(max_bytes=settings.tile_cache_max_bytes, max_indexes=settings.tile_index_cache_entries)
+
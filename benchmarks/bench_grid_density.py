@@ -0,0 +1,92 @@
+"""
+Benchmark the NumPy grid_density against the original per-point Python loop.
+
+Usage (from the repository root):
+	python -m benchmarks.bench_grid_density [n_points ...]
+
+Defaults to 1M and 10M points. Each run also checks that both
+implementations return the identical cell list.
+"""
+from __future__ import annotations
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+import math
+import sys
+import time
+
+import numpy as np
+
+from app.services.analysis import grid_density
+from app.services.points import PointSet
+
+
+GRID_CELL_SIZE = 0.01
+
+
+def legacy_grid_density(points: List[Dict[str, Any]], grid_cell_size: float) -> Dict[str, Any]:
+	# Verbatim copy of the pre-NumPy implementation, kept as the reference.
+	min_lat = min(p["lat"] for p in points)
+	max_lat = max(p["lat"] for p in points)
+	min_lon = min(p["lon"] for p in points)
+	max_lon = max(p["lon"] for p in points)
+
+	def cell_index(lat: float, lon: float) -> Tuple[int, int]:
+		i = int(math.floor((lat - min_lat) / grid_cell_size))
+		j = int(math.floor((lon - min_lon) / grid_cell_size))
+		return i, j
+
+	counts: Dict[Tuple[int, int], int] = defaultdict(int)
+	for p in points:
+		counts[cell_index(p["lat"], p["lon"])] += 1
+
+	cells = []
+	for (i, j), count in counts.items():
+		cell_min_lat = min_lat + i * grid_cell_size
+		cell_min_lon = min_lon + j * grid_cell_size
+		cells.append(
+			{
+				"min_lat": cell_min_lat,
+				"max_lat": cell_min_lat + grid_cell_size,
+				"min_lon": cell_min_lon,
+				"max_lon": cell_min_lon + grid_cell_size,
+				"count": count,
+			}
+		)
+	return {
+		"grid_cell_size": grid_cell_size,
+		"bbox": {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon},
+		"cells": cells,
+	}
+
+
+def make_points(n: int, seed: int = 0) -> PointSet:
+	# City-scale spread: a few dense centres over a ~1 degree extent.
+	rng = np.random.default_rng(seed)
+	centres = rng.uniform([29.0, -83.0], [30.0, -82.0], size=(8, 2))
+	which = rng.integers(0, len(centres), n)
+	lat = centres[which, 0] + rng.normal(0.0, 0.05, n)
+	lon = centres[which, 1] + rng.normal(0.0, 0.05, n)
+	return PointSet(lat=lat, lon=lon)
+
+
+def timed(fn, *args) -> Tuple[float, Any]:
+	start = time.perf_counter()
+	result = fn(*args)
+	return time.perf_counter() - start, result
+
+
+def main(sizes: List[int]) -> None:
+	print(f"{'points':>12} {'legacy (s)':>12} {'numpy (s)':>12} {'speedup':>9} {'cells':>9}")
+	for n in sizes:
+		points = make_points(n)
+		records = [{"lat": lat, "lon": lon, "attributes": {}} for lat, lon in zip(points.lat.tolist(), points.lon.tolist())]
+		legacy_s, expected = timed(legacy_grid_density, records, GRID_CELL_SIZE)
+		del records
+		numpy_s, actual = timed(grid_density, points, GRID_CELL_SIZE)
+		if actual != expected:
+			raise SystemExit(f"grid_density output differs from the legacy implementation at n={n}")
+		print(f"{n:>12,} {legacy_s:>12.3f} {numpy_s:>12.3f} {legacy_s / numpy_s:>8.1f}x {len(actual['cells']):>9,}")
+
+
+if __name__ == "__main__":
+	main([int(arg) for arg in sys.argv[1:]] or [1_000_000, 10_000_000])
@@ -0,0 +1,42 @@
+"""Shared fixtures: a throwaway SQLite database per test."""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.db.database import Base
+from app.db.models import Dataset, User
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+	engine = create_engine(
+		f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False}, poolclass=NullPool
+	)
+	Base.metadata.create_all(bind=engine)
+	yield sessionmaker(autocommit=False, autoflush=False, bind=engine, expire_on_commit=False)
+	engine.dispose()
+
+
+@pytest.fixture
+def dataset(session_factory) -> Dataset:
+	db = session_factory()
+	try:
+		user = User(email="owner@example.com", password_hash="x")
+		db.add(user)
+		db.flush()
+		row = Dataset(
+			user_id=user.id,
+			filename="points.csv",
+			file_type="csv",
+			storage_path="points.csv",
+			n_points=0,
+			bbox_json="{}",
+		)
+		db.add(row)
+		db.commit()
+		return row
+	finally:
+		db.close()
@@ -0,0 +1,73 @@
+"""The density pyramid must reproduce grid_density at its exact levels."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.analysis import grid_density
+from app.services.density import DensityPyramidCache, build_density_pyramid, exact_pyramid_level
+from app.services.points import PointSet
+
+
+BASE_CELL = 0.000625
+
+
+def _points(n: int = 20000, seed: int = 0) -> PointSet:
+	rng = np.random.default_rng(seed)
+	# Dense blobs over a uniform background, so levels have both crowded and sparse cells.
+	centers = rng.uniform([29.5, -82.5], [29.8, -82.2], size=(5, 2))
+	blobs = centers[rng.integers(0, 5, n // 2)] + rng.normal(0, 0.004, (n // 2, 2))
+	background = rng.uniform([29.4, -82.6], [29.9, -82.1], size=(n - n // 2, 2))
+	coords = np.concatenate([blobs, background])
+	return PointSet(lat=coords[:, 0].copy(), lon=coords[:, 1].copy())
+
+
+@pytest.mark.parametrize("level", [0, 1, 2, 4, 7])
+@pytest.mark.parametrize("encoding", ["cells", "sparse", "dense"])
+def test_exact_levels_match_grid_density(level: int, encoding: str) -> None:
+	points = _points()
+	pyramid = build_density_pyramid(points, BASE_CELL)
+	cell_size = BASE_CELL * 2 ** level
+
+	result, exact = pyramid.grid_density(cell_size, encoding=encoding)
+
+	assert exact
+	assert result == grid_density(points, grid_cell_size=cell_size, encoding=encoding)
+
+
+def test_default_cell_size_is_an_exact_level() -> None:
+	assert exact_pyramid_level(0.01, BASE_CELL) == 4
+	assert exact_pyramid_level(0.0123, BASE_CELL) is None
+
+
+def test_other_sizes_are_flagged_and_keep_the_total() -> None:
+	points = _points()
+	pyramid = build_density_pyramid(points, BASE_CELL)
+
+	result, exact = pyramid.grid_density(0.0123, encoding="sparse")
+
+	assert not exact
+	assert sum(result["counts"]) == len(points)
+
+
+def test_sizes_below_the_base_cell_are_refused() -> None:
+	pyramid = build_density_pyramid(_points(1000), BASE_CELL)
+
+	with pytest.raises(ValueError):
+		pyramid.grid_density(BASE_CELL / 3)
+
+
+def test_persisted_pyramid_is_loaded_without_the_points(tmp_path, monkeypatch) -> None:
+	monkeypatch.setattr("app.services.density.settings.density_pyramid_base_cell", BASE_CELL)
+	points = _points(1000)
+	loads = []
+
+	def load_points() -> PointSet:
+		loads.append(1)
+		return points
+
+	built = DensityPyramidCache(max_entries=2).get("key", load_points, store_dir=str(tmp_path))
+	cached = DensityPyramidCache(max_entries=2).get("key", load_points, store_dir=str(tmp_path))
+
+	assert len(loads) == 1
+	assert cached.grid_density(0.01)[0] == built.grid_density(0.01)[0]
@@ -0,0 +1,52 @@
+"""hexbin_density against a brute-force nearest-center assignment."""
+from __future__ import annotations
+
+import math
+from collections import Counter
+
+import numpy as np
+
+from app.services.analysis import hexbin_density
+from app.services.points import PointSet
+
+
+def _points(n: int = 4000, seed: int = 0) -> PointSet:
+	rng = np.random.default_rng(seed)
+	# The first point is the bbox minimum, so it sits on the center of hexagon (0, 0)
+	# rather than on an edge where both assignments would be right.
+	lat = np.concatenate([[29.6], rng.uniform(29.6, 29.7, n - 1)])
+	lon = np.concatenate([[-82.4], rng.uniform(-82.4, -82.3, n - 1)])
+	return PointSet(lat=lat, lon=lon)
+
+
+def _brute_force_counts(points: PointSet, result) -> Counter:
+	"""Assign each point to the hexagon whose center is closest in the scaled plane."""
+	hex_size = result["hex_size"]
+	lon_scale = result["lon_scale"]
+	x = (points.lon - result["origin"]["lon"]) * lon_scale
+	y = points.lat - result["origin"]["lat"]
+	r_range = np.arange(math.floor(y.min() / (1.5 * hex_size)) - 1, math.ceil(y.max() / (1.5 * hex_size)) + 2)
+	q_span = math.ceil(x.max() / (math.sqrt(3) * hex_size)) + 2
+	q_range = np.arange(-q_span - len(r_range), q_span + 1)
+	q, r = (grid.ravel() for grid in np.meshgrid(q_range, r_range))
+	cx = hex_size * math.sqrt(3) * (q + r / 2.0)
+	cy = hex_size * 1.5 * r
+	nearest = np.argmin((x[:, None] - cx[None, :]) ** 2 + (y[:, None] - cy[None, :]) ** 2, axis=1)
+	return Counter(zip(q[nearest].tolist(), r[nearest].tolist()))
+
+
+def test_counts_match_nearest_center_assignment() -> None:
+	points = _points()
+
+	result = hexbin_density(points, hex_size=0.004)
+
+	cells = Counter(dict(zip(zip(result["q"], result["r"]), result["counts"])))
+	assert cells == _brute_force_counts(points, result)
+	assert sum(result["counts"]) == len(points)
+
+
+def test_cells_come_sorted_by_row_then_column() -> None:
+	result = hexbin_density(_points(), hex_size=0.004)
+
+	keys = list(zip(result["r"], result["q"]))
+	assert keys == sorted(keys)
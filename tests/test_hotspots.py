@@ -0,0 +1,75 @@
+"""getis_ord_hotspots against a dense brute-force Gi* computation."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.analysis import getis_ord_hotspots
+from app.services.points import PointSet
+
+
+CELL_SIZE = 0.005
+
+
+def _points(n: int = 900, seed: int = 0) -> PointSet:
+	rng = np.random.default_rng(seed)
+	# A hot blob and a sparse background over about 40 x 40 cells, leaving many empty cells.
+	blob = rng.normal([29.65, -82.35], 0.004, size=(n // 2, 2))
+	background = rng.uniform([29.55, -82.45], [29.75, -82.25], size=(n - n // 2, 2))
+	coords = np.concatenate([blob, background])
+	return PointSet(lat=coords[:, 0].copy(), lon=coords[:, 1].copy())
+
+
+def _brute_force_z(points: PointSet) -> np.ndarray:
+	i = np.floor((points.lat - points.lat.min()) / CELL_SIZE).astype(np.int64)
+	j = np.floor((points.lon - points.lon.min()) / CELL_SIZE).astype(np.int64)
+	x = np.zeros((i.max() + 1, j.max() + 1))
+	np.add.at(x, (i, j), 1.0)
+	n = x.size
+	mean = x.sum() / n
+	std = np.sqrt((x * x).sum() / n - mean * mean)
+	z = np.empty_like(x)
+	for a in range(x.shape[0]):
+		for b in range(x.shape[1]):
+			window = x[max(a - 1, 0):a + 2, max(b - 1, 0):b + 2]
+			w = window.size
+			z[a, b] = (window.sum() - mean * w) / (std * np.sqrt((n * w - w * w) / (n - 1)))
+	return z
+
+
+def test_z_scores_match_brute_force() -> None:
+	points = _points()
+	expected = _brute_force_z(points)
+
+	result = getis_ord_hotspots(points, CELL_SIZE)
+
+	assert (result["n_rows"], result["n_cols"]) == expected.shape
+	assert result["z"] == pytest.approx(expected[result["i"], result["j"]].tolist(), abs=1e-4)
+	significant = np.zeros(expected.shape, dtype=bool)
+	significant[result["i"], result["j"]] = True
+	# Every cell left out is below the 90% threshold.
+	assert np.all(np.abs(expected[~significant]) < 1.645)
+	assert 3 in result["class"]
+
+
+def test_background_z_is_the_empty_interior_cell_score() -> None:
+	points = _points()
+	expected = _brute_force_z(points)
+
+	result = getis_ord_hotspots(points, CELL_SIZE)
+
+	occupied = np.zeros(expected.shape, dtype=bool)
+	occupied[
+		np.floor((points.lat - points.lat.min()) / CELL_SIZE).astype(np.int64),
+		np.floor((points.lon - points.lon.min()) / CELL_SIZE).astype(np.int64),
+	] = True
+	# Interior cells with no occupied cell in their 3 x 3 window.
+	near = np.zeros((expected.shape[0] + 2, expected.shape[1] + 2), dtype=bool)
+	for di in range(3):
+		for dj in range(3):
+			near[di:di + expected.shape[0], dj:dj + expected.shape[1]] |= occupied
+	empty_window = ~near[1:-1, 1:-1]
+	empty_window[[0, -1], :] = False
+	empty_window[:, [0, -1]] = False
+	assert empty_window.any()
+	assert expected[empty_window] == pytest.approx(result["background_z"])
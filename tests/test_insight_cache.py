@@ -0,0 +1,64 @@
+"""Cached insights are served without calling Gemini or counting against the weekly limit."""
+from __future__ import annotations
+
+import pytest
+from fastapi import HTTPException
+
+from app.db.models import AIUsage, User
+from app.routers import ai
+from app.schemas.ai import InsightRequest
+from app.services.insight_cache import InsightCache
+
+
+@pytest.fixture
+def insight_env(session_factory, dataset, monkeypatch):
+	calls = []
+
+	def fake_generate(prompt: str):
+		calls.append(prompt)
+		return {"text": "Two dense clusters.", "highlights": [], "method": "test"}
+
+	monkeypatch.setattr(ai, "generate_insight_from_prompt", fake_generate)
+	monkeypatch.setattr(ai, "insight_cache", InsightCache(max_entries=8, ttl_seconds=3600, persist=True))
+	db = session_factory()
+	user = db.get(User, dataset.user_id)
+	yield db, user, calls
+	db.close()
+
+
+def _request(total_points: int) -> InsightRequest:
+	return InsightRequest(analysis_result={"summary": {"total_points": total_points}})
+
+
+def test_repeat_request_is_cached_and_not_counted(insight_env) -> None:
+	db, user, calls = insight_env
+
+	first = ai.generate_ai_insight(_request(3), db=db, current_user=user)
+	second = ai.generate_ai_insight(_request(3), db=db, current_user=user)
+
+	assert (first.meta["cached"], second.meta["cached"]) == (False, True)
+	assert second.text == first.text
+	assert len(calls) == 1
+	assert db.query(AIUsage).filter(AIUsage.user_id == user.id).count() == 1
+
+
+def test_new_prompt_still_hits_the_weekly_limit(insight_env) -> None:
+	db, user, calls = insight_env
+	ai.generate_ai_insight(_request(3), db=db, current_user=user)
+
+	with pytest.raises(HTTPException) as exc_info:
+		ai.generate_ai_insight(_request(4), db=db, current_user=user)
+
+	assert exc_info.value.status_code == 429
+	assert len(calls) == 1
+
+
+def test_persisted_entry_survives_a_cleared_memory_tier(insight_env) -> None:
+	db, user, calls = insight_env
+	ai.generate_ai_insight(_request(3), db=db, current_user=user)
+	ai.insight_cache.clear()
+
+	again = ai.generate_ai_insight(_request(3), db=db, current_user=user)
+
+	assert again.meta["cached"]
+	assert len(calls) == 1
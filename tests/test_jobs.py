@@ -0,0 +1,128 @@
+"""Analysis job status transitions, cancellation and stale-worker handling."""
+from __future__ import annotations
+
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.models import AnalysisJob, AnalysisRun
+from app.services import jobs
+
+
+@pytest.fixture
+def job_db(session_factory, monkeypatch):
+	monkeypatch.setattr(jobs, "SessionLocal", session_factory)
+	return session_factory
+
+
+def _add_job(session_factory, dataset, **fields) -> int:
+	db = session_factory()
+	try:
+		job = AnalysisJob(
+			dataset_id=dataset.id,
+			user_id=dataset.user_id,
+			params_json="{}",
+			status=fields.pop("status", "queued"),
+			progress=0.0,
+			**fields,
+		)
+		db.add(job)
+		db.commit()
+		return job.id
+	finally:
+		db.close()
+
+
+def _get_job(session_factory, job_id: int) -> AnalysisJob:
+	db = session_factory()
+	try:
+		return db.get(AnalysisJob, job_id)
+	finally:
+		db.close()
+
+
+def test_job_runs_to_success_and_records_the_run(job_db, dataset, monkeypatch) -> None:
+	stages = []
+
+	def fake_analyze(dataset, params, on_progress=None):
+		on_progress("clustering", 0.5)
+		stages.append(_get_job(job_db, job_id).status)
+		return '{"ok": true}', False
+
+	monkeypatch.setattr(jobs, "analyze_dataset_cached", fake_analyze)
+	job_id = _add_job(job_db, dataset)
+
+	jobs._run_job(job_id)
+
+	job = _get_job(job_db, job_id)
+	assert stages == ["running"]
+	assert job.status == "succeeded"
+	assert job.progress == 1.0
+	assert job.started_at is not None and job.finished_at is not None
+	db = job_db()
+	try:
+		assert db.get(AnalysisRun, job.analysis_run_id).result_json == '{"ok": true}'
+	finally:
+		db.close()
+
+
+def test_failing_job_records_the_error(job_db, dataset, monkeypatch) -> None:
+	def fake_analyze(dataset, params, on_progress=None):
+		raise ValueError("bad column")
+
+	monkeypatch.setattr(jobs, "analyze_dataset_cached", fake_analyze)
+	job_id = _add_job(job_db, dataset)
+
+	jobs._run_job(job_id)
+
+	job = _get_job(job_db, job_id)
+	assert job.status == "failed"
+	assert job.error == "bad column"
+
+
+def test_job_failed_while_running_does_not_succeed(job_db, dataset, monkeypatch) -> None:
+	def fake_analyze(dataset, params, on_progress=None):
+		db = job_db()
+		db.query(AnalysisJob).filter(AnalysisJob.id == job_id).update({"status": "failed"})
+		db.commit()
+		db.close()
+		return "{}", False
+
+	monkeypatch.setattr(jobs, "analyze_dataset_cached", fake_analyze)
+	job_id = _add_job(job_db, dataset)
+
+	jobs._run_job(job_id)
+
+	job = _get_job(job_db, job_id)
+	assert job.status == "failed"
+	assert job.analysis_run_id is None
+
+
+def test_job_cancelled_before_it_started_is_failed(job_db, dataset) -> None:
+	job_id = _add_job(job_db, dataset)
+	future: Future = Future()
+	future.cancel()
+
+	jobs._fail_if_cancelled(job_id, future)
+
+	job = _get_job(job_db, job_id)
+	assert job.status == "failed"
+	assert job.error == "Cancelled at server shutdown"
+
+
+def test_only_jobs_with_a_stale_heartbeat_are_failed(job_db, dataset, monkeypatch) -> None:
+	monkeypatch.setattr(jobs.settings, "analysis_job_stale_seconds", 60)
+	long_ago = datetime.utcnow() - timedelta(minutes=10)
+	own = _add_job(job_db, dataset, status="running", worker_id=jobs.WORKER_ID, heartbeat_at=long_ago)
+	live = _add_job(job_db, dataset, status="running", worker_id="other:1", heartbeat_at=datetime.utcnow())
+	stale = _add_job(job_db, dataset, status="queued", worker_id="other:2", heartbeat_at=long_ago)
+	done = _add_job(job_db, dataset, status="succeeded", worker_id="other:2", heartbeat_at=long_ago)
+
+	jobs.heartbeat_and_fail_stale_jobs()
+
+	assert _get_job(job_db, own).status == "running"
+	assert _get_job(job_db, own).heartbeat_at > long_ago
+	assert _get_job(job_db, live).status == "running"
+	assert _get_job(job_db, stale).status == "failed"
+	assert _get_job(job_db, done).status == "succeeded"
@@ -0,0 +1,47 @@
+"""kde_heatmap raster sizing and mass conservation."""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+from app.services.analysis import KM_PER_DEGREE_LAT, kde_heatmap
+from app.services.points import PointSet
+
+
+def _points(n: int = 3000, seed: int = 0) -> PointSet:
+	rng = np.random.default_rng(seed)
+	return PointSet(lat=rng.normal(29.65, 0.02, n), lon=rng.normal(-82.32, 0.02, n))
+
+
+def _total_mass(result, points: PointSet) -> float:
+	lon_scale = np.cos(np.radians((points.lat.min() + points.lat.max()) / 2.0))
+	cell_km = result["cell_size"] * KM_PER_DEGREE_LAT
+	return float(np.sum(np.asarray(result["values"], dtype=np.float64)) * cell_km * cell_km * lon_scale)
+
+
+def test_density_integrates_to_the_point_count() -> None:
+	points = _points()
+
+	result = kde_heatmap(points, cell_size=0.002, bandwidth_km=0.5)
+
+	assert np.asarray(result["values"]).shape == (result["n_rows"], result["n_cols"])
+	assert abs(_total_mass(result, points) - len(points)) < 1e-3 * len(points)
+
+
+def test_raster_covers_the_last_bin_plus_padding() -> None:
+	# 1.0 // 0.1 is 9 but floor(1.0 / 0.1) is 10, which is the bin the last point lands in.
+	points = PointSet(lat=np.array([0.0, 0.5, 1.0]), lon=np.array([0.0, 0.5, 1.0]))
+
+	result = kde_heatmap(points, cell_size=0.1, bandwidth_km=0.01)
+
+	# 11 bins plus one cell of padding on each side.
+	assert (result["n_rows"], result["n_cols"]) == (13, 13)
+	assert abs(_total_mass(result, points) - 3) < 1e-3
+
+
+def test_tiny_cell_budget_still_terminates() -> None:
+	result = kde_heatmap(_points(200), cell_size=0.001, bandwidth_km=0.5, max_cells=1)
+
+	assert math.isfinite(result["cell_size"])
+	assert result["n_rows"] * result["n_cols"] <= 9
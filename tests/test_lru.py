@@ -0,0 +1,43 @@
+"""LRUCache eviction and per-key builds."""
+from __future__ import annotations
+
+import pytest
+
+from app.services.lru import LRUCache
+
+
+def test_evicts_least_recently_used_entry() -> None:
+	cache: LRUCache[str, int] = LRUCache(max_entries=2)
+	cache.put("a", 1)
+	cache.put("b", 2)
+	cache.get("a")
+	cache.put("c", 3)
+
+	assert cache.get("b") is None
+	assert cache.get("a") == 1
+	assert cache.get("c") == 3
+
+
+def test_byte_budget_skips_oversized_values() -> None:
+	cache: LRUCache[str, bytes] = LRUCache(max_bytes=4)
+	cache.put("big", b"12345")
+	cache.put("x", b"12")
+	cache.put("y", b"34")
+	cache.put("z", b"5")
+
+	assert cache.get("big") is None
+	assert cache.get("x") is None
+	assert cache.total_bytes == 3
+
+
+def test_failed_build_releases_its_lock() -> None:
+	cache: LRUCache[str, int] = LRUCache(max_entries=2)
+
+	def fail() -> int:
+		raise RuntimeError("boom")
+
+	with pytest.raises(RuntimeError):
+		cache.get_or_build("k", fail)
+
+	assert cache._build_locks == {}
+	assert cache.get_or_build("k", lambda: 7) == 7
@@ -0,0 +1,56 @@
+"""Clark-Evans nearest-neighbour statistics on known patterns."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.analysis import EARTH_RADIUS_KM, nearest_neighbor_stats
+from app.services.neighbors import NeighborIndexCache
+from app.services.points import PointSet
+
+
+SPACING_DEG = 0.001
+
+
+def _grid(k: int = 20) -> PointSet:
+	# A k x k lattice at the equator, where lat and lon degrees have the same length.
+	steps = np.arange(k) * SPACING_DEG
+	lat, lon = np.meshgrid(steps, steps, indexing="ij")
+	return PointSet(lat=lat.ravel(), lon=lon.ravel())
+
+
+def test_regular_grid_has_the_lattice_ratio() -> None:
+	k = 20
+	spacing_km = np.radians(SPACING_DEG) * EARTH_RADIUS_KM
+
+	stats = nearest_neighbor_stats(_grid(k))
+
+	assert stats["mean_distance_km"] == pytest.approx(spacing_km, rel=1e-6)
+	assert stats["median_distance_km"] == pytest.approx(spacing_km, rel=1e-6)
+	# The bbox spans (k - 1) spacings, so the expected distance is 0.5 * spacing * (k - 1) / k.
+	assert stats["clark_evans_ratio"] == pytest.approx(2 * k / (k - 1), rel=1e-4)
+	assert stats["pattern"] == "dispersed"
+
+
+def test_clustered_points_have_a_low_ratio() -> None:
+	rng = np.random.default_rng(0)
+	centers = rng.uniform([0.0, 0.0], [0.1, 0.1], size=(5, 2))
+	coords = centers[rng.integers(0, 5, 1000)] + rng.normal(0, 0.0005, (1000, 2))
+	points = PointSet(lat=coords[:, 0].copy(), lon=coords[:, 1].copy())
+
+	stats = nearest_neighbor_stats(points)
+
+	assert stats["clark_evans_ratio"] < 0.5
+	assert stats["pattern"] == "clustered"
+
+
+def test_radius_graph_gives_the_same_answer_as_the_tree() -> None:
+	rng = np.random.default_rng(1)
+	points = PointSet(lat=rng.uniform(0.0, 0.1, 2000), lon=rng.uniform(0.0, 0.1, 2000))
+	# Small enough that some points have no neighbour within it and fall back to the tree.
+	radius_graph = NeighborIndexCache(max_entries=1).radius_graph("ds", points, 0.1)
+
+	on_graph = nearest_neighbor_stats(points, neighbor_graph=radius_graph.graph)
+	on_tree = nearest_neighbor_stats(points)
+
+	assert on_graph == pytest.approx(on_tree)
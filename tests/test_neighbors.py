@@ -0,0 +1,56 @@
+"""DBSCAN on the shared radius graph must match DBSCAN on the coordinates."""
+from __future__ import annotations
+import os
+
+import numpy as np
+import pytest
+
+from app.schemas.analysis import AnalyzeParams
+from app.services.analysis import dbscan_clustering
+from app.services.neighbors import NeighborIndexCache
+from app.services.points import PointSet
+from app.services.stages import clustering_stage
+
+
+def _points(n: int = 3000, seed: int = 1) -> PointSet:
+	rng = np.random.default_rng(seed)
+	centers = rng.uniform([29.6, -82.4], [29.7, -82.3], size=(8, 2))
+	blobs = centers[rng.integers(0, 8, n - n // 4)] + rng.normal(0, 0.002, (n - n // 4, 2))
+	noise = rng.uniform([29.55, -82.45], [29.75, -82.25], size=(n // 4, 2))
+	coords = np.concatenate([blobs, noise])
+	return PointSet(lat=coords[:, 0].copy(), lon=coords[:, 1].copy())
+
+
+@pytest.mark.parametrize("eps_km", [0.1, 0.25, 0.5, 1.0])
+def test_graph_dbscan_matches_tree_dbscan(eps_km: float) -> None:
+	points = _points()
+	radius_graph = NeighborIndexCache(max_entries=1).radius_graph("ds", points, 1.0)
+	assert radius_graph is not None
+
+	on_graph = dbscan_clustering(points, eps_km=eps_km, min_samples=5, neighbor_graph=radius_graph.within(eps_km))
+	on_tree = dbscan_clustering(points, eps_km=eps_km, min_samples=5)
+
+	assert on_graph == on_tree
+
+
+def test_persisted_graph_is_reloaded(tmp_path) -> None:
+	points = _points()
+	built = NeighborIndexCache(max_entries=1).radius_graph("ds", points, 0.5, store_dir=str(tmp_path))
+	assert any(name.startswith("radius_graph_") for name in os.listdir(tmp_path))
+
+	loaded = NeighborIndexCache(max_entries=1).radius_graph("ds", points, 0.5, store_dir=str(tmp_path))
+
+	assert (loaded.graph != built.graph).nnz == 0
+	assert loaded.eps_km == built.eps_km
+
+
+def test_clustering_stage_levels_match_tree_dbscan() -> None:
+	points = _points()
+	params = AnalyzeParams(dbscan_eps_km=0.25, dbscan_min_samples=5, cluster_levels_km=[0.1, 0.5])
+
+	result = clustering_stage(points, params, dataset_key="test-clustering-levels")
+
+	assert {k: v for k, v in result.items() if k != "levels"} == dbscan_clustering(points, eps_km=0.25, min_samples=5)
+	for level in result["levels"]:
+		expected = dbscan_clustering(points, eps_km=level["eps_km"], min_samples=5)
+		assert {k: v for k, v in level.items() if k != "eps_km"} == expected
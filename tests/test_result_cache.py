@@ -0,0 +1,56 @@
+"""Analysis result cache: hit flag, disk tier and eviction."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from app.db.models import Dataset
+from app.schemas.analysis import AnalyzeParams
+from app.services import pipeline
+from app.services.result_cache import ResultCache, analysis_cache_key
+
+
+@pytest.fixture
+def csv_dataset(tmp_path) -> Dataset:
+	path = tmp_path / "points.csv"
+	rows = [f"p{i},{29.6 + (i % 7) * 0.001},{-82.3 - (i % 5) * 0.001}" for i in range(60)]
+	path.write_text("name,lat,lon\n" + "\n".join(rows) + "\n")
+	return Dataset(user_id=1, filename="points.csv", file_type="csv", storage_path=str(path), n_points=60, bbox_json="{}")
+
+
+def test_repeat_analysis_is_a_cache_hit(csv_dataset, monkeypatch) -> None:
+	monkeypatch.setattr(pipeline, "result_cache", ResultCache(max_bytes=1 << 20))
+	params = AnalyzeParams()
+
+	first, first_hit = pipeline.analyze_dataset_cached(csv_dataset, params)
+	second, second_hit = pipeline.analyze_dataset_cached(csv_dataset, params)
+	_, other_hit = pipeline.analyze_dataset_cached(csv_dataset, AnalyzeParams(grid_cell_size=0.02))
+
+	assert (first_hit, second_hit, other_hit) == (False, True, False)
+	assert second == first
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path) -> None:
+	key = analysis_cache_key("content", '{"grid_cell_size": 0.01}')
+	ResultCache(max_bytes=1 << 20, disk_dir=str(tmp_path)).put(key, '{"ok": true}')
+
+	restarted = ResultCache(max_bytes=1 << 20, disk_dir=str(tmp_path))
+
+	assert restarted.get(key) == '{"ok": true}'
+	assert restarted.get(analysis_cache_key("content", "{}")) is None
+
+
+def test_disk_tier_drops_least_recently_used_files(tmp_path) -> None:
+	cache = ResultCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=250)
+	keys = [analysis_cache_key("content", str(i)) for i in range(3)]
+	cache.put(keys[0], "a" * 100)
+	cache.put(keys[1], "b" * 100)
+	# Make the first entry the oldest by mtime, then the third put goes over the limit.
+	os.utime(cache._disk_path(keys[0]), (1, 1))
+
+	cache.put(keys[2], "c" * 100)
+
+	assert cache.get(keys[0]) is None
+	assert cache.get(keys[1]) == "b" * 100
+	assert cache.get(keys[2]) == "c" * 100
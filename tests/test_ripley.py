@@ -0,0 +1,40 @@
+"""Ripley's K on complete spatial randomness."""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pytest
+
+from app.services.analysis import ripley_k
+from app.services.points import PointSet
+
+
+def _uniform_points(n: int, seed: int = 0) -> PointSet:
+	rng = np.random.default_rng(seed)
+	# About 11 x 11 km around the equator, where a degree is close to square.
+	return PointSet(lat=rng.uniform(0.0, 0.1, n), lon=rng.uniform(0.0, 0.1, n))
+
+
+def test_uniform_points_have_k_close_to_pi_d_squared() -> None:
+	distances = [0.2, 0.4, 0.6]
+
+	result = ripley_k(_uniform_points(1500), distances, max_points=2000)
+
+	assert result["n_sampled"] == 1500
+	for d, k, l in zip(distances, result["k"], result["l"]):
+		# No edge correction, so K sits slightly below pi * d**2.
+		assert 0.85 * math.pi * d * d < k < 1.05 * math.pi * d * d
+		assert l == pytest.approx(math.sqrt(k / math.pi))
+
+
+def test_subsample_is_seeded_and_bands_bracket_the_estimate() -> None:
+	points = _uniform_points(5000)
+
+	first = ripley_k(points, [0.3, 0.6], max_points=1000, n_bootstrap=100, seed=7)
+	second = ripley_k(points, [0.3, 0.6], max_points=1000, n_bootstrap=100, seed=7)
+
+	assert first == second
+	assert first["n_points"] == 5000 and first["n_sampled"] == 1000
+	for low, k, high in zip(first["k_low"], first["k"], first["k_high"]):
+		assert low <= k <= high
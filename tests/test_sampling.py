@@ -0,0 +1,62 @@
+"""Seeded sampling: determinism, sizes and stratified allocation."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.schemas.analysis import SampleParams
+from app.services.points import PointSet
+from app.services.sampling import sample_points
+
+
+CELL_SIZE = 0.01
+
+
+def _points(n: int = 20000, seed: int = 0) -> PointSet:
+	rng = np.random.default_rng(seed)
+	# One crowded cell next to a sparse background, so strata are uneven.
+	crowded = rng.uniform([29.650, -82.350], [29.6599, -82.3401], size=(n // 2, 2))
+	background = rng.uniform([29.6, -82.4], [29.7, -82.3], size=(n - n // 2, 2))
+	coords = np.concatenate([crowded, background])
+	return PointSet(lat=coords[:, 0].copy(), lon=coords[:, 1].copy())
+
+
+@pytest.mark.parametrize("method", ["reservoir", "stratified"])
+def test_same_seed_gives_the_same_sample(method: str) -> None:
+	points = _points()
+
+	first = sample_points(points, SampleParams(fraction=0.1, seed=3, method=method), cell_size=CELL_SIZE)
+	again = sample_points(points, SampleParams(fraction=0.1, seed=3, method=method), cell_size=CELL_SIZE)
+	other = sample_points(points, SampleParams(fraction=0.1, seed=4, method=method), cell_size=CELL_SIZE)
+
+	np.testing.assert_array_equal(first.rows, again.rows)
+	np.testing.assert_array_equal(first.points.lat, points.lat[first.rows])
+	assert not np.array_equal(first.rows, other.rows)
+	assert np.all(np.diff(first.rows) > 0)
+
+
+def test_reservoir_sample_has_the_requested_size() -> None:
+	sample = sample_points(_points(), SampleParams(size=500), cell_size=CELL_SIZE)
+
+	assert len(sample.rows) == 500
+	assert sample.scale_factor == 40.0
+
+
+def test_stratified_sample_keeps_each_cell_share() -> None:
+	points = _points()
+
+	sample = sample_points(points, SampleParams(fraction=0.1, method="stratified"), cell_size=CELL_SIZE)
+
+	def cell_counts(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+		i = np.floor((lat - points.lat.min()) / CELL_SIZE).astype(np.int64)
+		j = np.floor((lon - points.lon.min()) / CELL_SIZE).astype(np.int64)
+		return np.bincount(i * 100 + j, minlength=100 * 100)
+
+	full = cell_counts(points.lat, points.lon)
+	kept = cell_counts(sample.points.lat, sample.points.lon)
+	# Each cell keeps its quota, rounded up or down.
+	assert np.all(np.abs(kept - 0.1 * full) < 1.0)
+
+
+def test_sample_covering_every_point_is_skipped() -> None:
+	assert sample_points(_points(100), SampleParams(size=100), cell_size=CELL_SIZE) is None
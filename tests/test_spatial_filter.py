@@ -0,0 +1,73 @@
+"""area_rows must select exactly the points a full scan selects."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.points import PointSet
+from app.services.spatial_filter import area_rows
+from app.services.tiles import build_tile_index
+
+
+def _points(n: int = 50000, seed: int = 2) -> PointSet:
+	rng = np.random.default_rng(seed)
+	return PointSet(lat=rng.uniform(40.5, 40.9, n), lon=rng.uniform(-74.1, -73.7, n))
+
+
+def _in_ring(lat: float, lon: float, ring: list) -> bool:
+	inside = False
+	x2, y2 = ring[-1]
+	for x1, y1 in ring:
+		if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+			inside = not inside
+		x2, y2 = x1, y1
+	return inside
+
+
+BBOXES = [
+	(40.6, 40.7, -74.0, -73.9),
+	(40.70001, 40.70002, -73.8, -73.79),
+	(40.4, 41.0, -74.2, -73.6),
+	(40.95, 41.0, -74.0, -73.9),
+]
+
+
+@pytest.mark.parametrize("bbox", BBOXES)
+def test_bbox_matches_full_scan(bbox) -> None:
+	points = _points()
+	min_lat, max_lat, min_lon, max_lon = bbox
+	expected = np.flatnonzero(
+		(points.lat >= min_lat) & (points.lat <= max_lat) & (points.lon >= min_lon) & (points.lon <= max_lon)
+	)
+
+	rows = area_rows(build_tile_index(points), points, bbox=bbox)
+
+	np.testing.assert_array_equal(rows, expected)
+
+
+@pytest.mark.parametrize("bbox", [None, (40.6, 40.8, -74.0, -73.85)])
+def test_polygon_matches_full_scan(bbox) -> None:
+	points = _points(n=5000)
+	ring = [[-74.05, 40.55], [-73.75, 40.6], [-73.8, 40.85], [-73.95, 40.7], [-74.0, 40.8]]
+	inside = np.array([_in_ring(la, lo, ring) for la, lo in zip(points.lat, points.lon)])
+	if bbox is not None:
+		min_lat, max_lat, min_lon, max_lon = bbox
+		inside &= (points.lat >= min_lat) & (points.lat <= max_lat) & (points.lon >= min_lon) & (points.lon <= max_lon)
+
+	rows = area_rows(build_tile_index(points), points, bbox=bbox, polygon=ring)
+
+	np.testing.assert_array_equal(rows, np.flatnonzero(inside))
+
+
+def test_bbox_edges_are_inclusive() -> None:
+	points = _points()
+	bbox = (float(points.lat[0]), float(points.lat[1]), float(points.lon[2]), float(points.lon[3]))
+	bbox = (min(bbox[:2]), max(bbox[:2]), min(bbox[2:]), max(bbox[2:]))
+	min_lat, max_lat, min_lon, max_lon = bbox
+	expected = np.flatnonzero(
+		(points.lat >= min_lat) & (points.lat <= max_lat) & (points.lon >= min_lon) & (points.lon <= max_lon)
+	)
+
+	rows = area_rows(build_tile_index(points), points, bbox=bbox)
+
+	np.testing.assert_array_equal(rows, expected)
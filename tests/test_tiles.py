@@ -0,0 +1,231 @@
+"""Vector tile encoding, thinning and the tile endpoint's ETag handling."""
+from __future__ import annotations
+
+import math
+import struct
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pytest
+
+from app.services.points import PointSet
+from app.services.tiles import (
+	INDEX_ZOOM,
+	LAYER_NAME,
+	TILE_EXTENT,
+	build_tile_index,
+	encode_tile,
+	mercator_xy,
+	tile_span,
+)
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+	value = shift = 0
+	while True:
+		byte = buf[pos]
+		pos += 1
+		value |= (byte & 0x7F) << shift
+		shift += 7
+		if not byte & 0x80:
+			return value, pos
+
+
+def _fields(buf: bytes) -> List[Tuple[int, Any]]:
+	"""(field number, value) pairs of a protobuf message; length-delimited values stay bytes."""
+	out = []
+	pos = 0
+	while pos < len(buf):
+		key, pos = _read_varint(buf, pos)
+		field, wire = key >> 3, key & 7
+		if wire == 0:
+			value, pos = _read_varint(buf, pos)
+		elif wire == 1:
+			value = struct.unpack("<d", buf[pos:pos + 8])[0]
+			pos += 8
+		elif wire == 2:
+			length, pos = _read_varint(buf, pos)
+			value = buf[pos:pos + length]
+			pos += length
+		else:
+			raise AssertionError(f"unexpected wire type {wire}")
+		out.append((field, value))
+	return out
+
+
+def _packed(buf: bytes) -> List[int]:
+	values = []
+	pos = 0
+	while pos < len(buf):
+		value, pos = _read_varint(buf, pos)
+		values.append(value)
+	return values
+
+
+def _unzigzag(v: int) -> int:
+	return (v >> 1) ^ -(v & 1)
+
+
+def _decode_value(buf: bytes) -> Any:
+	field, value = _fields(buf)[0]
+	if field == 1:
+		return value.decode("utf-8")
+	if field == 3:
+		return value
+	if field == 6:
+		return _unzigzag(value)
+	if field == 7:
+		return bool(value)
+	raise AssertionError(f"unexpected value field {field}")
+
+
+def _decode_tile(tile: bytes) -> Tuple[str, int, List[Dict[str, Any]]]:
+	"""Layer name, extent and features (id, type, geometry, properties) of a one-layer tile."""
+	(layer_field, layer), = _fields(tile)
+	assert layer_field == 3
+	name, extent, keys, values, raw_features = None, None, [], [], []
+	for field, value in _fields(layer):
+		if field == 1:
+			name = value.decode("utf-8")
+		elif field == 2:
+			raw_features.append(value)
+		elif field == 3:
+			keys.append(value.decode("utf-8"))
+		elif field == 4:
+			values.append(_decode_value(value))
+		elif field == 5:
+			extent = value
+	features = []
+	for raw in raw_features:
+		feature: Dict[str, Any] = {"properties": {}}
+		for field, value in _fields(raw):
+			if field == 1:
+				feature["id"] = value
+			elif field == 2:
+				tags = _packed(value)
+				feature["properties"] = {keys[k]: values[v] for k, v in zip(tags[::2], tags[1::2])}
+			elif field == 3:
+				feature["type"] = value
+			elif field == 4:
+				feature["geometry"] = _packed(value)
+		features.append(feature)
+	return name, extent, features
+
+
+def _points(n: int = 5000, seed: int = 0) -> PointSet:
+	rng = np.random.default_rng(seed)
+	kinds = ["food", "park", None, 7, 2.5, True]
+	records = [
+		{
+			"lat": float(lat),
+			"lon": float(lon),
+			"attributes": {"kind": kinds[i % len(kinds)]} if i % 5 else {},
+		}
+		for i, (lat, lon) in enumerate(zip(rng.uniform(29.6, 29.7, n), rng.uniform(-82.4, -82.3, n)))
+	]
+	return PointSet.from_records(records)
+
+
+def _tile_of(lat: float, lon: float, z: int) -> Tuple[int, int]:
+	mx, my = mercator_xy(np.array([lat]), np.array([lon]))
+	return int(math.floor(mx[0] * (1 << z))), int(math.floor(my[0] * (1 << z)))
+
+
+def test_decoded_tile_matches_the_points() -> None:
+	points = _points()
+	z = 12
+	x, y = _tile_of(29.65, -82.35, z)
+	index = build_tile_index(points)
+	span, pick = tile_span(index, z, x, y, max_points=0)
+	rows = np.asarray(index.order[span], dtype=np.int64)
+
+	name, extent, features = _decode_tile(
+		encode_tile(points, rows, index.lat[span], index.lon[span], z, x, y, fields=["kind", "absent"])
+	)
+
+	assert pick is None
+	assert (name, extent) == (LAYER_NAME, TILE_EXTENT)
+	assert [f["id"] for f in features] == rows.tolist()
+	mx, my = mercator_xy(points.lat[rows], points.lon[rows])
+	kind = points.columns["kind"]
+	for feature, row, px, py in zip(features, rows, mx, my):
+		assert feature["type"] == 1
+		command, gx, gy = feature["geometry"]
+		assert command == 9
+		assert _unzigzag(gx) == math.floor((px * (1 << z) - x) * TILE_EXTENT)
+		assert _unzigzag(gy) == math.floor((py * (1 << z) - y) * TILE_EXTENT)
+		code = int(kind.codes[row])
+		value = kind.values[code] if code >= 0 else None
+		# Missing and null attributes carry no tag at all.
+		assert feature["properties"] == ({} if value is None else {"kind": value})
+
+
+def test_tile_span_selects_and_thins_deep_tiles() -> None:
+	points = _points(20000)
+	index = build_tile_index(points)
+	z = INDEX_ZOOM + 2
+	x, y = _tile_of(29.65, -82.35, z)
+	in_tile = {
+		row for row in range(len(points))
+		if _tile_of(points.lat[row], points.lon[row], z) == (x, y)
+	}
+	z_low = 11
+	x_low, y_low = _tile_of(29.65, -82.35, z_low)
+
+	span, pick = tile_span(index, z, x, y, max_points=0)
+	low_span, low_pick = tile_span(index, z_low, x_low, y_low, max_points=100)
+
+	assert set(index.order[span][pick].tolist()) == in_tile
+	assert low_pick is not None and len(low_pick) == 100
+	assert len(set(low_pick.tolist())) == 100
+	assert low_pick[0] == 0 and low_pick[-1] == low_span.stop - low_span.start - 1
+
+
+@pytest.fixture
+def tile_client(session_factory, dataset, tmp_path):
+	from fastapi.testclient import TestClient
+
+	from app.db.database import get_db
+	from app.db.models import Dataset, User
+	from app.main import app
+	from app.routers.auth import get_current_user
+
+	csv_path = tmp_path / "points.csv"
+	csv_path.write_text("name,lat,lon\na,29.65,-82.35\nb,29.651,-82.351\n")
+	db = session_factory()
+	row = db.get(Dataset, dataset.id)
+	row.storage_path = str(csv_path)
+	row.n_points = 2
+	db.commit()
+	user = db.get(User, dataset.user_id)
+	db.close()
+
+	def override_db():
+		session = session_factory()
+		try:
+			yield session
+		finally:
+			session.close()
+
+	app.dependency_overrides[get_db] = override_db
+	app.dependency_overrides[get_current_user] = lambda: user
+	try:
+		yield TestClient(app)
+	finally:
+		app.dependency_overrides.clear()
+
+
+def test_tile_endpoint_answers_a_matching_etag_with_304(tile_client, dataset) -> None:
+	x, y = _tile_of(29.65, -82.35, 14)
+	url = f"/datasets/{dataset.id}/tiles/14/{x}/{y}"
+
+	first = tile_client.get(url)
+	again = tile_client.get(url, headers={"If-None-Match": first.headers["etag"]})
+	stale = tile_client.get(url, headers={"If-None-Match": '"not-the-etag"'})
+
+	assert first.status_code == 200
+	assert len(_decode_tile(first.content)[2]) == 2
+	assert again.status_code == 304
+	assert again.content == b""
+	assert again.headers["etag"] == first.headers["etag"]
+	assert stale.status_code == 200